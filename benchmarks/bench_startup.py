@@ -0,0 +1,208 @@
+"""Startup benchmark of the deepanal CLI.
+
+Times CLI invocations that should exit before any heavy import (help, invalid
+arguments, a missing API key) and the import of the workflow itself, each in a
+fresh interpreter. `--import-profile` adds the slowest imports of every
+scenario, measured with `python -X importtime`:
+
+    python -m benchmarks.bench_startup --import-profile
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any
+
+from rich.console import Console
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Interpreter arguments, environment overrides (None unsets) and a wall-time
+# budget in milliseconds for paths that must not load the pipeline
+SCENARIOS = {
+    "help": (["deepanal.py", "--help"], {}, 200),
+    "invalid_arguments": (["deepanal.py", "-c", "Acme"], {}, 200),
+    "missing_api_key": (
+        ["deepanal.py", "-c", "Acme", "-i", "Widgets", "-l", "Germany"],
+        {"GOOGLE_API_KEY": None},
+        200,
+    ),
+    "workflow_import": (["-c", "import src.graph"], {}, None),
+}
+
+# Metrics compared against a baseline report, all "lower is better"
+REGRESSION_METRICS = ("wall_ms", "modules")
+
+
+def run_scenario(
+    argv: list[str], env_overrides: dict[str, str | None], importtime: bool = False
+) -> tuple[float, str]:
+    env = dict(os.environ)
+    for key, value in env_overrides.items():
+        if value is None:
+            env.pop(key, None)
+        else:
+            env[key] = value
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + argv
+    start = time.perf_counter()
+    completed = subprocess.run(
+        command, cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    return time.perf_counter() - start, completed.stderr
+
+
+def parse_importtime(stderr: str) -> list[dict[str, Any]]:
+    """Modules from `-X importtime` output with self/cumulative microseconds"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, raw_name = line[len("import time:") :].split("|")
+        entries.append(
+            {
+                "module": raw_name.strip(),
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                # Nested imports are indented two spaces per level
+                "depth": (len(raw_name) - len(raw_name.lstrip()) - 1) // 2,
+            }
+        )
+    return entries
+
+
+def profile_scenario(
+    argv: list[str],
+    env_overrides: dict[str, str | None],
+    budget_ms: int | None,
+    repeat: int,
+    top: int,
+) -> dict[str, Any]:
+    wall = [run_scenario(argv, env_overrides)[0] for _ in range(repeat)]
+    _, stderr = run_scenario(argv, env_overrides, importtime=True)
+    entries = parse_importtime(stderr)
+    top_level = [entry for entry in entries if entry["depth"] == 0]
+    top_level.sort(key=lambda entry: entry["cumulative_us"], reverse=True)
+    return {
+        "wall_ms": round(1000 * statistics.median(wall), 1),
+        "budget_ms": budget_ms,
+        "import_ms": round(
+            sum(entry["cumulative_us"] for entry in top_level) / 1000, 1
+        ),
+        "modules": len(entries),
+        "top_imports": [
+            {"module": entry["module"], "ms": round(entry["cumulative_us"] / 1000, 1)}
+            for entry in top_level[:top]
+        ],
+    }
+
+
+def print_report(report: dict[str, Any], import_profile: bool) -> None:
+    cns = Console()
+    for name, scenario in report["scenarios"].items():
+        budget = scenario["budget_ms"]
+        cns.print(
+            name.ljust(18)
+            + str(scenario["wall_ms"]).rjust(8)
+            + " ms"
+            + ("" if budget is None else " (budget " + str(budget) + " ms)")
+            + "  imports "
+            + str(scenario["import_ms"])
+            + " ms over "
+            + str(scenario["modules"])
+            + " modules"
+        )
+        if import_profile:
+            for entry in scenario["top_imports"]:
+                cns.print(
+                    "    " + str(entry["ms"]).rjust(8) + " ms  " + entry["module"]
+                )
+
+
+def regressions(
+    report: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    failures = []
+    for name, scenario in report["scenarios"].items():
+        budget = scenario["budget_ms"]
+        if budget is not None and scenario["wall_ms"] > budget:
+            failures.append(
+                name
+                + " wall_ms "
+                + str(scenario["wall_ms"])
+                + " > budget "
+                + str(budget)
+            )
+        if name not in baseline.get("scenarios", {}):
+            continue
+        for metric in REGRESSION_METRICS:
+            reference = baseline["scenarios"][name][metric]
+            if scenario[metric] > reference * (1 + tolerance):
+                failures.append(
+                    name
+                    + " "
+                    + metric
+                    + " "
+                    + str(scenario[metric])
+                    + " > baseline "
+                    + str(reference)
+                )
+    return failures
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark CLI startup and import time in fresh interpreters"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timed runs per scenario, median kept"
+    )
+    parser.add_argument(
+        "--import-profile",
+        action="store_true",
+        help="Show the slowest top-level imports of every scenario",
+    )
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=list(SCENARIOS),
+        help="Only run these scenarios",
+    )
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative regression against the baseline",
+    )
+    args = parser.parse_args(argv)
+
+    report = {
+        "python": sys.version.split()[0],
+        "scenarios": {
+            name: profile_scenario(*SCENARIOS[name], args.repeat, args.top)
+            for name in args.scenario or SCENARIOS
+        },
+    }
+    print_report(report, args.import_profile)
+    if args.output:
+        with open(args.output, "w") as f_out:
+            json.dump(report, f_out, indent=2)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f_in:
+            baseline = json.load(f_in)
+    failures = regressions(report, baseline, args.tolerance)
+    for failure in failures:
+        Console().print("[red]Regression: " + failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""Offline benchmark of the DeepAnal workflow.
+
+Runs the full graph for N synthetic companies against fake Tavily and chat
+model backends, so timings reflect local processing plus simulated network
+latency and never spend API quota:
+
+    python -m benchmarks.bench_workflow --companies 8 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any
+
+from rich.console import Console
+
+from benchmarks.fakes import FakeChatModel, FakeTavilyClient, LatencyModel
+from src.cache import IndustryCache, LLMCache, SearchCache
+from src.graph import workflow
+from src.limiter import (
+    RateLimitedRunnable,
+    RateLimitedTavilyClient,
+    RateLimiter,
+    load_provider_limits,
+)
+from src.processors import build_run_context, usage_totals
+from src.routing import CALL_SITES
+
+# Metrics compared against a baseline report, all "lower is better"
+REGRESSION_METRICS = ("wall_seconds", "peak_rss_mb", "state_bytes_per_company")
+
+
+def payload_bytes(value: Any) -> int:
+    """UTF-8 size of the plain data in a state update, live services count 0"""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(
+            payload_bytes(key) + payload_bytes(item) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sum(payload_bytes(item) for item in value)
+    if isinstance(value, (int, float, bool)) or value is None:
+        return 8
+    return 0
+
+
+def quantile(values: list[float], q: float) -> float:
+    """Nearest-rank quantile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def build_fake_services(args: argparse.Namespace) -> dict[str, Any]:
+    rng = random.Random(args.seed)
+
+    def latency(median: float) -> LatencyModel:
+        return LatencyModel(
+            median,
+            args.latency_sigma,
+            rng,
+            straggler_rate=args.straggler_rate,
+            straggler_seconds=args.straggler_seconds,
+        )
+
+    llm = FakeChatModel(
+        latency=latency(args.llm_latency), output_tokens=args.output_tokens
+    )
+    tavily_client = FakeTavilyClient(
+        latency=latency(args.search_latency),
+        results_per_query=args.results_per_query,
+        median_raw_characters=args.raw_characters,
+        fixtures_path=args.fixtures,
+        seed=args.seed,
+    )
+    limiters = {}
+    if args.rate_limited:
+        limiters = {
+            name: RateLimiter(name, limits)
+            for name, limits in load_provider_limits(args.rate_limits).items()
+        }
+        # A second fake backend, like Ollama behind Gemini
+        alternate_llm = FakeChatModel(
+            latency=latency(args.llm_latency),
+            output_tokens=args.output_tokens,
+            model_name="fake-alternate-model",
+        )
+        llm = RateLimitedRunnable(llm, limiters["llm"], alternate_llm)
+        tavily_client = RateLimitedTavilyClient(tavily_client, limiters["tavily"])
+    return {
+        # Every call site on the one fake model, reported as a single tier
+        "llms": dict.fromkeys(CALL_SITES, llm),
+        "llm_routes": dict.fromkeys(CALL_SITES, "fake"),
+        "tavily_client": tavily_client,
+        "limiters": limiters,
+        "search_cache": SearchCache(mode="off"),
+        "industry_cache": IndustryCache(mode="off"),
+        "llm_cache": LLMCache(mode="off"),
+    }
+
+
+async def run_company(
+    company: str,
+    services: dict[str, Any],
+    report_dir: str,
+    node_seconds: dict[str, list[float]],
+    node_bytes: dict[str, int],
+) -> dict[str, int]:
+    context = build_run_context(
+        services,
+        company=company,
+        console=Console(quiet=True),
+        logger=logging.getLogger("deepanal.bench"),
+        report_dir=report_dir,
+    )
+    graph_inputs = {
+        "company": company,
+        "industry": "Industrial Machinery",
+        "location": "Germany",
+    }
+    started = {}
+    async for event in workflow.astream(
+        graph_inputs, context=context, stream_mode="debug"
+    ):
+        payload = event["payload"]
+        timestamp = datetime.fromisoformat(event["timestamp"])
+        if event["type"] == "task":
+            started[payload["id"]] = timestamp
+        elif event["type"] == "task_result":
+            seconds = (timestamp - started.pop(payload["id"])).total_seconds()
+            node_seconds.setdefault(payload["name"], []).append(seconds)
+            for _, value in payload["result"]:
+                node_bytes[payload["name"]] = node_bytes.get(
+                    payload["name"], 0
+                ) + payload_bytes(value)
+    return usage_totals(context["llm_usage_callback"])
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    services = build_fake_services(args)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    node_seconds: dict[str, list[float]] = {}
+    node_bytes: dict[str, int] = {}
+    token_totals = {"total_tokens": 0, "input_tokens": 0, "output_tokens": 0}
+
+    company_seconds = []
+
+    async def bounded_run(company: str, report_dir: str) -> None:
+        async with semaphore:
+            company_start = time.perf_counter()
+            usage = await run_company(
+                company, services, report_dir, node_seconds, node_bytes
+            )
+            company_seconds.append(time.perf_counter() - company_start)
+        for key in token_totals:
+            token_totals[key] += usage[key]
+
+    with tempfile.TemporaryDirectory() as report_dir:
+        # Every bench company is in the same industry, so all but the first
+        # reuse its industry research
+        if not args.no_shared_industry:
+            services["industry_cache"] = IndustryCache(cache_dir=report_dir)
+        bench_start = time.perf_counter()
+        await asyncio.gather(
+            *[
+                bounded_run("Company " + str(idx), report_dir)
+                for idx in range(args.companies)
+            ]
+        )
+        wall_seconds = time.perf_counter() - bench_start
+        services["industry_cache"].close()
+
+    state_bytes = sum(node_bytes.values())
+    return {
+        "companies": args.companies,
+        "concurrency": args.concurrency,
+        "wall_seconds": round(wall_seconds, 3),
+        "companies_per_minute": round(60 * args.companies / wall_seconds, 2),
+        "company_p50_seconds": round(quantile(company_seconds, 0.5), 3),
+        "company_p99_seconds": round(quantile(company_seconds, 0.99), 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "state_bytes": state_bytes,
+        "state_bytes_per_company": state_bytes // max(args.companies, 1),
+        "tavily_calls": services["tavily_client"].calls,
+        "industry_cache_hits": services["industry_cache"].hits,
+        **token_totals,
+        "limiters": {
+            name: {
+                "retries": limiter.retries,
+                "deadline_misses": limiter.deadline_misses,
+                "hedges": limiter.hedges,
+                "hedge_wins": limiter.hedge_wins,
+            }
+            for name, limiter in services["limiters"].items()
+        },
+        "nodes": {
+            name: {
+                "calls": len(seconds),
+                "mean_seconds": round(statistics.mean(seconds), 4),
+                "p99_seconds": round(quantile(seconds, 0.99), 4),
+                "max_seconds": round(max(seconds), 4),
+                "state_bytes": node_bytes.get(name, 0),
+            }
+            for name, seconds in sorted(node_seconds.items())
+        },
+    }
+
+
+def print_report(report: dict[str, Any]) -> None:
+    cns = Console()
+    cns.print(
+        str(report["companies"])
+        + " companies at concurrency "
+        + str(report["concurrency"])
+        + ": "
+        + str(report["wall_seconds"])
+        + "s, "
+        + str(report["companies_per_minute"])
+        + " companies/min, peak RSS "
+        + str(report["peak_rss_mb"])
+        + " MB, "
+        + str(report["state_bytes"])
+        + " bytes through state, p50/p99 per company "
+        + str(report["company_p50_seconds"])
+        + "s/"
+        + str(report["company_p99_seconds"])
+        + "s"
+    )
+    for name, node in report["nodes"].items():
+        cns.print(
+            "  "
+            + name.ljust(20)
+            + " calls "
+            + str(node["calls"]).rjust(4)
+            + "  mean "
+            + format(node["mean_seconds"], ".4f")
+            + "s  p99 "
+            + format(node["p99_seconds"], ".4f")
+            + "s  max "
+            + format(node["max_seconds"], ".4f")
+            + "s  state "
+            + str(node["state_bytes"])
+            + " B"
+        )
+
+
+def regressions(
+    report: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    failures = []
+    for metric in REGRESSION_METRICS:
+        if report[metric] > baseline[metric] * (1 + tolerance):
+            failures.append(
+                metric
+                + " "
+                + str(report[metric])
+                + " > baseline "
+                + str(baseline[metric])
+            )
+    return failures
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the workflow offline with fake Tavily and LLM backends"
+    )
+    parser.add_argument("--companies", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.05, help="Median seconds per LLM call"
+    )
+    parser.add_argument(
+        "--search-latency",
+        type=float,
+        default=0.05,
+        help="Median seconds per Tavily search",
+    )
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument("--results-per-query", type=int, default=5)
+    parser.add_argument(
+        "--raw-characters",
+        type=int,
+        default=12000,
+        help="Median raw content size of a synthetic search result",
+    )
+    parser.add_argument(
+        "--fixtures", help="JSONL of recorded Tavily responses to serve instead"
+    )
+    parser.add_argument(
+        "--rate-limited",
+        action="store_true",
+        help="Wrap the fakes in the provider rate limiters",
+    )
+    parser.add_argument(
+        "--straggler-rate",
+        type=float,
+        default=0.0,
+        help="Share of LLM calls and searches that stall",
+    )
+    parser.add_argument(
+        "--straggler-seconds",
+        type=float,
+        default=2.0,
+        help="Extra seconds a stalled call takes",
+    )
+    parser.add_argument(
+        "--rate-limits",
+        help="JSON of per-provider overrides (quotas, deadlines, hedging) "
+        "for --rate-limited",
+    )
+    parser.add_argument(
+        "--no-shared-industry",
+        action="store_true",
+        help="Research the industry for every company instead of sharing it",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative regression against the baseline",
+    )
+    args = parser.parse_args(argv)
+
+    logging.getLogger("deepanal.bench").addHandler(logging.NullHandler())
+    report = asyncio.run(run_benchmark(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f_out:
+            json.dump(report, f_out, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f_in:
+            failures = regressions(report, json.load(f_in), args.tolerance)
+        for failure in failures:
+            Console().print("[red]Regression: " + failure)
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import random
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field
+
+VOCABULARY = (
+    "revenue",
+    "profit",
+    "margin",
+    "growth",
+    "market",
+    "share",
+    "competitor",
+    "acquisition",
+    "partnership",
+    "regulation",
+    "lawsuit",
+    "fine",
+    "investor",
+    "valuation",
+    "leadership",
+    "board",
+    "strategy",
+    "product",
+    "service",
+    "customer",
+    "segment",
+    "forecast",
+    "industry",
+    "trend",
+    "risk",
+    "supply",
+    "chain",
+    "earnings",
+    "announcement",
+    "launch",
+    "award",
+    "controversy",
+    "sentiment",
+    "governance",
+    "emissions",
+    "labor",
+)
+BOILERPLATE = (
+    "Home | About | Contact",
+    "We use cookies to improve your experience. Accept all cookies",
+    "Subscribe to our newsletter",
+    "© All rights reserved. Privacy Policy | Terms of Use",
+)
+
+
+class LatencyModel:
+    """Log-normal latency in seconds around `median` with spread `sigma`.
+
+    A `straggler_rate` share of calls additionally stalls for
+    `straggler_seconds`, the slow-but-alive tail of a real backend.
+    """
+
+    def __init__(
+        self,
+        median: float,
+        sigma: float = 0.3,
+        rng: random.Random | None = None,
+        straggler_rate: float = 0.0,
+        straggler_seconds: float = 0.0,
+    ):
+        self.median = median
+        self.sigma = sigma
+        self.rng = rng or random.Random(0)
+        self.straggler_rate = straggler_rate
+        self.straggler_seconds = straggler_seconds
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        latency = self.median * self.rng.lognormvariate(0, self.sigma)
+        if self.rng.random() < self.straggler_rate:
+            latency += self.straggler_seconds
+        return latency
+
+
+NAVIGATION = (
+    "Home",
+    "Products",
+    "Solutions",
+    "Investors",
+    "Newsroom",
+    "Careers",
+    "About us",
+    "Contact",
+    "Search",
+)
+
+
+def synthetic_text(rng: random.Random, characters: int, subject: str) -> str:
+    """A page of prose between a navigation menu and a footer of related links"""
+    lines = rng.sample(NAVIGATION, k=rng.randint(4, len(NAVIGATION)))
+    lines.append(rng.choice(BOILERPLATE))
+    length = 0
+    while length < characters:
+        words = rng.choices(VOCABULARY, k=rng.randint(12, 30))
+        sentence = subject + " " + " ".join(words) + "."
+        lines.append(sentence)
+        length += len(sentence)
+    lines.append("Related articles")
+    for _ in range(rng.randint(3, 6)):
+        lines.append(subject + " " + " ".join(rng.choices(VOCABULARY, k=3)))
+    lines.append(rng.choice(BOILERPLATE))
+    return "\n".join(lines)
+
+
+class FakeTavilyClient:
+    """Stand-in for `AsyncTavilyClient` serving recorded or synthetic results.
+
+    With `fixtures_path` (JSONL of Tavily search responses) responses are
+    replayed in rotation, otherwise synthetic pages are generated with
+    log-normal raw content sizes around `median_raw_characters`.
+    """
+
+    def __init__(
+        self,
+        latency: LatencyModel,
+        results_per_query: int = 5,
+        median_raw_characters: int = 12000,
+        url_pool: int = 60,
+        fixtures_path: str | None = None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.results_per_query = results_per_query
+        self.median_raw_characters = median_raw_characters
+        self.url_pool = url_pool
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.fixtures = []
+        if fixtures_path is not None:
+            with open(fixtures_path) as f_in:
+                self.fixtures = [json.loads(line) for line in f_in if line.strip()]
+
+    async def search(self, query: str, **kwargs) -> dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        if self.fixtures:
+            return self.fixtures[self.calls % len(self.fixtures)]
+        subject = query.split(" ")[0]
+        results = []
+        for _ in range(self.results_per_query):
+            page = self.rng.randrange(self.url_pool)
+            characters = int(
+                self.median_raw_characters * self.rng.lognormvariate(0, 0.8)
+            )
+            results.append(
+                {
+                    "title": subject + " page " + str(page),
+                    "url": "https://example.com/" + str(page),
+                    "content": subject
+                    + " "
+                    + " ".join(self.rng.choices(VOCABULARY, k=40)),
+                    "raw_content": synthetic_text(self.rng, characters, subject),
+                    "score": round(self.rng.uniform(0.3, 0.95), 3),
+                }
+            )
+        return {"query": query, "results": results}
+
+
+def fake_arguments(parameters: dict[str, Any]) -> dict[str, Any]:
+    """Fill a tool's JSON schema with placeholder values"""
+    arguments = {}
+    for name, schema in parameters.get("properties", {}).items():
+        kind = schema.get("type")
+        if kind == "array":
+            count = schema.get("maxItems", schema.get("minItems", 3))
+            arguments[name] = ["synthetic " + name + " " + str(i) for i in range(count)]
+        elif kind == "boolean":
+            arguments[name] = False
+        elif kind in ("integer", "number"):
+            arguments[name] = 1
+        else:
+            arguments[name] = "synthetic " + name
+    return arguments
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model with configurable latency and output size, no network.
+
+    Tool-bound calls (e.g. `with_structured_output`) return a tool call filled
+    with placeholder values for the bound schema. Streamed text arrives in
+    `stream_chunks` pieces spread over the sampled latency.
+    """
+
+    latency: Any = Field(default=None, exclude=True)
+    output_tokens: int = 400
+    stream_chunks: int = 20
+    model_name: str = "fake-chat-model"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        return BaseChatModel.with_structured_output(self, schema, **kwargs)
+
+    def bind_tools(self, tools: list[Any], **kwargs: Any):
+        return self.bind(
+            tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs
+        )
+
+    def _respond(self, messages: list[BaseMessage], tools: list | None) -> ChatResult:
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": input_tokens + self.output_tokens,
+        }
+        if tools:
+            function = tools[0]["function"]
+            message = AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": function["name"],
+                        "args": fake_arguments(function["parameters"]),
+                        "id": "call_0",
+                    }
+                ],
+                usage_metadata=usage,
+                response_metadata={"model_name": self.model_name},
+            )
+        else:
+            content = "\n".join(
+                "- "
+                + " ".join(
+                    VOCABULARY[i % len(VOCABULARY)] for i in range(line, line + 9)
+                )
+                for line in range(0, self.output_tokens, 10)
+            )
+            message = AIMessage(
+                content=content,
+                usage_metadata=usage,
+                response_metadata={"model_name": self.model_name},
+            )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        return self._respond(messages, tools)
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, tools=None, **kwargs
+    ):
+        if self.latency is not None:
+            await asyncio.sleep(self.latency.sample())
+        return self._respond(messages, tools)
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, tools=None, **kwargs
+    ):
+        latency = 0.0 if self.latency is None else self.latency.sample()
+        message = self._respond(messages, tools).generations[0].message
+        if tools:
+            await asyncio.sleep(latency)
+            tool_call = message.tool_calls[0]
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": tool_call["name"],
+                            "args": json.dumps(tool_call["args"]),
+                            "id": tool_call["id"],
+                            "index": 0,
+                        }
+                    ],
+                    usage_metadata=message.usage_metadata,
+                    response_metadata=message.response_metadata,
+                )
+            )
+            return
+        content = message.content
+        step = max(1, len(content) // self.stream_chunks)
+        pieces = [content[idx : idx + step] for idx in range(0, len(content), step)]
+        for idx, piece in enumerate(pieces):
+            await asyncio.sleep(latency / len(pieces))
+            last = idx == len(pieces) - 1
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=piece,
+                    usage_metadata=message.usage_metadata if last else None,
+                    response_metadata=message.response_metadata if last else {},
+                )
+            )
@@ -1,14 +1,28 @@
+from __future__ import annotations
+
 import os
 import logging
 import sys
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
 from datetime import datetime
-from rich.logging import RichHandler
-from catppuccin.extras.rich_ctp import mocha
-from rich.console import Console
-from rich.traceback import install as setup_tb
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+# Only light modules load up front: --help and invalid arguments exit before
+# rich, LangChain or LangGraph are imported
+from src.defaults import (
+    CACHE_MODES,
+    DEFAULT_ARCHIVE_DIR,
+    DEFAULT_CACHE_DIR,
+    DEFAULT_CHECKPOINT_DIR,
+    TRACE_FORMATS,
+)
 
-from src.graph import workflow
+if TYPE_CHECKING:
+    from rich.console import Console
+
+    from src.graph import ReportStream
+    from src.schemas import DeepAnalContext
 
 banner = """
 ██████╗ ███████╗███████╗██████╗  █████╗ ███╗   ██╗ █████╗ ██╗
@@ -20,30 +34,155 @@ banner = """
 """
 
 
-def main():
-    parser = ArgumentParser(
-        prog="deepanal", description="Deep analysis of company using AI"
+def add_cache_arguments(parser: ArgumentParser):
+    parser.add_argument(
+        "--search-cache",
+        dest="search_cache_mode",
+        choices=CACHE_MODES,
+        default="use",
+        help="use cached Tavily results, refresh them, bypass the cache or "
+        "replay recorded results only",
+    )
+    parser.add_argument(
+        "--llm-cache",
+        dest="llm_cache_mode",
+        choices=CACHE_MODES,
+        default="use",
+        help="same choices as --search-cache, for LLM generations",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help="directory of the cache database, e.g. a recorded run to replay",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="re-execute a recorded run fully offline from --cache-dir; "
+        "any search or LLM call that was not recorded fails",
     )
-    parser.add_argument("-c", "--company", type=str, required=True)
-    parser.add_argument("-i", "--industry", type=str, required=True)
-    parser.add_argument("-l", "--location", type=str, required=True)
 
-    cns = Console(theme=mocha, log_time=True)
-    cns.print(banner, style="mauve")
-    setup_tb(console=cns)
-    args = parser.parse_args()
-    user_request = vars(args)
 
+def apply_replay(args: Namespace):
+    replay = args.replay
+    del args.replay
+    if not replay:
+        return
+    args.search_cache_mode = "replay"
+    args.llm_cache_mode = "replay"
+    # Clients refuse to build without keys, even though replay never calls out
+    os.environ.setdefault("GOOGLE_API_KEY", "replay")
+    os.environ.setdefault("TAVILY_API_KEY", "replay")
+
+
+def add_blob_dir_argument(parser: ArgumentParser):
+    parser.add_argument(
+        "--blob-dir",
+        type=str,
+        default=None,
+        help="keep search payloads on disk in this directory instead of in memory",
+    )
+
+
+def add_checkpoint_dir_argument(parser: ArgumentParser):
+    parser.add_argument(
+        "--checkpoint-dir",
+        type=str,
+        default=DEFAULT_CHECKPOINT_DIR,
+        help="directory of the run checkpoints, and of search payloads unless "
+        "--blob-dir is given",
+    )
+
+
+def blob_dir_for(args: Namespace) -> str:
+    # Resuming needs the payloads a checkpoint refers to, so they go to disk
+    return args.blob_dir or os.path.join(args.checkpoint_dir, "blobs")
+
+
+def add_archive_arguments(parser: ArgumentParser):
+    parser.add_argument(
+        "--archive-dir",
+        type=str,
+        default=DEFAULT_ARCHIVE_DIR,
+        help="append each finished run's documents, queries, briefs and metrics "
+        "to the archive in this directory",
+    )
+    parser.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="do not archive finished runs",
+    )
+
+
+def archive_dir_for(args: Namespace) -> str | None:
+    return None if args.no_archive else args.archive_dir
+
+
+def add_rate_limits_argument(parser: ArgumentParser):
+    parser.add_argument(
+        "--rate-limits",
+        dest="rate_limits_path",
+        type=str,
+        default=None,
+        help="JSON file overriding per-provider limits, e.g. "
+        '{"llm": {"requests_per_minute": 60, "max_in_flight": 4}}',
+    )
+
+
+def add_model_routing_argument(parser: ArgumentParser):
+    parser.add_argument(
+        "--model-routing",
+        dest="model_routing_path",
+        type=str,
+        default=None,
+        help="JSON file overriding model tiers and the tier of each call site, e.g. "
+        '{"routes": {"query_generation": "local"}}',
+    )
+
+
+def add_trace_arguments(parser: ArgumentParser):
+    parser.add_argument(
+        "--trace",
+        dest="trace_path",
+        type=str,
+        default=None,
+        help="append spans of every node, LLM call and Tavily query to this file",
+    )
+    parser.add_argument(
+        "--trace-format",
+        choices=TRACE_FORMATS,
+        default="jsonl",
+        help="one span per line, or one OpenTelemetry OTLP/JSON request per run",
+    )
+
+
+def check_api_keys():
     if "GOOGLE_API_KEY" not in os.environ:
         msg = "No GOOGLE_API_KEY found. Please setup the environment variable"
-        cns.print(msg)
+        print(msg, file=sys.stderr)
         sys.exit(1)
 
     if "TAVILY_API_KEY" not in os.environ:
         msg = "No TAVILY_API_KEY found. Please setup the environment variable"
-        cns.print(msg)
+        print(msg, file=sys.stderr)
         sys.exit(1)
 
+
+def start_console() -> Console:
+    from catppuccin.extras.rich_ctp import mocha
+    from rich.console import Console
+    from rich.traceback import install as setup_tb
+
+    cns = Console(theme=mocha, log_time=True)
+    cns.print(banner, style="mauve")
+    setup_tb(console=cns)
+    return cns
+
+
+def setup_logging(cns: Console) -> logging.Logger:
+    from rich.logging import RichHandler
+
     formatter = "%(asctime)s | %(filename)s | %(lineno)d | %(message)s"
     logging.basicConfig(
         level="NOTSET",  # Set the desired logging level
@@ -64,32 +203,455 @@ def main():
     httpx_logger = logging.getLogger("asyncio")
     httpx_logger.setLevel(logging.WARNING)
 
-    log = logging.getLogger("deepanal")
-    log.info("User research request: " + str(user_request))
-    log.info("Initiating DeepAnal research for: " + user_request["company"])
-    graph_inputs = {"console": cns, "logger": log}
-    graph_inputs.update(user_request)
-    log.info("Graph inputs: " + str(graph_inputs))
-    final_state = workflow.invoke(graph_inputs)
-    usage_hook = final_state["llm_usage_callback"].usage_metadata
-    total_tokens = 0
-    input_tokens = 0
-    output_tokens = 0
-    for model_name, usage_schema in usage_hook.items():
-        total_tokens += usage_schema["total_tokens"]
-        input_tokens += usage_schema["input_tokens"]
-        output_tokens += usage_schema["output_tokens"]
+    return logging.getLogger("deepanal")
+
+
+async def render_report(
+    report_stream: ReportStream, company: str, cns: Console
+) -> dict:
+    """Run the research, printing the report live as the editor writes it"""
+    started = False
+    async for text in report_stream:
+        if not started:
+            cns.rule(company + " report")
+            started = True
+        if text is None:
+            cns.print("\nReport generation restarted", style="yellow")
+            continue
+        cns.print(text, end="", markup=False, highlight=False)
+    cns.print()
+    return report_stream.final_state
+
+
+async def research(
+    args: Namespace,
+    run_id: str,
+    services: dict,
+    cns: Console,
+    log: logging.Logger,
+) -> tuple[DeepAnalContext, dict]:
+    """Research the requested company, continue the checkpointed run `run_id`, or
+    refresh the finished run named by `--refresh` as `run_id`"""
+    from src.graph import (
+        ReportStream,
+        checkpointed_workflow,
+        finished_run,
+        run_config,
+        unfinished_run,
+    )
+    from src.processors import build_run_context, close_connections
+    from src.refresh import refresh_inputs
+
+    try:
+        async with checkpointed_workflow(args.checkpoint_dir) as graph:
+            graph_inputs = {
+                "company": args.company,
+                "industry": args.industry,
+                "location": args.location,
+            }
+            if args.resume is not None:
+                state = await unfinished_run(graph, run_id)
+                if state is None:
+                    cns.print("No unfinished run to resume with id: " + run_id)
+                    sys.exit(1)
+                log.info("Resuming run " + run_id + " for: " + state["company"])
+                # The checkpoint supplies the inputs, the graph resumes from there
+                graph_inputs = None
+                args.company = state["company"]
+            elif args.refresh is not None:
+                state = await finished_run(graph, args.refresh)
+                if state is None:
+                    cns.print("No finished run to refresh with id: " + args.refresh)
+                    sys.exit(1)
+                log.info(
+                    "Refreshing run "
+                    + args.refresh
+                    + " as run "
+                    + run_id
+                    + " for: "
+                    + state["company"]
+                )
+                graph_inputs = refresh_inputs(state, args.refresh)
+                args.company = state["company"]
+            context = build_run_context(
+                services,
+                company=args.company,
+                console=cns,
+                logger=log,
+                briefing_token_budget=args.briefing_token_budget,
+                blob_dir=blob_dir_for(args),
+                documents_per_analyst=args.documents_per_analyst,
+            )
+            report_stream = ReportStream(
+                graph_inputs, context, graph, run_config(run_id)
+            )
+            final_state = await render_report(report_stream, args.company, cns)
+    finally:
+        # The pooled client belongs to this event loop, so it is closed on it
+        await close_connections(services["tavily_client"])
+    return context, final_state
+
+
+def batch_main(argv: list[str]):
+    parser = ArgumentParser(
+        prog="deepanal batch",
+        description="Research every company listed in a CSV/JSONL manifest",
+    )
+    parser.add_argument(
+        "manifest", type=str, help="CSV or JSONL with company, industry, location"
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=str,
+        default="reports",
+        help="directory for reports and metrics.jsonl",
+    )
+    parser.add_argument(
+        "-j",
+        "--concurrency",
+        type=int,
+        default=4,
+        help="number of companies researched at the same time",
+    )
+    add_cache_arguments(parser)
+    add_rate_limits_argument(parser)
+    add_model_routing_argument(parser)
+    add_trace_arguments(parser)
+    add_blob_dir_argument(parser)
+    add_checkpoint_dir_argument(parser)
+    add_archive_arguments(parser)
+
+    args = parser.parse_args(argv)
+    apply_replay(args)
+    check_api_keys()
+    cns = start_console()
+    log = setup_logging(cns)
+    log.info("Batch research request: " + str(vars(args)))
+
+    import asyncio
+
+    from src.batch import run_batch
+
+    records = asyncio.run(
+        run_batch(
+            manifest_path=args.manifest,
+            output_dir=args.output_dir,
+            concurrency=args.concurrency,
+            search_cache_mode=args.search_cache_mode,
+            llm_cache_mode=args.llm_cache_mode,
+            cache_dir=args.cache_dir,
+            rate_limits_path=args.rate_limits_path,
+            model_routing_path=args.model_routing_path,
+            trace_path=args.trace_path,
+            trace_format=args.trace_format,
+            blob_dir=blob_dir_for(args),
+            checkpoint_dir=args.checkpoint_dir,
+            archive_dir=archive_dir_for(args),
+            cns=cns,
+            logger=log,
+        )
+    )
+    failed = [record for record in records if record["status"] != "ok"]
+    cns.print(
+        "Batch finished. Researched: "
+        + str(len(records) - len(failed))
+        + " Failed: "
+        + str(len(failed))
+    )
+
+
+def serve_main(argv: list[str]):
+    parser = ArgumentParser(
+        prog="deepanal serve",
+        description="Serve research jobs over HTTP from one long-running process",
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=str,
+        default="reports",
+        help="directory for the reports, one sub-directory per job",
+    )
+    parser.add_argument(
+        "-j",
+        "--concurrency",
+        type=int,
+        default=4,
+        help="number of jobs researched at the same time",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=32,
+        help="jobs waiting beyond this are rejected with 503",
+    )
+    add_cache_arguments(parser)
+    add_rate_limits_argument(parser)
+    add_model_routing_argument(parser)
+    add_trace_arguments(parser)
+    add_blob_dir_argument(parser)
+    add_checkpoint_dir_argument(parser)
+    add_archive_arguments(parser)
+
+    args = parser.parse_args(argv)
+    apply_replay(args)
+    check_api_keys()
+    cns = start_console()
+    log = setup_logging(cns)
+    log.info("Server request: " + str(vars(args)))
+
+    import asyncio
+
+    from src.limiter import load_provider_limits
+    from src.routing import load_model_routing
+    from src.server import serve
+
+    asyncio.run(
+        serve(
+            host=args.host,
+            port=args.port,
+            output_dir=args.output_dir,
+            concurrency=args.concurrency,
+            queue_size=args.queue_size,
+            search_cache_mode=args.search_cache_mode,
+            llm_cache_mode=args.llm_cache_mode,
+            cache_dir=args.cache_dir,
+            provider_limits=load_provider_limits(args.rate_limits_path),
+            model_routing=load_model_routing(args.model_routing_path),
+            checkpoint_dir=args.checkpoint_dir,
+            blob_dir=blob_dir_for(args),
+            trace_path=args.trace_path,
+            trace_format=args.trace_format,
+            archive_dir=archive_dir_for(args),
+            cns=cns,
+            logger=log,
+        )
+    )
+    cns.print("Server stopped")
+
+
+def archive_main(argv: list[str]):
+    parser = ArgumentParser(
+        prog="deepanal archive",
+        description="Look up archived runs and documents, one JSON line each",
+    )
+    parser.add_argument("-c", "--company", type=str, default=None)
+    parser.add_argument(
+        "--url", type=str, default=None, help="archived versions of this page"
+    )
+    parser.add_argument("--run", dest="run_id", type=str, default=None)
+    parser.add_argument("--kind", choices=("run", "document"), default=None)
+    parser.add_argument(
+        "--since", type=str, default=None, help="first day, e.g. 2025-01-31"
+    )
+    parser.add_argument("--until", type=str, default=None, help="last day")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="print the records themselves instead of their index entries",
+    )
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="rebuild the index from the segment files first",
+    )
+    parser.add_argument("--archive-dir", type=str, default=DEFAULT_ARCHIVE_DIR)
+
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.archive_dir):
+        print("No archive found in: " + args.archive_dir, file=sys.stderr)
+        sys.exit(1)
+
+    import json
+
+    from src.archive import ResearchArchive
+    from src.store import url_hash
+
+    archive = ResearchArchive(args.archive_dir)
+    if args.reindex:
+        print("Indexed " + str(archive.rebuild_index()) + " records", file=sys.stderr)
+    entries = archive.find(
+        kind=args.kind,
+        company=args.company,
+        url_hash=None if args.url is None else url_hash(args.url),
+        run_id=args.run_id,
+        since=args.since,
+        until=args.until,
+    )
+    for entry in entries:
+        print(json.dumps(archive.read(entry) if args.full else entry))
+    archive.close()
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "archive":
+        archive_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        batch_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve_main(sys.argv[2:])
+        return
+
+    parser = ArgumentParser(
+        prog="deepanal",
+        description="Deep analysis of company using AI",
+        epilog="Use 'deepanal batch MANIFEST' to research many companies at once, "
+        "'deepanal serve' to accept research jobs over HTTP or 'deepanal archive' "
+        "to look up archived runs",
+    )
+    parser.add_argument("-c", "--company", type=str)
+    parser.add_argument("-i", "--industry", type=str)
+    parser.add_argument("-l", "--location", type=str)
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        type=str,
+        default=None,
+        help="continue a stopped run from its last completed node",
+    )
+    parser.add_argument(
+        "--refresh",
+        metavar="RUN_ID",
+        type=str,
+        default=None,
+        help="re-research a finished run as a new run: only sections past their "
+        "TTL search again and only briefs whose sources changed are rewritten",
+    )
+    parser.add_argument(
+        "--briefing-tokens",
+        dest="briefing_token_budget",
+        type=int,
+        default=None,
+        help="input token budget for the documents of each briefing",
+    )
+    parser.add_argument(
+        "--documents-per-analyst",
+        dest="documents_per_analyst",
+        type=int,
+        default=None,
+        help="most relevant documents kept for each analyst's briefing",
+    )
+    add_cache_arguments(parser)
+    add_rate_limits_argument(parser)
+    add_model_routing_argument(parser)
+    add_trace_arguments(parser)
+    add_blob_dir_argument(parser)
+    add_checkpoint_dir_argument(parser)
+    add_archive_arguments(parser)
+
+    args = parser.parse_args()
+    if args.resume is not None and args.refresh is not None:
+        parser.error("--resume and --refresh cannot be combined")
+    if (
+        args.resume is None
+        and args.refresh is None
+        and not (args.company and args.industry and args.location)
+    ):
+        parser.error("-c/--company, -i/--industry and -l/--location are required")
+    apply_replay(args)
+
+    check_api_keys()
+    cns = start_console()
+    log = setup_logging(cns)
+    log.info("User research request: " + str(vars(args)))
+
+    import asyncio
+
+    from src.archive import archive_finished_run
+    from src.limiter import load_provider_limits
+    from src.processors import build_services, tier_usage_totals, usage_totals
+    from src.routing import load_model_routing
+
+    services = build_services(
+        search_cache_mode=args.search_cache_mode,
+        llm_cache_mode=args.llm_cache_mode,
+        cache_dir=args.cache_dir,
+        provider_limits=load_provider_limits(args.rate_limits_path),
+        logger=log,
+        model_routing=load_model_routing(args.model_routing_path),
+        archive_dir=archive_dir_for(args),
+    )
+    run_id = args.resume or uuid4().hex[:12]
+    log.info("Initiating DeepAnal research run: " + run_id)
+    try:
+        context, final_state = asyncio.run(research(args, run_id, services, cns, log))
+    except Exception:
+        log.error("Research run " + run_id + " failed", exc_info=True)
+        cns.print(
+            "Completed steps are checkpointed. Continue with: deepanal --resume "
+            + run_id
+        )
+        sys.exit(1)
+    tracer = context["tracer"]
+    if args.trace_path is not None:
+        tracer.export(args.trace_path, args.trace_format)
+        log.info("Wrote " + str(len(tracer.spans)) + " spans to " + args.trace_path)
+    usage = usage_totals(context["llm_usage_callback"])
+    usage_by_tier = tier_usage_totals(context["llm_usage_by_tier"])
     cns.print(
         "Token statistics:\n"
         + "Total tokens: "
-        + str(total_tokens)
+        + str(usage["total_tokens"])
         + "\n"
         + "Input tokens: "
-        + str(input_tokens)
+        + str(usage["input_tokens"])
         + "\n"
         + "Output tokens: "
-        + str(output_tokens)
+        + str(usage["output_tokens"])
+    )
+    for tier, tier_usage in usage_by_tier.items():
+        cns.print(
+            tier
+            + " tier: "
+            + str(tier_usage["input_tokens"])
+            + " input, "
+            + str(tier_usage["output_tokens"])
+            + " output tokens"
+        )
+    for name, span_totals in tracer.summary().items():
+        cns.print(
+            name
+            + ": "
+            + str(span_totals["count"])
+            + " spans, "
+            + str(round(span_totals["seconds"], 2))
+            + " secs"
+        )
+    search_cache = services["search_cache"]
+    llm_cache = services["llm_cache"]
+    cns.print(
+        "Search cache hits: "
+        + str(search_cache.hits)
+        + " Misses: "
+        + str(search_cache.misses)
+        + "\n"
+        + "LLM cache hits: "
+        + str(llm_cache.hits)
+        + " Misses: "
+        + str(llm_cache.misses)
+    )
+    archive_finished_run(
+        services["archive"],
+        run_id,
+        final_state,
+        context,
+        {
+            **usage,
+            "usage_by_tier": usage_by_tier,
+            "trace_id": tracer.trace_id,
+            "spans": tracer.summary(),
+        },
     )
+    search_cache.close()
+    services["industry_cache"].close()
+    llm_cache.close()
+    if services["archive"] is not None:
+        services["archive"].close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,425 @@
+import fcntl
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any
+
+from src.cache import normalize_query
+from src.defaults import DEFAULT_ARCHIVE_DIR
+from src.refresh import NODE_RESULT_KEYS
+from src.store import DocumentStore
+
+# Frame header: magic, length and CRC32 of the compressed record that follows
+FRAME_MAGIC = b"DAR1"
+FRAME_HEADER = struct.Struct("<4sII")
+# A new segment file is started once the current one would grow past this
+SEGMENT_BYTES = 256 * 1024 * 1024
+COMPRESSION_LEVEL = 6
+RECORD_KINDS = ("run", "document")
+INDEX_FILE_NAME = "index.sqlite"
+LOCK_FILE_NAME = "archive.lock"
+
+
+def segment_name(number: int) -> str:
+    return "segment-" + str(number).zfill(6) + ".dar"
+
+
+class ResearchArchive:
+    """Append-only archive of research runs in compressed segment files.
+
+    Every record is a JSON envelope compressed into its own frame, so one
+    record is read by mapping its segment and decompressing only its bytes.
+    Segments are never rewritten; a SQLite index maps kind, run, company, URL
+    hash and date to each frame and can be rebuilt from the segments alone.
+    A frame cut short by a crash is dropped when the archive is next opened.
+
+    Several processes may share one directory: recovery and appends hold an
+    exclusive `flock` on the archive's lock file, and each append first indexes
+    or cuts off whatever a crashed writer left at the end of the last segment.
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_ARCHIVE_DIR,
+        segment_bytes: int = SEGMENT_BYTES,
+        compression_level: int = COMPRESSION_LEVEL,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self._maps: dict[str, mmap.mmap] = {}
+        self._writer = None
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, LOCK_FILE_NAME), "a")
+        self._conn = sqlite3.connect(
+            os.path.join(directory, INDEX_FILE_NAME), check_same_thread=False
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "record_id INTEGER PRIMARY KEY, kind TEXT NOT NULL, run_id TEXT, "
+            "company TEXT, url_hash TEXT, content_hash TEXT, day TEXT NOT NULL, "
+            "segment TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS records_company ON records (company, day)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS records_url_hash ON records (url_hash)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_day ON records (day)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_run ON records (run_id)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS records_segment ON records (segment, offset)"
+        )
+        self._conn.commit()
+        with self._exclusive():
+            self._recover()
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Hold the archive against other threads and other processes"""
+        with self._lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def segments(self) -> list[str]:
+        return sorted(
+            name
+            for name in os.listdir(self.directory)
+            if name.startswith("segment-") and name.endswith(".dar")
+        )
+
+    def _scan(self, segment: str, offset: int) -> int:
+        """Index the complete frames of `segment` from `offset`, returning the
+        end of the last one"""
+        path = os.path.join(self.directory, segment)
+        with open(path, "rb") as f_in:
+            f_in.seek(offset)
+            while True:
+                header = f_in.read(FRAME_HEADER.size)
+                if len(header) < FRAME_HEADER.size:
+                    return offset
+                magic, size, crc = FRAME_HEADER.unpack(header)
+                payload = f_in.read(size)
+                if (
+                    magic != FRAME_MAGIC
+                    or len(payload) < size
+                    or zlib.crc32(payload) != crc
+                ):
+                    return offset
+                envelope = json.loads(zlib.decompress(payload))
+                self._index(envelope, segment, offset, FRAME_HEADER.size + size)
+                offset += FRAME_HEADER.size + size
+
+    def _catch_up(self, segment: str, truncate: bool) -> None:
+        """Index the frames of `segment` after the last indexed one and, with
+        `truncate`, cut off a partial frame at its end"""
+        row = self._conn.execute(
+            "SELECT offset + length FROM records WHERE segment = ? "
+            "ORDER BY offset DESC LIMIT 1",
+            (segment,),
+        ).fetchone()
+        end = self._scan(segment, 0 if row is None else row[0])
+        path = os.path.join(self.directory, segment)
+        if truncate and os.path.getsize(path) > end:
+            os.truncate(path, end)
+
+    def _recover(self) -> None:
+        segments = self.segments()
+        for segment in segments:
+            # Only the segment being appended to can end in a torn write
+            self._catch_up(segment, truncate=segment == segments[-1])
+        self._conn.commit()
+
+    def rebuild_index(self) -> int:
+        """Re-create the index from the segment files, returning its records"""
+        with self._exclusive():
+            self._conn.execute("DELETE FROM records")
+            self._recover()
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM records").fetchone()
+        return count
+
+    def _index(
+        self, envelope: dict[str, Any], segment: str, offset: int, length: int
+    ) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO records (kind, run_id, company, url_hash, content_hash, "
+            "day, segment, offset, length) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                envelope["kind"],
+                envelope["run_id"],
+                normalize_query(envelope["company"]),
+                envelope["url_hash"],
+                envelope["content_hash"],
+                envelope["archived_at"][:10],
+                segment,
+                offset,
+                length,
+            ),
+        )
+        return cursor.lastrowid
+
+    def _active_segment(self, frame_bytes: int) -> str:
+        segments = self.segments()
+        if not segments:
+            return segment_name(1)
+        segment = segments[-1]
+        size = os.path.getsize(os.path.join(self.directory, segment))
+        if size > 0 and size + frame_bytes > self.segment_bytes:
+            return segment_name(int(segment[len("segment-") : -len(".dar")]) + 1)
+        return segment
+
+    def append(
+        self,
+        kind: str,
+        data: Any,
+        run_id: str,
+        company: str,
+        url_hash: str | None = None,
+        content_hash: str | None = None,
+    ) -> dict[str, Any]:
+        """Write one record to the end of the archive, returning its index entry"""
+        if kind not in RECORD_KINDS:
+            raise ValueError("Unknown archive record kind: " + str(kind))
+        envelope = {
+            "kind": kind,
+            "run_id": run_id,
+            "company": company,
+            "url_hash": url_hash,
+            "content_hash": content_hash,
+            "archived_at": datetime.now(timezone.utc).isoformat(),
+            "data": data,
+        }
+        payload = zlib.compress(
+            json.dumps(envelope).encode("utf-8"), self.compression_level
+        )
+        frame = (
+            FRAME_HEADER.pack(FRAME_MAGIC, len(payload), zlib.crc32(payload)) + payload
+        )
+        with self._exclusive():
+            segments = self.segments()
+            if segments:
+                self._catch_up(segments[-1], truncate=True)
+            segment = self._active_segment(len(frame))
+            if self._writer is None or self._writer.name != os.path.join(
+                self.directory, segment
+            ):
+                if self._writer is not None:
+                    self._writer.close()
+                self._writer = open(os.path.join(self.directory, segment), "ab")
+            # Other processes append to the same file, only its size is current
+            offset = os.fstat(self._writer.fileno()).st_size
+            self._writer.write(frame)
+            self._writer.flush()
+            # Indexed only once the frame is on disk, a crash in between leaves
+            # a frame that the next open or append indexes
+            record_id = self._index(envelope, segment, offset, len(frame))
+            self._conn.commit()
+        return {
+            "record_id": record_id,
+            "segment": segment,
+            "offset": offset,
+            "length": len(frame),
+        }
+
+    def has_document(self, url_hash: str, content_hash: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM records WHERE kind = 'document' AND url_hash = ? "
+                "AND content_hash = ? LIMIT 1",
+                (url_hash, content_hash),
+            ).fetchone()
+        return row is not None
+
+    def find(
+        self,
+        kind: str | None = None,
+        company: str | None = None,
+        url_hash: str | None = None,
+        run_id: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """Index entries matching every given filter, oldest first.
+
+        `since` and `until` are inclusive ISO dates, e.g. "2025-01-31".
+        """
+        filters = {
+            "kind = ?": kind,
+            "company = ?": None if company is None else normalize_query(company),
+            "url_hash = ?": url_hash,
+            "run_id = ?": run_id,
+            "day >= ?": since,
+            "day <= ?": until,
+        }
+        clauses = [clause for clause, value in filters.items() if value is not None]
+        query = (
+            "SELECT record_id, kind, run_id, company, url_hash, content_hash, day, "
+            "segment, offset, length FROM records"
+        )
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            cursor = self._conn.execute(
+                query + " ORDER BY record_id",
+                [value for value in filters.values() if value is not None],
+            )
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _mapped(self, segment: str, end: int) -> mmap.mmap:
+        mapped = self._maps.get(segment)
+        # Segments only grow, a mapping older than the frame is re-created
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(os.path.join(self.directory, segment), "rb") as f_in:
+                mapped = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped
+
+    def read(self, entry: dict[str, Any]) -> dict[str, Any]:
+        """The record envelope of an index entry returned by `find`"""
+        offset = entry["offset"]
+        with self._lock:
+            mapped = self._mapped(entry["segment"], offset + entry["length"])
+            magic, size, crc = FRAME_HEADER.unpack_from(mapped, offset)
+            payload = mapped[
+                offset + FRAME_HEADER.size : offset + FRAME_HEADER.size + size
+            ]
+        if magic != FRAME_MAGIC or zlib.crc32(payload) != crc:
+            raise ValueError(
+                "Corrupt archive frame at "
+                + entry["segment"]
+                + ":"
+                + str(entry["offset"])
+            )
+        return json.loads(zlib.decompress(payload))
+
+    def records(self, **filters: Any) -> Iterator[dict[str, Any]]:
+        for entry in self.find(**filters):
+            yield self.read(entry)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            self._conn.close()
+            self._lock_file.close()
+
+
+def archive_run(
+    archive: ResearchArchive,
+    run_id: str,
+    state: dict[str, Any],
+    document_store: DocumentStore,
+    metrics: dict[str, Any],
+) -> dict[str, int]:
+    """Append a finished run's documents, queries, briefs and metrics.
+
+    Document bodies are archived once per URL hash (the doc id) and content
+    hash; the run record refers to them by both. Returns how many documents
+    were written and the bytes the run added to the archive.
+    """
+    company = state["company"]
+    documents = {}
+    analysts = {}
+    for node_result_key in NODE_RESULT_KEYS:
+        node_result = state[node_result_key]
+        for document in node_result["documents"]:
+            documents.setdefault(document["doc_id"], document)
+        analysts[node_result["node_name"]] = {
+            key: value
+            for key, value in node_result.items()
+            if key not in ("documents", "raw_search_results_id")
+        }
+        analysts[node_result["node_name"]]["raw_search_results"] = (
+            document_store.blob_store.get_json(node_result["raw_search_results_id"])
+        )
+    document_store.restore(list(documents.values()))
+    # Analysts recorded the version they saw, the store holds the one kept
+    documents = {doc_id: document_store.get(doc_id) for doc_id in documents}
+
+    new_documents = 0
+    appended_bytes = 0
+    for doc_id, document in documents.items():
+        if document["content_hash"] is None or archive.has_document(
+            doc_id, document["content_hash"]
+        ):
+            continue
+        entry = archive.append(
+            "document",
+            {**document, "content": document_store.raw_content(doc_id)},
+            run_id=run_id,
+            company=company,
+            url_hash=doc_id,
+            content_hash=document["content_hash"],
+        )
+        new_documents += 1
+        appended_bytes += entry["length"]
+
+    with open(state["report_path"]) as f_in:
+        report = f_in.read()
+    entry = archive.append(
+        "run",
+        {
+            "company": company,
+            "industry": state["industry"],
+            "location": state["location"],
+            "analysts": analysts,
+            "documents": list(documents.values()),
+            "relevant_docs": state["relevant_docs"],
+            "briefs": state["briefs"],
+            "brief_evidence": state.get("brief_evidence", {}),
+            "report": report,
+            "metrics": metrics,
+        },
+        run_id=run_id,
+        company=company,
+    )
+    return {"documents": new_documents, "bytes": appended_bytes + entry["length"]}
+
+
+def archive_finished_run(
+    archive: ResearchArchive | None,
+    run_id: str,
+    state: dict[str, Any],
+    context: dict[str, Any],
+    metrics: dict[str, Any],
+) -> None:
+    """Archive a run if archiving is on; a failure is logged, never raised,
+    since the report is already written"""
+    if archive is None:
+        return
+    logger = context["logger"]
+    try:
+        archived = archive_run(
+            archive, run_id, state, context["document_store"], metrics
+        )
+    except Exception:
+        logger.error("Archive: Archiving run " + run_id + " failed", exc_info=True)
+        return
+    logger.info(
+        "Archive: Archived run "
+        + run_id
+        + " with "
+        + str(archived["documents"])
+        + " new documents in "
+        + str(archived["bytes"])
+        + " bytes"
+    )
@@ -0,0 +1,185 @@
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+from logging import Logger
+from typing import Any
+
+from langgraph.graph.state import CompiledStateGraph
+from rich.console import Console
+
+from src.archive import archive_finished_run
+from src.defaults import DEFAULT_CHECKPOINT_DIR
+from src.graph import checkpointed_workflow, run_config, unfinished_run
+from src.limiter import load_provider_limits
+from src.processors import (
+    build_run_context,
+    build_services,
+    close_connections,
+    tier_usage_totals,
+    usage_totals,
+)
+from src.routing import load_model_routing
+
+REQUIRED_FIELDS = ("company", "industry", "location")
+
+
+def load_manifest(manifest_path: str) -> list[dict[str, str]]:
+    """Read research requests from a .csv or .jsonl manifest"""
+    with open(manifest_path, newline="") as f_in:
+        if manifest_path.endswith(".csv"):
+            rows = list(csv.DictReader(f_in))
+        else:
+            rows = [json.loads(line) for line in f_in if line.strip()]
+
+    requests = []
+    for line_number, row in enumerate(rows, start=1):
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            raise ValueError(
+                "Manifest entry "
+                + str(line_number)
+                + " is missing: "
+                + ", ".join(missing)
+            )
+        requests.append({field: row[field].strip() for field in REQUIRED_FIELDS})
+    return requests
+
+
+def report_path_for(output_dir: str, company: str) -> str:
+    return os.path.join(output_dir, company + " DeepAnal_report.md")
+
+
+def run_id_for(output_dir: str, user_request: dict[str, str]) -> str:
+    """Stable run id, so re-running a batch resumes its unfinished companies"""
+    key = json.dumps([os.path.abspath(output_dir), user_request], sort_keys=True)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+async def run_batch(
+    manifest_path: str,
+    output_dir: str,
+    concurrency: int,
+    search_cache_mode: str,
+    llm_cache_mode: str,
+    cache_dir: str,
+    rate_limits_path: str | None,
+    cns: Console,
+    logger: Logger,
+    trace_path: str | None = None,
+    trace_format: str = "jsonl",
+    blob_dir: str | None = None,
+    checkpoint_dir: str = DEFAULT_CHECKPOINT_DIR,
+    model_routing_path: str | None = None,
+    archive_dir: str | None = None,
+) -> list[dict[str, Any]]:
+    logger_prefix = "Batch: "
+    requests = load_manifest(manifest_path)
+    os.makedirs(output_dir, exist_ok=True)
+    metrics_path = os.path.join(output_dir, "metrics.jsonl")
+    logger.info(
+        logger_prefix
+        + "Loaded "
+        + str(len(requests))
+        + " companies from "
+        + manifest_path
+        + " with concurrency "
+        + str(concurrency)
+    )
+
+    # LLM, Tavily client and search cache are shared by every run in the batch
+    services = build_services(
+        search_cache_mode=search_cache_mode,
+        llm_cache_mode=llm_cache_mode,
+        cache_dir=cache_dir,
+        provider_limits=load_provider_limits(rate_limits_path),
+        logger=logger,
+        model_routing=load_model_routing(model_routing_path),
+        archive_dir=archive_dir,
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    metrics_lock = asyncio.Lock()
+    records = []
+
+    async def research(graph: CompiledStateGraph, user_request: dict[str, str]) -> None:
+        company = user_request["company"]
+        if os.path.exists(report_path_for(output_dir, company)):
+            logger.info(logger_prefix + "Report exists, skipping " + company)
+            return
+        async with semaphore:
+            logger.info(logger_prefix + "Starting research for " + company)
+            record = dict(user_request)
+            record["started_at"] = datetime.now(timezone.utc).isoformat()
+            run_start = time.perf_counter()
+            context = build_run_context(
+                services,
+                company=company,
+                console=cns,
+                logger=logger,
+                report_dir=output_dir,
+                blob_dir=blob_dir,
+            )
+            tracer = context["tracer"]
+            record["trace_id"] = tracer.trace_id
+            record["run_id"] = run_id_for(output_dir, user_request)
+            config = run_config(record["run_id"])
+            try:
+                graph_inputs = user_request
+                if await unfinished_run(graph, record["run_id"]) is not None:
+                    logger.info(logger_prefix + "Resuming research for " + company)
+                    graph_inputs = None
+                    record["resumed"] = True
+                final_state = await graph.ainvoke(graph_inputs, config, context=context)
+                record["status"] = "ok"
+                record["report_path"] = final_state["report_path"]
+                record.update(usage_totals(context["llm_usage_callback"]))
+                record["usage_by_tier"] = tier_usage_totals(
+                    context["llm_usage_by_tier"]
+                )
+            except Exception as exc:
+                logger.error(
+                    logger_prefix + "Research failed for " + company, exc_info=True
+                )
+                record["status"] = "error"
+                record["error"] = repr(exc)
+            record["seconds"] = round(time.perf_counter() - run_start, 3)
+            if record["status"] == "ok":
+                archive_finished_run(
+                    services["archive"],
+                    record["run_id"],
+                    final_state,
+                    context,
+                    record,
+                )
+        async with metrics_lock:
+            with open(metrics_path, "a") as f_out:
+                f_out.write(json.dumps(record) + "\n")
+            if trace_path is not None:
+                tracer.export(trace_path, trace_format)
+            records.append(record)
+        logger.info(
+            logger_prefix
+            + "Finished "
+            + company
+            + " with status "
+            + record["status"]
+            + " in "
+            + time.strftime("%M mins %S secs", time.gmtime(record["seconds"]))
+        )
+
+    try:
+        async with checkpointed_workflow(checkpoint_dir) as graph:
+            await asyncio.gather(
+                *[research(graph, user_request) for user_request in requests]
+            )
+    finally:
+        await close_connections(services["tavily_client"])
+    services["search_cache"].close()
+    services["industry_cache"].close()
+    services["llm_cache"].close()
+    if services["archive"] is not None:
+        services["archive"].close()
+    return records
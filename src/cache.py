@@ -0,0 +1,297 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from typing import Any, Awaitable, Callable, Sequence
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from src.defaults import CACHE_MODES, DEFAULT_CACHE_DIR
+
+CACHE_FILE_NAME = "deepanal.sqlite"
+
+# Seconds a cached search stays fresh, per Tavily topic
+SEARCH_TTL_BY_TOPIC = {
+    "news": 6 * 60 * 60,
+    "finance": 24 * 60 * 60,
+    "general": 7 * 24 * 60 * 60,
+}
+DEFAULT_SEARCH_TTL = 24 * 60 * 60
+# Seconds industry-wide research is shared before it is researched again
+INDUSTRY_TTL = 7 * 24 * 60 * 60
+DEFAULT_MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when a call was not recorded"""
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class SqliteCache:
+    """Key/value table in a shared SQLite file with TTL and LRU eviction.
+
+    `mode` is one of "use" (read and write), "refresh" (skip reads, overwrite on
+    write), "off" (no-op) or "replay" (read-only, misses raise
+    `ReplayMissError`). Payloads are evicted least-recently-used first once
+    the table exceeds `max_bytes`.
+    """
+
+    table = "entries"
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        mode: str = "use",
+        max_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError("Unknown cache mode: " + str(mode))
+        self.path = os.path.join(cache_dir, CACHE_FILE_NAME)
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        if mode != "off":
+            os.makedirs(cache_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS " + self.table + " ("
+                "key TEXT PRIMARY KEY, created_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL, size INTEGER NOT NULL, "
+                "value TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS " + self.table + "_accessed_at "
+                "ON " + self.table + " (accessed_at)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def get_value(self, key: str, ttl: float | None = None) -> str | None:
+        if self.mode not in ("use", "replay"):
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, value FROM " + self.table + " WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                if self.mode == "replay":
+                    raise ReplayMissError("No recorded entry in " + self.table)
+                return None
+            created_at, value = row
+            if self.mode == "use" and ttl is not None and now - created_at > ttl:
+                self._conn.execute(
+                    "DELETE FROM " + self.table + " WHERE key = ?", (key,)
+                )
+                self._conn.commit()
+                self.misses += 1
+                return None
+            if self.mode == "use":
+                self._conn.execute(
+                    "UPDATE " + self.table + " SET accessed_at = ? WHERE key = ?",
+                    (now, key),
+                )
+                self._conn.commit()
+        self.hits += 1
+        return value
+
+    def put_value(self, key: str, value: str) -> None:
+        if self.mode not in ("use", "refresh"):
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO " + self.table + " "
+                "(key, created_at, accessed_at, size, value) VALUES (?, ?, ?, ?, ?)",
+                (key, now, now, len(value), value),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        (total_size,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM " + self.table
+        ).fetchone()
+        if total_size <= self.max_bytes:
+            return
+        stale_keys = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM " + self.table + " ORDER BY accessed_at ASC"
+        ):
+            if total_size <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            total_size -= size
+        self._conn.executemany(
+            "DELETE FROM " + self.table + " WHERE key = ?", stale_keys
+        )
+
+    def clear_entries(self) -> None:
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM " + self.table)
+            self._conn.commit()
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SearchCache(SqliteCache):
+    """Tavily search responses keyed on normalized query, topic and raw content
+    format, fresh for a per-topic TTL so news goes stale before general results.
+
+    Identical searches in flight at the same time, e.g. from analysts sharing
+    a topic, are sent once in every mode and all callers get that response, so
+    a recording holds what each of them saw.
+    """
+
+    table = "search_results"
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        mode: str = "use",
+        ttl_by_topic: dict[str, int] | None = None,
+        max_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+    ):
+        super().__init__(cache_dir=cache_dir, mode=mode, max_bytes=max_bytes)
+        self.ttl_by_topic = ttl_by_topic or SEARCH_TTL_BY_TOPIC
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    def get(self, query: str, topic: str, include_raw_content: Any) -> Any | None:
+        value = self.get_value(
+            self.make_key(normalize_query(query), topic, include_raw_content),
+            ttl=self.ttl_by_topic.get(topic, DEFAULT_SEARCH_TTL),
+        )
+        return None if value is None else json.loads(value)
+
+    def put(
+        self, query: str, topic: str, include_raw_content: Any, result: Any
+    ) -> None:
+        self.put_value(
+            self.make_key(normalize_query(query), topic, include_raw_content),
+            json.dumps(result),
+        )
+
+    async def single_flight(
+        self,
+        query: str,
+        topic: str,
+        include_raw_content: Any,
+        search: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Result of `search`, shared with identical searches already running.
+
+        A successful result is cached before the search counts as finished, so
+        a later caller finds it either in flight or in the cache. `search`
+        reports a failure by returning the exception, which is not cached.
+        """
+        key = self.make_key(normalize_query(query), topic, include_raw_content)
+
+        async def search_and_put():
+            result = await search()
+            if not isinstance(result, Exception):
+                self.put_value(key, json.dumps(result))
+            return result
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self._in_flight[key] = asyncio.ensure_future(search_and_put())
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # One caller giving up does not cancel the search for the others
+        return await asyncio.shield(task)
+
+
+class IndustryCache(SqliteCache):
+    """Industry-wide research shared by every company in an industry and location.
+
+    Holds the industry's search responses under the normalized industry and
+    location, and the overview briefed from them under the layer's id, both
+    fresh for `ttl`. `lock` serializes the runs producing the same entry, so
+    concurrent companies of one industry research and brief it once.
+    """
+
+    table = "industry_research"
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        mode: str = "use",
+        ttl: int = INDUSTRY_TTL,
+        max_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+    ):
+        super().__init__(cache_dir=cache_dir, mode=mode, max_bytes=max_bytes)
+        self.ttl = ttl
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    @classmethod
+    def industry_key(cls, industry: str, location: str) -> str:
+        return cls.make_key(
+            "industry", normalize_query(industry), normalize_query(location)
+        )
+
+    def lock(self, key: str) -> asyncio.Lock:
+        return self._locks.setdefault(key, asyncio.Lock())
+
+    def get(self, key: str) -> Any | None:
+        value = self.get_value(key, ttl=self.ttl)
+        return None if value is None else json.loads(value)
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_value(key, json.dumps(value))
+
+
+class LLMCache(SqliteCache, BaseCache):
+    """LangChain cache for chat model generations.
+
+    Keyed on a hash of the rendered prompt and LangChain's `llm_string`, which
+    carries the model name and its parameters.
+    """
+
+    table = "llm_generations"
+
+    def lookup(self, prompt: str, llm_string: str) -> list[Generation] | None:
+        value = self.get_value(self.make_key(prompt, llm_string))
+        if value is None:
+            return None
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", LangChainBetaWarning)
+            generations = [loads(generation) for generation in json.loads(value)]
+        for generation in generations:
+            generation.generation_info = {
+                **(generation.generation_info or {}),
+                "cache_hit": True,
+            }
+        return generations
+
+    def update(
+        self, prompt: str, llm_string: str, return_val: Sequence[Generation]
+    ) -> None:
+        self.put_value(
+            self.make_key(prompt, llm_string),
+            json.dumps([dumps(generation) for generation in return_val]),
+        )
+
+    def clear(self, **kwargs: Any) -> None:
+        self.clear_entries()
@@ -0,0 +1,115 @@
+import re
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from src.packing import count_tokens
+
+# Lines shorter than this many words are navigation candidates
+SHORT_LINE_WORDS = 6
+# Short lines followed by prose: up to this many are headings at the top of a
+# page and lists inside the text, longer runs are menus or tag clouds
+MAX_HEADING_LINES = 2
+MAX_LIST_LINES = 8
+# Link-dominated lines: share of characters taken by URLs and link markup
+MAX_LINK_SHARE = 0.5
+
+LINK_PATTERN = re.compile(r"!?\[[^\]]*\]\([^)]*\)|https?://\S+|www\.\S+")
+MENU_SEPARATOR_PATTERN = re.compile(r" [|•·»›] ")
+# Banner phrases only count when they make up the whole line, so headlines
+# that mention a privacy policy or subscribers survive
+BANNER_PHRASES = (
+    r"(?:cookie|privacy) (?:policy|settings|preferences)|terms (?:of|and) "
+    r"(?:use|service|conditions)|all rights reserved|subscribe(?: now| today)?|"
+    r"(?:sign up for |subscribe to )?(?:our |the )?newsletter|sign (?:in|up)|"
+    r"log ?(?:in|out)|create an account|skip to (?:main )?content|"
+    r"share (?:on \w+|this(?: article| story)?|via \w+)|follow us(?: on \w+)?|"
+    r"advertisement|related (?:articles|posts|stories)|read more|back to top"
+)
+BANNER_PATTERN = re.compile(
+    rf"\W*(?:{BANNER_PHRASES})(?:\W+(?:{BANNER_PHRASES}))*\W*", re.I
+)
+# Consent notices are worded unlike any article text, wherever they appear
+NOTICE_PATTERN = re.compile(
+    r"\b(?:(?:we use|accept|enable|manage) cookies|cookie consent|accept all|"
+    r"reject all|enable javascript)\b",
+    re.I,
+)
+COPYRIGHT_PATTERN = re.compile(r"(?:©|\(c\)|copyright\b)", re.I)
+# Short lines that still carry facts: figures, dates or a finished sentence
+FACT_PATTERN = re.compile(r"\d|[.!?]$")
+
+
+def is_boilerplate(line: str) -> bool:
+    """Banners, menus and link-dominated lines, judged on the line alone"""
+    words = line.split()
+    if BANNER_PATTERN.fullmatch(line):
+        return True
+    if len(words) <= 2 * SHORT_LINE_WORDS and NOTICE_PATTERN.search(line):
+        return True
+    # "© 2024 Acme Corp. All rights reserved.", but not a headline after "©"
+    if COPYRIGHT_PATTERN.match(line) and (
+        len(words) < SHORT_LINE_WORDS or "all rights reserved" in line.lower()
+    ):
+        return True
+    if "http" in line or "www." in line or "](" in line:
+        link_characters = sum(len(link) for link in LINK_PATTERN.findall(line))
+        if link_characters > MAX_LINK_SHARE * len(line):
+            return True
+    # "Home | Products | About us", but not table rows full of figures
+    segments = MENU_SEPARATOR_PATTERN.split(line)
+    return (
+        len(segments) >= 3
+        and len(words) <= 3 * len(segments)
+        and not FACT_PATTERN.search(line)
+    )
+
+
+def clean_lines(lines: Iterable[str]) -> Iterator[tuple[int | None, str]]:
+    """Stream the informative lines of a page, each with its line number.
+
+    Whitespace is normalized. Repeated lines, boilerplate and runs of short
+    lines (menus, tag clouds) are dropped. Short lines followed by prose are
+    kept as headings before the text starts and as headings or lists within
+    it; trailing ones are footers. Paragraph breaks collapse to `(None, "")`.
+    """
+    seen = set()
+    short_lines = []
+    paragraph_break = False
+    emitted = False
+    for number, raw_line in enumerate(lines):
+        words = raw_line.split()
+        if not words:
+            paragraph_break = emitted
+            continue
+        line = " ".join(words)
+        key = line.lower()
+        if key in seen or is_boilerplate(line):
+            continue
+        seen.add(key)
+        if len(words) < SHORT_LINE_WORDS and not FACT_PATTERN.search(line):
+            short_lines.append((number, line))
+            continue
+        max_block = MAX_LIST_LINES if emitted else MAX_HEADING_LINES
+        block = short_lines if len(short_lines) <= max_block else []
+        short_lines = []
+        if paragraph_break:
+            yield None, ""
+            paragraph_break = False
+        yield from block
+        yield number, line
+        emitted = True
+
+
+def clean_raw_content(raw_content: str) -> tuple[str, dict[str, Any]]:
+    """Cleaned page text and its before/after size, for the document index"""
+    lines = raw_content.splitlines()
+    # Tokens never span lines, so per-line counts give both totals in one pass
+    line_tokens = [count_tokens(line) for line in lines]
+    cleaned = list(clean_lines(lines))
+    kept = [number for number, _ in cleaned if number is not None]
+    return "\n".join(line for _, line in cleaned), {
+        "raw_bytes": len(raw_content.encode("utf-8")),
+        "raw_tokens": sum(line_tokens),
+        "content_tokens": sum(line_tokens[number] for number in kept),
+        "dropped_lines": sum(1 for line in lines if line.strip()) - len(kept),
+    }
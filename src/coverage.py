@@ -0,0 +1,68 @@
+import re
+from typing import Any
+
+import numpy as np
+
+from src.retrieval import HashedTfidfVectorizer
+
+# A result counts towards an area when it is relevant and closest to that area
+MIN_RESULT_SCORE = 0.5
+MIN_AREA_SIMILARITY = 0.08
+MIN_RESULTS_PER_AREA = 2
+# Never more searches than the fixed six of old, and the first wave leaves
+# room for gaps to be searched again
+MAX_SEARCHES_PER_ANALYST = 6
+MAX_FIRST_WAVE = 4
+MAX_FOLLOW_UP_ROUNDS = 1
+
+AREA_PATTERN = re.compile(r"^- (.+?) – (.+)$", re.M)
+
+
+def search_areas(query_prompt: str) -> list[str]:
+    """Areas an analyst's query prompt asks the searches to span"""
+    _, _, areas_text = query_prompt.partition("span these areas")
+    return [
+        name.strip() + ": " + description.strip()
+        for name, description in AREA_PATTERN.findall(areas_text)
+    ]
+
+
+def area_similarity(areas: list[str], texts: list[str]) -> np.ndarray:
+    """Cosine similarity of every area (rows) to every text (columns)"""
+    vectors = HashedTfidfVectorizer().fit_transform(areas + texts)
+    return vectors[: len(areas)] @ vectors[len(areas) :].T
+
+
+def area_coverage(
+    areas: list[str], search_results: list[dict[str, Any]]
+) -> dict[str, int]:
+    """Number of relevant results that address each area"""
+    coverage = dict.fromkeys(areas, 0)
+    relevant = [
+        result for result in search_results if result["score"] >= MIN_RESULT_SCORE
+    ]
+    if not areas or not relevant:
+        return coverage
+    similarity = area_similarity(
+        areas,
+        [result["title"] + "\n" + (result["content"] or "") for result in relevant],
+    )
+    best_area = similarity.argmax(axis=0)
+    for column, row in enumerate(best_area):
+        if similarity[row, column] >= MIN_AREA_SIMILARITY:
+            coverage[areas[row]] += 1
+    return coverage
+
+
+def queries_for_areas(queries: list[str], areas: list[str]) -> list[str]:
+    """Pick the closest unused query for each area, at most one per area"""
+    if not queries or not areas:
+        return []
+    similarity = area_similarity(areas, queries)
+    picked = []
+    for row in range(len(areas)):
+        for column in np.argsort(-similarity[row], kind="stable"):
+            if queries[column] not in picked:
+                picked.append(queries[column])
+                break
+    return picked
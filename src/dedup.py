@@ -0,0 +1,106 @@
+import re
+import zlib
+
+import numpy as np
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+# 16 bands of 8 rows put the LSH candidate threshold at a Jaccard of ~0.7
+LSH_BANDS = 16
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Copies of a page share their opening, so only its start is shingled, as
+# only its start is scored for relevance
+SHINGLED_CHARACTERS = 8000
+
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_SHINGLE_BASE = np.uint64(1_000_003)
+# Multiply-shift permutations: the top 32 bits of (a * x + b) mod 2**64 for
+# odd a, which needs no modulo and stays within uint64 arithmetic
+_rng = np.random.default_rng(seed=7)
+_PERMUTATION_A = _rng.integers(
+    0, 2**64, size=NUM_PERMUTATIONS, dtype=np.uint64, endpoint=False
+) | np.uint64(1)
+_PERMUTATION_B = _rng.integers(
+    0, 2**64, size=NUM_PERMUTATIONS, dtype=np.uint64, endpoint=False
+)
+_PERMUTATION_SHIFT = np.uint64(32)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Distinct 32-bit hashes of the word shingles of `text`.
+
+    Words are hashed once and each window of `SHINGLE_SIZE` word hashes is
+    combined as a polynomial, wrapping at 64 bits, then folded to 32 bits.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return np.empty(0, dtype=np.uint64)
+    word_hashes = np.fromiter(
+        (zlib.crc32(word.encode("utf-8")) for word in words),
+        dtype=np.uint64,
+        count=len(words),
+    )
+    windows = len(words) - SHINGLE_SIZE + 1
+    combined = np.zeros(windows, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        combined = combined * _SHINGLE_BASE + word_hashes[offset : offset + windows]
+    return np.unique((combined ^ (combined >> np.uint64(32))) & _MAX_HASH)
+
+
+def minhash_signatures(texts: list[str]) -> np.ndarray:
+    """One row of `NUM_PERMUTATIONS` MinHash values per text, over its first
+    `SHINGLED_CHARACTERS`"""
+    signatures = np.full((len(texts), NUM_PERMUTATIONS), _MAX_HASH, dtype=np.uint64)
+    for row, text in enumerate(texts):
+        hashes = shingle_hashes(text[:SHINGLED_CHARACTERS])
+        if hashes.size == 0:
+            continue
+        permuted = (
+            hashes[:, None] * _PERMUTATION_A[None, :] + _PERMUTATION_B[None, :]
+        ) >> _PERMUTATION_SHIFT
+        signatures[row] = permuted.min(axis=0)
+    return signatures
+
+
+def near_duplicate_clusters(
+    signatures: np.ndarray, threshold: float = NEAR_DUPLICATE_THRESHOLD
+) -> list[list[int]]:
+    """Group rows whose estimated Jaccard similarity reaches `threshold`.
+
+    Candidates come from LSH band buckets, so cost grows linearly with the number
+    of documents; only rows sharing a bucket are compared. Each row is compared
+    with every earlier member of its buckets that is not yet in its cluster,
+    so a pair is found even when neither is similar to the bucket's first row.
+    """
+    count = signatures.shape[0]
+    parent = list(range(count))
+
+    def find(idx: int) -> int:
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    empty = (signatures == _MAX_HASH).all(axis=1)
+    rows_per_band = NUM_PERMUTATIONS // LSH_BANDS
+    for band in range(LSH_BANDS):
+        band_values = signatures[:, band * rows_per_band : (band + 1) * rows_per_band]
+        buckets: dict[bytes, list[int]] = {}
+        for row in range(count):
+            if empty[row]:
+                continue
+            members = buckets.setdefault(band_values[row].tobytes(), [])
+            for member in members:
+                if find(member) == find(row):
+                    continue
+                similarity = np.mean(signatures[member] == signatures[row])
+                if similarity >= threshold:
+                    parent[find(row)] = find(member)
+            members.append(row)
+
+    clusters: dict[int, list[int]] = {}
+    for row in range(count):
+        clusters.setdefault(find(row), []).append(row)
+    return list(clusters.values())
@@ -0,0 +1,13 @@
+"""Settings shared by the CLI and the pipeline.
+
+Kept free of third-party imports, so argument parsing and validation never pay
+for loading LangChain or LangGraph.
+"""
+
+DEFAULT_CACHE_DIR = "cache"
+# "replay" reads entries regardless of age, never writes and fails on a miss
+CACHE_MODES = ("use", "refresh", "off", "replay")
+DEFAULT_CHECKPOINT_DIR = "checkpoints"
+# Every finished run is appended here, see `src.archive`
+DEFAULT_ARCHIVE_DIR = "archive"
+TRACE_FORMATS = ("jsonl", "otlp")
@@ -1,6 +1,12 @@
-from langgraph.graph import StateGraph
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import START, StateGraph
 from langgraph.graph.state import CompiledStateGraph
-from src.schemas import DeepAnalState
+from src.schemas import DeepAnalContext, DeepAnalState
 from src.researchers import (
     financial_analyst,
     news_analyst,
@@ -8,28 +14,30 @@ from src.researchers import (
     industry_analyst,
     controversy_analyst,
 )
-from src.processors import grounding, relevance_evaluator, briefer, editor
+from src.processors import relevance_evaluator, briefer, editor
+from src.defaults import DEFAULT_CHECKPOINT_DIR
+from src.telemetry import traced_node
 
-workflow: CompiledStateGraph = (
-    StateGraph(DeepAnalState)
+graph_builder = (
+    StateGraph(DeepAnalState, context_schema=DeepAnalContext)
     # Add processors
-    .add_node("grounding", grounding)
-    .add_node("curator", relevance_evaluator)
-    .add_node("briefer", briefer)
-    .add_node("editor", editor)
+    .add_node("curator", traced_node("curator")(relevance_evaluator))
+    .add_node("briefer", traced_node("briefer")(briefer))
+    .add_node("editor", traced_node("editor")(editor))
     # Add researchers
-    .add_node("financial_analyst", financial_analyst)
-    .add_node("news_analyst", news_analyst)
-    .add_node("company_analyst", company_analyst)
-    .add_node("industry_analyst", industry_analyst)
-    .add_node("controversy_analyst", controversy_analyst)
+    .add_node("financial_analyst", traced_node("financial_analyst")(financial_analyst))
+    .add_node("news_analyst", traced_node("news_analyst")(news_analyst))
+    .add_node("company_analyst", traced_node("company_analyst")(company_analyst))
+    .add_node("industry_analyst", traced_node("industry_analyst")(industry_analyst))
+    .add_node(
+        "controversy_analyst", traced_node("controversy_analyst")(controversy_analyst)
+    )
     # Setting up edges
-    .set_entry_point("grounding")
-    .add_edge("grounding", "financial_analyst")
-    .add_edge("grounding", "news_analyst")
-    .add_edge("grounding", "company_analyst")
-    .add_edge("grounding", "industry_analyst")
-    .add_edge("grounding", "controversy_analyst")
+    .add_edge(START, "financial_analyst")
+    .add_edge(START, "news_analyst")
+    .add_edge(START, "company_analyst")
+    .add_edge(START, "industry_analyst")
+    .add_edge(START, "controversy_analyst")
     .add_edge("financial_analyst", "curator")
     .add_edge("news_analyst", "curator")
     .add_edge("company_analyst", "curator")
@@ -38,6 +46,74 @@ workflow: CompiledStateGraph = (
     .add_edge("curator", "briefer")
     .add_edge("briefer", "editor")
     .set_finish_point("editor")
-    .compile()
 )
-workflow.name = "DeepAnal"
+workflow: CompiledStateGraph = graph_builder.compile(name="DeepAnal")
+
+
+@asynccontextmanager
+async def checkpointed_workflow(
+    checkpoint_dir: str = DEFAULT_CHECKPOINT_DIR,
+) -> AsyncIterator[CompiledStateGraph]:
+    """The workflow with every completed node saved to SQLite in `checkpoint_dir`"""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(
+        os.path.join(checkpoint_dir, "checkpoints.sqlite")
+    ) as checkpointer:
+        yield graph_builder.compile(checkpointer=checkpointer, name="DeepAnal")
+
+
+def run_config(run_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": run_id}}
+
+
+async def unfinished_run(graph: CompiledStateGraph, run_id: str) -> dict | None:
+    """Checkpointed state of a run that stopped before the editor, else None"""
+    snapshot = await graph.aget_state(run_config(run_id))
+    if not snapshot.next:
+        return None
+    return snapshot.values
+
+
+async def finished_run(graph: CompiledStateGraph, run_id: str) -> dict | None:
+    """Checkpointed state of a run that wrote its report, else None"""
+    snapshot = await graph.aget_state(run_config(run_id))
+    if snapshot.next or "report_path" not in snapshot.values:
+        return None
+    return snapshot.values
+
+
+class ReportStream:
+    """Runs the workflow and yields the report text as the editor writes it.
+
+    `final_state` holds the graph state once iteration finishes. A "reset"
+    (an editor attempt failing mid-stream before a retry) is yielded as `None`,
+    meaning text received so far should be discarded. With a checkpointed
+    `graph` and the `config` of a run, `graph_inputs=None` resumes that run.
+    """
+
+    def __init__(
+        self,
+        graph_inputs: dict[str, Any] | None,
+        context: DeepAnalContext,
+        graph: CompiledStateGraph = workflow,
+        config: RunnableConfig | None = None,
+    ):
+        self.graph_inputs = graph_inputs
+        self.context = context
+        self.graph = graph
+        self.config = config
+        self.final_state = None
+
+    async def __aiter__(self) -> AsyncIterator[str | None]:
+        async for mode, payload in self.graph.astream(
+            self.graph_inputs,
+            self.config,
+            context=self.context,
+            stream_mode=["custom", "values"],
+        ):
+            if mode == "values":
+                self.final_state = payload
+            elif payload.get("event") == "report_chunk":
+                yield payload["text"]
+            elif payload.get("event") == "report_reset":
+                yield None
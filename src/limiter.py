@@ -0,0 +1,411 @@
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from logging import Logger
+from typing import Any, Awaitable, Callable
+
+from langchain_core.runnables import Runnable, RunnableConfig, ensure_config
+from pydantic import BaseModel, ConfigDict, Field
+from tavily.errors import UsageLimitExceededError
+
+from src.telemetry import increment_span_attribute
+
+THROTTLE_MARKERS = (
+    "429",
+    "rate limit",
+    "ratelimit",
+    "too many requests",
+    "resource_exhausted",
+    "resource exhausted",
+)
+
+
+class ProviderLimits(BaseModel):
+    """Quota for one provider, shared by every run in the process"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    requests_per_minute: float = Field(gt=0)
+    tokens_per_minute: float | None = Field(default=None, gt=0)
+    # Also the burst: at most this many requests go out before the steady rate
+    max_in_flight: int = Field(default=8, gt=0)
+    max_retries: int = Field(default=5, ge=0)
+    # Seconds after which a call is cancelled and counts as failed
+    deadline: float | None = Field(default=None, gt=0)
+    # Hedging: a call still running after the `hedge_quantile` of recent
+    # latencies, and at least `hedge_after` seconds, is raced by a second one
+    hedge_after: float | None = Field(default=None, gt=0)
+    hedge_quantile: float = Field(default=0.95, gt=0, lt=1)
+
+
+DEFAULT_PROVIDER_LIMITS = {
+    "llm": ProviderLimits(
+        requests_per_minute=900,
+        tokens_per_minute=900_000,
+        max_in_flight=8,
+        deadline=180,
+        hedge_after=10,
+    ),
+    # Hedged searches would spend search credits, so they are opt-in
+    "tavily": ProviderLimits(requests_per_minute=90, max_in_flight=10, deadline=30),
+}
+# Latencies kept per call site, and needed before hedging on their quantile
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+
+def load_provider_limits(path: str | None) -> dict[str, ProviderLimits]:
+    """Read per-provider overrides from a JSON file keyed by "llm" / "tavily" """
+    limits = dict(DEFAULT_PROVIDER_LIMITS)
+    if path is None:
+        return limits
+    with open(path) as f_in:
+        overrides = json.load(f_in)
+    for provider, values in overrides.items():
+        if provider not in limits:
+            raise ValueError("Unknown rate limited provider: " + str(provider))
+        limits[provider] = ProviderLimits.model_validate(
+            {**limits[provider].model_dump(), **values}
+        )
+    return limits
+
+
+def is_throttling_error(exc: BaseException) -> bool:
+    # Tavily raises this for a 429 without a status code, while plan quota
+    # errors (432/433) raise `ForbiddenError` and are not retried
+    if isinstance(exc, UsageLimitExceededError):
+        return True
+    for attr in ("status_code", "code"):
+        if getattr(exc, attr, None) == 429:
+            return True
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    message = (type(exc).__name__ + " " + str(exc)).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+def estimate_tokens(payload: Any) -> int:
+    return len(str(payload)) // 4 + 1
+
+
+class LatencyTracker:
+    """Seconds taken by the most recent successful calls, per call site"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: dict[str, deque[float]] = {}
+
+    def record(self, key: str, seconds: float) -> None:
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, key: str, q: float) -> float | None:
+        samples = self._samples.get(key)
+        if samples is None or len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RateLimiter:
+    """Token bucket over requests and tokens per minute plus an in-flight cap.
+
+    The buckets hold `max_in_flight` requests (and their share of tokens per
+    minute), so no more than the configured rate goes out in any minute,
+    including the first one after start-up.
+
+    Throttling responses halve the effective rate and pause new requests for an
+    exponentially growing cool-down; successful calls slowly restore the rate.
+    Each call is cancelled at the provider's deadline and, with hedging, raced
+    by a second request once it runs slower than most recent calls.
+
+    The limiter serves one event loop at a time. Calls made on another loop
+    while that one runs are queued on it, so sync callers on private loops
+    share the same quota.
+    """
+
+    def __init__(self, name: str, limits: ProviderLimits, logger: Logger | None = None):
+        self.name = name
+        self.limits = limits
+        self.logger = logger
+        self.rate_scale = 1.0
+        self.retries = 0
+        self.throttled = 0
+        self.deadline_misses = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.latencies = LatencyTracker()
+        self._burst = max(1.0, min(limits.max_in_flight, limits.requests_per_minute))
+        self._token_burst = None
+        if limits.tokens_per_minute is not None:
+            self._token_burst = (
+                limits.tokens_per_minute * self._burst / limits.requests_per_minute
+            )
+        self._request_tokens = self._burst
+        self._llm_tokens = self._token_burst
+        self._last_refill = time.monotonic()
+        self._cooldown_until = 0.0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(limits.max_in_flight)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_tokens = min(
+            self._burst,
+            self._request_tokens
+            + elapsed * self.limits.requests_per_minute * self.rate_scale / 60,
+        )
+        if self.limits.tokens_per_minute is not None:
+            self._llm_tokens = min(
+                self._token_burst,
+                self._llm_tokens
+                + elapsed * self.limits.tokens_per_minute * self.rate_scale / 60,
+            )
+
+    async def acquire(self, tokens: int = 0) -> None:
+        # Oversized requests only wait for a full bucket rather than forever,
+        # then leave it in debt for their remaining tokens
+        needed_tokens = tokens
+        if self._token_burst is not None:
+            needed_tokens = min(tokens, self._token_burst)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._cooldown_until - now
+                if wait <= 0:
+                    request_deficit = 1 - self._request_tokens
+                    wait = (
+                        request_deficit
+                        * 60
+                        / (self.limits.requests_per_minute * self.rate_scale)
+                    )
+                    if self.limits.tokens_per_minute is not None:
+                        token_deficit = needed_tokens - self._llm_tokens
+                        wait = max(
+                            wait,
+                            token_deficit
+                            * 60
+                            / (self.limits.tokens_per_minute * self.rate_scale),
+                        )
+                if wait <= 0:
+                    self._request_tokens -= 1
+                    if self.limits.tokens_per_minute is not None:
+                        self._llm_tokens -= tokens
+                    return
+                await asyncio.sleep(wait)
+
+    def _try_acquire(self) -> bool:
+        """Take a request token only if one is free, for optional requests"""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._cooldown_until or self._request_tokens < 1:
+            return False
+        self._request_tokens -= 1
+        return True
+
+    def hedge_delay(self, key: str) -> float | None:
+        if self.limits.hedge_after is None:
+            return None
+        recent = self.latencies.quantile(key, self.limits.hedge_quantile)
+        if recent is None:
+            return None
+        return max(self.limits.hedge_after, recent)
+
+    async def _within_deadline(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        if self.limits.deadline is None:
+            return await call()
+        try:
+            return await asyncio.wait_for(call(), self.limits.deadline)
+        except TimeoutError:
+            self.deadline_misses += 1
+            increment_span_attribute("deadline_misses")
+            if self.logger is not None:
+                self.logger.warning(
+                    "Rate limiter: "
+                    + self.name
+                    + " call cancelled after its "
+                    + str(self.limits.deadline)
+                    + " secs deadline"
+                )
+            raise
+
+    async def _race(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        alternate: Callable[[], Awaitable[Any]] | None,
+        key: str,
+    ) -> Any:
+        """One attempt of `call`, with `alternate` as its fallback and hedge.
+
+        The alternate (or a repeat of `call` when there is none) starts when
+        the hedge delay passes and a request token is free; an alternate also
+        starts right away when `call` fails. The first success wins and the
+        other request is cancelled, if both fail the first error is raised.
+        """
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self._within_deadline(call))
+        pending = {primary}
+        hedge_delay = self.hedge_delay(key)
+        second_started = False
+        first_error = None
+        try:
+            while pending:
+                timeout = None
+                if not second_started and hedge_delay is not None:
+                    timeout = max(0.0, started + hedge_delay - time.monotonic())
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        # A hedge's win bounds the slow call's latency from below
+                        self.latencies.record(key, time.monotonic() - started)
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    first_error = first_error or task.exception()
+                if second_started:
+                    continue
+                if done and alternate is None:
+                    break
+                if not done:
+                    hedge_delay = None
+                    if not self._try_acquire():
+                        continue
+                    self.hedges += 1
+                    increment_span_attribute("hedges")
+                second_started = True
+                pending.add(
+                    asyncio.ensure_future(self._within_deadline(alternate or call))
+                )
+            raise first_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _on_throttled(self, attempt: int) -> float:
+        self.throttled += 1
+        self.rate_scale = max(0.1, self.rate_scale / 2)
+        backoff = min(60.0, 2**attempt) * (1 + random.random())
+        self._cooldown_until = max(self._cooldown_until, time.monotonic() + backoff)
+        return backoff
+
+    def _on_success(self) -> None:
+        self.rate_scale = min(1.0, self.rate_scale + 0.05)
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        tokens: int = 0,
+        alternate: Callable[[], Awaitable[Any]] | None = None,
+        key: str = "",
+    ) -> Any:
+        """Run `call` within the limits, `key` names the call site for hedging"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            if self._loop is not None and self._loop.is_running():
+                return await asyncio.wrap_future(
+                    asyncio.run_coroutine_threadsafe(
+                        self.run(call, tokens, alternate, key), self._loop
+                    )
+                )
+            # The previous loop is gone, and with it any waiters
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.limits.max_in_flight)
+        for attempt in range(self.limits.max_retries + 1):
+            await self.acquire(tokens)
+            async with self._semaphore:
+                try:
+                    result = await self._race(call, alternate, key)
+                except Exception as exc:
+                    if (
+                        not is_throttling_error(exc)
+                        or attempt == self.limits.max_retries
+                    ):
+                        raise
+                    backoff = self._on_throttled(attempt)
+                    self.retries += 1
+                    increment_span_attribute("retries")
+                    if self.logger is not None:
+                        self.logger.warning(
+                            "Rate limiter: "
+                            + self.name
+                            + " throttled, backing off for "
+                            + str(round(backoff, 1))
+                            + " secs"
+                        )
+                    continue
+            self._on_success()
+            return result
+
+
+class RateLimitedRunnable(Runnable):
+    """Routes async invocations of a runnable through a `RateLimiter`.
+
+    `alternate` is the fallback for failed calls and the target of hedged
+    ones. Latencies are tracked per graph node, whose calls are alike.
+    """
+
+    def __init__(
+        self, bound: Runnable, limiter: RateLimiter, alternate: Runnable | None = None
+    ):
+        self.bound = bound
+        self.limiter = limiter
+        self.alternate = alternate
+
+    def invoke(self, input: Any, config: RunnableConfig | None = None, **kwargs):
+        # Sync callers run on a private loop, still within the limiter's quota
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.ainvoke(input, config, **kwargs))
+        raise RuntimeError(
+            "RateLimitedRunnable.invoke would block the running event loop, "
+            "await ainvoke instead"
+        )
+
+    async def ainvoke(self, input: Any, config: RunnableConfig | None = None, **kwargs):
+        alternate = None
+        if self.alternate is not None:
+
+            def alternate():
+                return self.alternate.ainvoke(input, config, **kwargs)
+
+        return await self.limiter.run(
+            lambda: self.bound.ainvoke(input, config, **kwargs),
+            tokens=estimate_tokens(input),
+            alternate=alternate,
+            key=ensure_config(config)["metadata"].get("langgraph_node", ""),
+        )
+
+    def with_structured_output(self, schema: Any, **kwargs) -> "RateLimitedRunnable":
+        return RateLimitedRunnable(
+            self.bound.with_structured_output(schema, **kwargs),
+            self.limiter,
+            None
+            if self.alternate is None
+            else self.alternate.with_structured_output(schema, **kwargs),
+        )
+
+
+class RateLimitedTavilyClient:
+    """Routes `AsyncTavilyClient.search` calls through a `RateLimiter`"""
+
+    def __init__(self, client: Any, limiter: RateLimiter):
+        self.client = client
+        self.limiter = limiter
+
+    async def search(self, query: str, **kwargs):
+        return await self.limiter.run(
+            lambda: self.client.search(query, **kwargs),
+            key="search " + str(kwargs.get("topic")),
+        )
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
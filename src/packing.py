@@ -0,0 +1,99 @@
+import re
+from typing import Any
+
+DEFAULT_SECTION_TOKEN_BUDGET = 24000
+DEFAULT_DOCUMENT_TOKEN_BUDGET = 2000
+PASSAGE_TOKENS = 160
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text: str) -> int:
+    """Local approximation of a subword tokenizer: long words cost extra tokens"""
+    return sum(
+        1 + (len(token) - 1) // 6 if len(token) > 6 else 1
+        for token in TOKEN_PATTERN.findall(text)
+    )
+
+
+def briefing_categories(briefing_prompt: str) -> list[str]:
+    """Top-level categories of a briefing prompt, each with its sub-items"""
+    match = re.search(r"1\. Structure[^\n]*\n(.*?)\n2\. ", briefing_prompt, re.S)
+    if match is None:
+        return [briefing_prompt]
+    categories = []
+    for line in match.group(1).splitlines():
+        item = line.strip().lstrip("-").strip()
+        item = re.sub(r"^[a-z]\.\s+", "", item)
+        if not item:
+            continue
+        if len(line) - len(line.lstrip()) <= 4 or not categories:
+            categories.append(item)
+        else:
+            categories[-1] += ", " + item
+    return categories
+
+
+def split_passages(text: str, passage_tokens: int = PASSAGE_TOKENS) -> list[str]:
+    """Split text on line breaks, then sentences, into passages of bounded size"""
+    pieces = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if count_tokens(line) <= passage_tokens:
+            pieces.append(line)
+        else:
+            pieces.extend(SENTENCE_PATTERN.split(line))
+
+    passages = []
+    current = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = count_tokens(piece)
+        if current and current_tokens + piece_tokens > passage_tokens:
+            passages.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def pack_passages(
+    passages: list[dict[str, Any]],
+    section_token_budget: int = DEFAULT_SECTION_TOKEN_BUDGET,
+    document_token_budget: int = DEFAULT_DOCUMENT_TOKEN_BUDGET,
+) -> tuple[list[str], int]:
+    """Greedily pick the highest scored passages within the token budgets.
+
+    Each passage needs "score", "doc_id", "title", "position", "text" and
+    "tokens". Selected passages are rendered grouped by document and in their
+    original order. Returns the document entries and the number of tokens used.
+    """
+    selected: dict[str, list[dict[str, Any]]] = {}
+    doc_tokens: dict[str, int] = {}
+    used_tokens = 0
+    for passage in sorted(passages, key=lambda passage: -passage["score"]):
+        tokens = passage["tokens"]
+        if used_tokens + tokens > section_token_budget:
+            continue
+        if doc_tokens.get(passage["doc_id"], 0) + tokens > document_token_budget:
+            continue
+        selected.setdefault(passage["doc_id"], []).append(passage)
+        doc_tokens[passage["doc_id"]] = doc_tokens.get(passage["doc_id"], 0) + tokens
+        used_tokens += tokens
+
+    entries = []
+    for doc_passages in selected.values():
+        doc_passages.sort(key=lambda passage: passage["position"])
+        entries.append(
+            "Title: "
+            + doc_passages[0]["title"]
+            + "\n\nContent: "
+            + "\n[...]\n".join(passage["text"] for passage in doc_passages)
+        )
+    return entries, used_tokens
@@ -1,52 +1,241 @@
+import asyncio
 import os
-import sys
 import time
-from langchain.chat_models import init_chat_model
+from contextlib import asynccontextmanager
+from logging import Logger
+from typing import Any
+
+import numpy as np
 from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langgraph.config import get_stream_writer
+from langgraph.runtime import Runtime
+from rich.console import Console
 from tavily import AsyncTavilyClient
 
 from langchain.prompts import PromptTemplate
-from src.schemas import DeepAnalState, SearchQueries
+from src.archive import ResearchArchive
+from src.cache import (
+    DEFAULT_CACHE_DIR,
+    IndustryCache,
+    LLMCache,
+    ReplayMissError,
+    SearchCache,
+)
+from src.cleaning import clean_raw_content
+from src.dedup import minhash_signatures, near_duplicate_clusters
+from src.limiter import (
+    DEFAULT_PROVIDER_LIMITS,
+    ProviderLimits,
+    RateLimitedTavilyClient,
+    RateLimiter,
+)
+from src.packing import (
+    DEFAULT_DOCUMENT_TOKEN_BUDGET,
+    DEFAULT_SECTION_TOKEN_BUDGET,
+    briefing_categories,
+    pack_passages,
+)
+from src.refresh import evidence, previous_brief
+from src.relevance import DEFAULT_DOCUMENTS_PER_ANALYST, relevance_matrix
+from src.retrieval import DEFAULT_CHUNKS_PER_CATEGORY, ChunkIndex
+from src.routing import DEFAULT_MODEL_ROUTING, ModelRouting, routed_llms
+from src.schemas import DeepAnalContext, DeepAnalState, SearchQueries
+from src.store import BlobStore, DocumentStore
+from src.streaming import ReportWriter
+from src.telemetry import TelemetryCallbackHandler, Tracer, add_span_attributes
 
 
-def grounding(state: DeepAnalState):
-    grounding_start = time.perf_counter()
-    logger = state["logger"]
+# Brief of a section without usable passages or whose briefing failed
+NO_BRIEF = "No information provided"
+# Brief of the industry research shared by every company of an industry,
+# handed to the editor with the company's own industry brief
+INDUSTRY_OVERVIEW = "Industry overview"
+INDUSTRY_OVERVIEW_PROMPT = """Create a focused overview of the {industry} sector in {location}.
+Key requirements:
+1. Structure into these categories using bullet points:
+    a. {industry} Trends & Challenges
+        Emerging opportunities
+        Industry headwinds
+    b. Market Size & Growth
+        Current size
+        Forecast growth rates
+2. Sort newest to oldest where applicable
+3. One fact per bullet point
+4. Do not mention "no information found" or "no data available"
+5. Never use ### headers, only bullet points
+6. Provide only the briefing. Do not provide explanations or commentary.
+7. Use only the given information"""
+# Industry-wide categories of the company's own industry briefing, for when
+# there is no shared overview to cover them
+INDUSTRY_WIDE_CATEGORIES = """
+    c. {industry} Trends & Challenges
+        Emerging opportunities
+        Industry headwinds
+    d. Market Size & Growth
+        Current size
+        Forecast growth rates"""
 
-    logger_prefix = "Grounding node: "
 
-    gemini_llm = init_chat_model(
-        "gemini-2.0-flash", model_provider="google_genai", temperature=0
-    )
-    ollama_llm = init_chat_model("ollama:deepseek-r1:7b", reasoning=False)
-    usage_callback = UsageMetadataCallbackHandler()
+def share_connections(client: AsyncTavilyClient) -> AsyncTavilyClient:
+    """Route every request of `client` through one pooled HTTP client.
 
-    llm = gemini_llm.with_fallbacks([ollama_llm]).with_config(
-        {"callbacks": [usage_callback]}
-    )
+    AsyncTavilyClient opens and closes an httpx client, so a fresh TLS
+    connection, per call; the pooled client keeps connections warm instead.
+    """
+    if getattr(client, "_client_creator", None) is None:
+        return client
+    http_client = client._client_creator()
+
+    @asynccontextmanager
+    async def pooled_client():
+        yield http_client
+
+    client._client_creator = pooled_client
+    client.http_client = http_client
+    return client
+
+
+async def close_connections(client: Any) -> None:
+    """Close the pooled HTTP client of `share_connections`, on the loop it ran on"""
+    http_client = getattr(client, "http_client", None)
+    if http_client is not None:
+        await http_client.aclose()
 
-    query_generator_llm = llm.with_structured_output(SearchQueries)
-    tavily_client = AsyncTavilyClient(api_key=os.environ["TAVILY_API_KEY"])
 
-    logger.info(logger_prefix + "Instantiating LLM and Tavily client")
-    grounding_end = time.perf_counter()
-    time_taken = grounding_end - grounding_start
+def build_services(
+    search_cache_mode: str = "use",
+    llm_cache_mode: str = "use",
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    provider_limits: dict[str, ProviderLimits] | None = None,
+    logger: Logger | None = None,
+    model_routing: ModelRouting | None = None,
+    archive_dir: str | None = None,
+) -> dict[str, Any]:
+    provider_limits = provider_limits or DEFAULT_PROVIDER_LIMITS
+    model_routing = model_routing or DEFAULT_MODEL_ROUTING
+    llm_cache = LLMCache(cache_dir=cache_dir, mode=llm_cache_mode)
+    llm_limiter = RateLimiter("llm", provider_limits["llm"], logger)
+    tavily_limiter = RateLimiter("tavily", provider_limits["tavily"], logger)
+    return {
+        # Each tier's fallback takes over failed calls and races slow ones
+        "llms": routed_llms(model_routing, llm_limiter, llm_cache),
+        "llm_routes": model_routing.routes,
+        "tavily_client": RateLimitedTavilyClient(
+            share_connections(AsyncTavilyClient(api_key=os.environ["TAVILY_API_KEY"])),
+            tavily_limiter,
+        ),
+        "search_cache": SearchCache(cache_dir=cache_dir, mode=search_cache_mode),
+        # Shared industry research follows the search cache's mode
+        "industry_cache": IndustryCache(cache_dir=cache_dir, mode=search_cache_mode),
+        "llm_cache": llm_cache,
+        # Finished runs are appended here, unless archiving is off
+        "archive": None if archive_dir is None else ResearchArchive(archive_dir),
+    }
+
+
+def usage_totals(usage_callback: UsageMetadataCallbackHandler) -> dict[str, int]:
+    totals = {"total_tokens": 0, "input_tokens": 0, "output_tokens": 0}
+    for model_name, usage_schema in usage_callback.usage_metadata.items():
+        for key in totals:
+            totals[key] += usage_schema[key]
+    return totals
+
+
+def tier_usage_totals(
+    usage_by_tier: dict[str, UsageMetadataCallbackHandler],
+) -> dict[str, dict[str, int]]:
+    return {
+        tier: usage_totals(usage_callback)
+        for tier, usage_callback in usage_by_tier.items()
+    }
+
+
+def build_run_context(
+    services: dict[str, Any],
+    company: str,
+    console: Console,
+    logger: Logger,
+    report_dir: str | None = None,
+    briefing_token_budget: int | None = None,
+    blob_dir: str | None = None,
+    tracer: Tracer | None = None,
+    documents_per_analyst: int | None = None,
+) -> DeepAnalContext:
+    """Runtime context of one research run on top of (possibly shared) services"""
     logger.info(
-        logger_prefix
-        + "Grouding finished. Time taken: "
-        + time.strftime("%M mins %S secs", time.gmtime(time_taken))
+        "Search cache mode: "
+        + services["search_cache"].mode
+        + " LLM cache mode: "
+        + services["llm_cache"].mode
     )
+
+    # Usage and spans are tracked per run, even when the underlying model is shared
+    usage_callback = UsageMetadataCallbackHandler()
+    usage_by_tier = {}
+    tracer = tracer or Tracer(company=company)
+    telemetry_callback = TelemetryCallbackHandler(tracer)
+    llms = {}
+    for site, site_llm in services["llms"].items():
+        tier = services["llm_routes"][site]
+        run_config = {
+            "callbacks": [
+                usage_callback,
+                usage_by_tier.setdefault(tier, UsageMetadataCallbackHandler()),
+                telemetry_callback,
+            ],
+            "metadata": {"model_tier": tier},
+        }
+        if site == "query_generation":
+            # Bound before structuring, `with_config` callbacks would not reach
+            # the model
+            site_llm = site_llm.with_structured_output(SearchQueries)
+        llms[site] = site_llm.with_config(run_config)
+
     return {
-        "llm": llm,
-        "tavily_client": tavily_client,
-        "query_generator_llm": query_generator_llm,
+        "console": console,
+        "logger": logger,
+        "query_generator_llm": llms["query_generation"],
+        "briefing_llm": llms["briefing"],
+        "editor_llm": llms["editor"],
+        "tavily_client": services["tavily_client"],
+        "search_cache": services["search_cache"],
+        "industry_cache": services["industry_cache"],
+        "llm_cache": services["llm_cache"],
         "llm_usage_callback": usage_callback,
+        "llm_usage_by_tier": usage_by_tier,
+        "tracer": tracer,
+        "document_store": DocumentStore(BlobStore(blob_dir), clean_raw_content),
+        "report_dir": report_dir,
+        "briefing_token_budget": briefing_token_budget,
+        "documents_per_analyst": documents_per_analyst,
     }
 
 
-def relevance_evaluator(state: DeepAnalState):
-    logger = state["logger"]
-    relevancy_score = 0.5
+def restore_documents(state: DeepAnalState, document_store: DocumentStore) -> None:
+    """Register the analysts' documents when a run resumes in a new process"""
+    for node_result_key in (
+        "company_analyst_node_result",
+        "financial_analyst_node_result",
+        "industry_analyst_node_result",
+        "news_analyst_node_result",
+        "controversy_analyst_node_result",
+    ):
+        document_store.restore(state[node_result_key]["documents"])
+
+
+def relevance_evaluator(state: DeepAnalState, runtime: Runtime[DeepAnalContext]):
+    """Rank the run's documents for each analyst and keep the top of each list.
+
+    Every document is scored against every analyst at once and briefed by the
+    analyst it is most relevant to. Documents that share no term with any
+    analyst's queries are dropped, the rest are cut to a per-analyst budget.
+    """
+    logger = runtime.context["logger"]
+    document_store = runtime.context["document_store"]
+    restore_documents(state, document_store)
+    documents_per_analyst = (
+        runtime.context["documents_per_analyst"] or DEFAULT_DOCUMENTS_PER_ANALYST
+    )
 
     logger_prefix = "Relevance evaluator: "
     company_node_result = state["company_analyst_node_result"]
@@ -54,30 +243,136 @@ def relevance_evaluator(state: DeepAnalState):
     industry_node_result = state["industry_analyst_node_result"]
     news_node_result = state["news_analyst_node_result"]
     controversy_node_result = state["controversy_analyst_node_result"]
-    logger.info(logger_prefix + "Starting relevancy filtering")
-    for node_result in (
+    node_results = (
         company_node_result,
         financial_node_result,
         industry_node_result,
         news_node_result,
         controversy_node_result,
+    )
+    logger.info(
+        logger_prefix
+        + "Starting relevance ranking over "
+        + str(len(document_store))
+        + " unique documents, "
+        + str(document_store.duplicates)
+        + " duplicate results collapsed"
+    )
+    scoring_start = time.perf_counter()
+
+    # Best-scored search result of each document with content, per analyst
+    results_by_doc: dict[str, dict[int, dict[str, Any]]] = {}
+    for column, node_result in enumerate(node_results):
+        for doc in node_result["processed_search_results"]:
+            if document_store.get(doc["doc_id"])["blob_id"] is None:
+                continue
+            # Copies of one content are ranked as their representative
+            doc = {**doc, "doc_id": document_store.representative(doc["doc_id"])}
+            found_by = results_by_doc.setdefault(doc["doc_id"], {})
+            if column not in found_by or doc["score"] > found_by[column]["score"]:
+                found_by[column] = doc
+    doc_ids = list(results_by_doc)
+    candidates = [
+        max(results_by_doc[doc_id].values(), key=lambda doc: doc["score"])
+        for doc_id in doc_ids
+    ]
+    search_scores = np.zeros((len(doc_ids), len(node_results)), dtype=np.float32)
+    for row, doc_id in enumerate(doc_ids):
+        for column, doc in results_by_doc[doc_id].items():
+            search_scores[row, column] = doc["score"]
+    texts = [document_store.raw_content(doc_id) for doc_id in doc_ids]
+    # An analyst's vocabulary: the request, the areas it covers and its queries
+    analyst_queries = [
+        " ".join(
+            [state["company"], state["industry"], state["location"]]
+            + list(node_result.get("coverage", {}))
+            + node_result["queries"]
+        )
+        for node_result in node_results
+    ]
+    relevance, bm25 = relevance_matrix(
+        [doc["title"] for doc in candidates],
+        # Tavily's snippet is the passage it matched, ahead of the page's lead
+        [(doc["content"] or "") + "\n" + text for doc, text in zip(candidates, texts)],
+        analyst_queries,
+        state["company"],
+        search_scores,
+    )
+    scoring_ms = round(1000 * (time.perf_counter() - scoring_start), 1)
+    add_span_attributes(ranked_documents=len(doc_ids), relevance_ms=scoring_ms)
+    logger.info(
+        logger_prefix
+        + "Ranked "
+        + str(len(doc_ids))
+        + " documents in "
+        + str(scoring_ms)
+        + " ms"
+    )
+
+    owners = relevance.argmax(axis=1) if len(doc_ids) else np.empty(0, dtype=int)
+    ranked_by_section = [
+        [
+            row
+            for row in np.argsort(-relevance[:, column], kind="stable")
+            if owners[row] == column and bm25[row, column] > 0
+        ]
+        for column in range(len(node_results))
+    ]
+
+    # Syndicated copies under different URLs collapse onto their most relevant
+    # version, checked only among documents that could still make the cut
+    window = sorted(
+        {
+            row
+            for ranked in ranked_by_section
+            for row in ranked[: documents_per_analyst * 3 // 2]
+        }
+    )
+    near_duplicates = set()
+    for cluster in near_duplicate_clusters(
+        minhash_signatures([texts[row] for row in window])
     ):
-        relevant_docs = list(
-            filter(
-                lambda doc: (doc["score"] >= relevancy_score)
-                and (doc["raw_content"] is not None),
-                node_result["processed_search_results"],
-            )
+        if len(cluster) == 1:
+            continue
+        rows = sorted(
+            (window[idx] for idx in cluster),
+            key=lambda row: relevance[row].max(),
+            reverse=True,
+        )
+        candidates[rows[0]] = dict(candidates[rows[0]])
+        candidates[rows[0]]["duplicate_urls"] = [
+            candidates[row]["url"] for row in rows[1:]
+        ]
+        near_duplicates.update(rows[1:])
+    if near_duplicates:
+        logger.info(
+            logger_prefix
+            + "Collapsed "
+            + str(len(near_duplicates))
+            + " near-duplicate documents"
         )
+
+    relevant_docs_by_section = {}
+    for column, node_result in enumerate(node_results):
+        ranked = [
+            row for row in ranked_by_section[column] if row not in near_duplicates
+        ]
+        relevant_docs = [
+            {**candidates[row], "relevance": round(float(relevance[row, column]), 4)}
+            for row in ranked[:documents_per_analyst]
+        ]
         if len(relevant_docs) > 0:
             logger.info(
                 logger_prefix
                 + "For "
                 + str(node_result["node_name"])
-                + " filtered "
+                + " kept "
                 + str(len(relevant_docs))
-                + " documents out of "
+                + " of "
+                + str(len(ranked))
+                + " ranked documents from "
                 + str(len(node_result["processed_search_results"]))
+                + " search results"
             )
         else:
             logger.warning(
@@ -87,30 +382,26 @@ def relevance_evaluator(state: DeepAnalState):
                 + " no relevant documents were found amongst "
                 + str(len(node_result["processed_search_results"]))
             )
-        node_result["relevant_docs"] = relevant_docs
-    return {
-        "company_analyst_node_result": company_node_result,
-        "financial_analyst_node_result": financial_node_result,
-        "industry_analyst_node_result": industry_node_result,
-        "news_analyst_node_result": news_node_result,
-        "controversy_analyst_node_result": controversy_node_result,
-    }
+        relevant_docs_by_section[node_result["node_name"]] = relevant_docs
+    return {"relevant_docs": relevant_docs_by_section}
 
 
-def briefer(state: DeepAnalState):
+async def briefer(state: DeepAnalState, runtime: Runtime[DeepAnalContext]):
     company = state["company"]
     industry = state["industry"]
     location = state["location"]
-    cns = state["console"]
-    llm = state["llm"]
-    logger = state["logger"]
-    max_content_length_per_section = 8000
+    llm = runtime.context["briefing_llm"]
+    logger = runtime.context["logger"]
+    document_store = runtime.context["document_store"]
+    restore_documents(state, document_store)
+    relevant_docs = state["relevant_docs"]
+    previous_run = state.get("previous_run") or {}
+    section_token_budget = (
+        runtime.context["briefing_token_budget"] or DEFAULT_SECTION_TOKEN_BUDGET
+    )
+    document_token_budget = min(DEFAULT_DOCUMENT_TOKEN_BUDGET, section_token_budget)
+    chunks_per_category = DEFAULT_CHUNKS_PER_CATEGORY
     logger_prefix = "Briefer: "
-    company_node_result = state["company_analyst_node_result"]
-    financial_node_result = state["financial_analyst_node_result"]
-    industry_node_result = state["industry_analyst_node_result"]
-    news_node_result = state["news_analyst_node_result"]
-    controversy_node_result = state["controversy_analyst_node_result"]
 
     briefing_prompts = {
         "Industry analyst": """Create a focused industry briefing for {company}, a {industry} company based in {location}.
@@ -121,13 +412,7 @@ Key requirements:
         Share of market
     b. Competitors
         Key rivals
-        Competitive strengths/weaknesses
-    c. {industry} Trends & Challenges
-        Emerging opportunities
-        Industry headwinds
-    d. Market Size & Growth
-        Current size
-        Forecast growth rates
+        Competitive strengths/weaknesses{industry_wide_categories}
 2. Sort newest to oldest where applicable
 3. One fact per bullet point
 4. Do not mention "no information found" or "no data available"
@@ -218,61 +503,71 @@ Key requirements:
 7. Provide only the briefing. Do not provide explanations or commentary.""",
     }
 
-    logger.info(logger_prefix + "Creating briefings for researchers")
-    for node_result in (
-        company_node_result,
-        financial_node_result,
-        industry_node_result,
-        news_node_result,
-        controversy_node_result,
-    ):
-        if len(node_result["relevant_docs"]) == 0:
+    async def create_brief(
+        section: str,
+        section_instructions: str,
+        index: ChunkIndex,
+        subject: str,
+        doc_ids: set[str] | None = None,
+    ) -> tuple[str, list[list[str]]]:
+        # Every category of the section pulls its own top-k chunks from the
+        # index, out of the section's own documents when `doc_ids` is given
+        category_hits = index.search(
+            [
+                subject + " " + category
+                for category in briefing_categories(section_instructions)
+            ],
+            k=chunks_per_category,
+            doc_ids=doc_ids,
+        )
+        passages = {}
+        for hits in category_hits:
+            for chunk in hits:
+                key = (chunk["doc_id"], chunk["position"])
+                if key not in passages or chunk["score"] > passages[key]["score"]:
+                    passages[key] = chunk
+        if len(passages) == 0:
             logger.warning(
                 logger_prefix
-                + "No relevant documents found for "
-                + node_result["node_name"]
+                + "No relevant passages found for "
+                + section
                 + ". Skipping briefing"
             )
-            node_result["brief"] = "No information provided"
-            continue
-        relevant_docs = node_result["relevant_docs"]
-        sorted_relevant_docs = sorted(
-            relevant_docs,
-            key=lambda x: float(x["score"]),
-            reverse=True,
+            return NO_BRIEF, []
+        sources = evidence(
+            [
+                document_store.get(doc_id)
+                for doc_id in dict.fromkeys(doc_id for doc_id, _ in passages)
+            ]
+        )
+        brief = previous_brief(previous_run, section, sources)
+        if brief is not None and brief != NO_BRIEF:
+            logger.info(
+                logger_prefix
+                + "Sources unchanged since the previous run, keeping briefing for "
+                + section
+            )
+            return brief, sources
+        doc_texts, packed_tokens = pack_passages(
+            list(passages.values()),
+            section_token_budget=section_token_budget,
+            document_token_budget=document_token_budget,
+        )
+        logger.info(
+            logger_prefix
+            + "Packed "
+            + str(packed_tokens)
+            + " tokens from "
+            + str(len(passages))
+            + " passages of "
+            + str(len(doc_texts))
+            + " documents for "
+            + section
         )
-
-        doc_texts = []
-        total_length = 0
-        for doc in sorted_relevant_docs:
-            title = doc.get("title", "")
-            content = doc.get("raw_content")
-            if content is None:
-                cns.print(
-                    "NODE: "
-                    + node_result["node_name"]
-                    + " Title: "
-                    + doc["title"]
-                    + " URL: "
-                    + doc["url"]
-                )
-                logger.warning(logger_prefix + node_result["node_name"])
-            if len(content) > max_content_length_per_section:
-                content = (
-                    content[:max_content_length_per_section] + "... [content truncated]"
-                )
-            doc_entry = f"Title: {title}\n\nContent: {content}"
-            if total_length + len(doc_entry) < 100000:  # Keep under limit
-                doc_texts.append(doc_entry)
-                total_length += len(doc_entry)
-            else:
-                break
 
         separator = "\n" + "-" * 40 + "\n"
         briefing_prompt = (
-            briefing_prompts[node_result["node_name"]].format(
-                company=company, industry=industry, location=location
-            )
+            section_instructions
             + "\n"
             + "Analyze the following documents and extract key information."
             "Provide only the briefing, no explanations or commentary:"
@@ -288,41 +583,144 @@ Key requirements:
         # )
         briefing_chain = llm
         try:
-            node_brief = briefing_chain.invoke(briefing_prompt)
+            node_brief = await briefing_chain.ainvoke(briefing_prompt)
+        except ReplayMissError:
+            # A replay must fail where the recording diverges, not degrade
+            raise
         except Exception:
             logger.error(
-                logger_prefix
-                + " Error occured while creating briefing for "
-                + node_result["node_name"],
+                logger_prefix + " Error occured while creating briefing for " + section,
                 exc_info=True,
             )
-            sys.exit(1)
+            # A failed section degrades on its own instead of ending the run
+            return NO_BRIEF, sources
 
-        logger.info(logger_prefix + "Created briefing for " + node_result["node_name"])
-        node_result["brief"] = node_brief.content
+        logger.info(logger_prefix + "Created briefing for " + section)
         # cns.print(node_brief.content)
+        return node_brief.content, sources
+
+    async def industry_overview() -> tuple[str, list[list[str]]]:
+        """Brief of the shared industry research, written once per layer"""
+        layer = state["industry_analyst_node_result"].get("industry_layer")
+        if layer is None:
+            return NO_BRIEF, []
+        industry_cache = runtime.context["industry_cache"]
+        key = IndustryCache.make_key("overview", layer["layer_id"])
+        async with industry_cache.lock(key):
+            overview = industry_cache.get(key)
+            if overview is not None:
+                logger.info(logger_prefix + "Reusing shared " + INDUSTRY_OVERVIEW)
+                return overview["brief"], overview["sources"]
+            layer_index = ChunkIndex.build(
+                [
+                    {
+                        "doc_id": doc_id,
+                        "title": document_store.get(doc_id).get("title", ""),
+                        "text": document_store.raw_content(doc_id),
+                    }
+                    for doc_id in dict.fromkeys(
+                        document_store.representative(doc_id)
+                        for doc_id in layer["doc_ids"]
+                    )
+                ]
+            )
+            brief, sources = await create_brief(
+                INDUSTRY_OVERVIEW,
+                INDUSTRY_OVERVIEW_PROMPT.format(industry=industry, location=location),
+                layer_index,
+                industry,
+            )
+            if brief != NO_BRIEF:
+                industry_cache.put(key, {"brief": brief, "sources": sources})
+            return brief, sources
+
+    chunk_index = ChunkIndex.build(
+        [
+            {
+                "doc_id": doc["doc_id"],
+                "title": doc.get("title", ""),
+                "text": document_store.raw_content(doc["doc_id"]),
+            }
+            for section_docs in relevant_docs.values()
+            for doc in section_docs
+        ]
+    )
+    logger.info(
+        logger_prefix + "Indexed " + str(len(chunk_index)) + " chunks for retrieval"
+    )
+    # Each section is briefed only from the documents ranked for its analyst
+    section_doc_ids = {
+        section: {doc["doc_id"] for doc in section_docs}
+        for section, section_docs in relevant_docs.items()
+    }
+
+    async def industry_briefs() -> list[tuple[str, list[list[str]]]]:
+        overview = await industry_overview()
+        # Without a shared overview the company's own documents cover the
+        # industry's trends and size, so the report never loses them
+        industry_wide_categories = ""
+        if overview[0] == NO_BRIEF:
+            industry_wide_categories = INDUSTRY_WIDE_CATEGORIES.format(
+                industry=industry
+            )
+        brief = await create_brief(
+            "Industry analyst",
+            briefing_prompts["Industry analyst"].format(
+                company=company,
+                industry=industry,
+                location=location,
+                industry_wide_categories=industry_wide_categories,
+            ),
+            chunk_index,
+            company,
+            section_doc_ids.get("Industry analyst", set()),
+        )
+        return [brief, overview]
 
+    logger.info(logger_prefix + "Creating briefings for researchers")
+    company_sections = [
+        section for section in briefing_prompts if section != "Industry analyst"
+    ]
+    sections = [*company_sections, "Industry analyst", INDUSTRY_OVERVIEW]
+    *briefs, industry_section_briefs = await asyncio.gather(
+        *[
+            create_brief(
+                section,
+                briefing_prompts[section].format(
+                    company=company, industry=industry, location=location
+                ),
+                chunk_index,
+                company,
+                section_doc_ids.get(section, set()),
+            )
+            for section in company_sections
+        ],
+        industry_briefs(),
+    )
+    briefs += industry_section_briefs
     return {
-        "company_analyst_node_result": company_node_result,
-        "financial_analyst_node_result": financial_node_result,
-        "industry_analyst_node_result": industry_node_result,
-        "news_analyst_node_result": news_node_result,
-        "controversy_analyst_node_result": controversy_node_result,
+        "briefs": {section: brief for section, (brief, _) in zip(sections, briefs)},
+        # Documents each brief drew on, a refresh re-briefs only when they change
+        "brief_evidence": {
+            section: sources for section, (_, sources) in zip(sections, briefs)
+        },
     }
 
 
-def editor(state: DeepAnalState):
+async def editor(state: DeepAnalState, runtime: Runtime[DeepAnalContext]):
     company = state["company"]
     industry = state["industry"]
     location = state["location"]
-    llm = state["llm"]
-    logger = state["logger"]
+    llm = runtime.context["editor_llm"]
+    logger = runtime.context["logger"]
     logger_prefix = "Editor: "
-    company_node_result = state["company_analyst_node_result"]
-    financial_node_result = state["financial_analyst_node_result"]
-    industry_node_result = state["industry_analyst_node_result"]
-    news_node_result = state["news_analyst_node_result"]
-    controversy_node_result = state["controversy_analyst_node_result"]
+    briefs = state["briefs"]
+    industry_brief = briefs["Industry analyst"]
+    overview = briefs.get(INDUSTRY_OVERVIEW, NO_BRIEF)
+    if overview != NO_BRIEF:
+        industry_brief = (
+            overview if industry_brief == NO_BRIEF else industry_brief + "\n" + overview
+        )
 
     editor_prompt = PromptTemplate.from_template("""
 You are a senior company research analyst with 15+ years of experience in corporate analysis and strategy evaluation. Your task is to prepare a comprehensive company report on {company}, a {industry} company based in {location}.
@@ -365,22 +763,34 @@ Use only the following briefs as your knowledge base. Do not add, assume, or inv
     - Write in paragraphs, not bullet points, ensuring smooth flow between ideas.
     """)
 
+    report_path = os.path.join(
+        runtime.context["report_dir"] or ".", company + " DeepAnal_report.md"
+    )
+    # Tokens stream into a partial file, which takes the report name once complete
+    partial_path = report_path + ".part"
+    report_writer = ReportWriter(partial_path, get_stream_writer(), company)
     editor_pipe = editor_prompt | llm
     logger.info(logger_prefix + "Creating final report")
-    editor_report = editor_pipe.invoke(
-        {
-            "company": company,
-            "location": location,
-            "industry": industry,
-            "company_brief": company_node_result["brief"],
-            "financial_brief": financial_node_result["brief"],
-            "industry_brief": industry_node_result["brief"],
-            "news_brief": news_node_result["brief"],
-            "sentiment_brief": controversy_node_result["brief"],
-        }
-    )
+    try:
+        # Passed per call, callbacks add to the run's usage and telemetry handlers
+        editor_report = await editor_pipe.ainvoke(
+            {
+                "company": company,
+                "location": location,
+                "industry": industry,
+                "company_brief": briefs["Company analyst"],
+                "financial_brief": briefs["Financial analyst"],
+                "industry_brief": industry_brief,
+                "news_brief": briefs["News analyst"],
+                "sentiment_brief": briefs["Controversy analyst"],
+            },
+            {"callbacks": [report_writer]},
+        )
+        # Cache hits and models without streaming arrive in one piece
+        if report_writer.streamed_bytes == 0:
+            report_writer.write(editor_report.content)
+    finally:
+        report_writer.close()
+    os.replace(partial_path, report_path)
     logger.info(logger_prefix + "Final report created")
-    with open(company + " DeepAnal_report.md", "w") as f_out:
-        f_out.write(editor_report.content)
-
-    return state
+    return {"report_path": report_path}
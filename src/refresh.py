@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+# How long each section's research stays current: fundamentals and industry
+# data change slowly, news and controversies daily
+SECTION_TTLS = {
+    "Company analyst": timedelta(days=30),
+    "Industry analyst": timedelta(days=30),
+    "Financial analyst": timedelta(days=14),
+    "News analyst": timedelta(days=1),
+    "Controversy analyst": timedelta(days=1),
+}
+NODE_RESULT_KEYS = (
+    "company_analyst_node_result",
+    "financial_analyst_node_result",
+    "industry_analyst_node_result",
+    "news_analyst_node_result",
+    "controversy_analyst_node_result",
+)
+
+
+def researched_at() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def is_fresh(node_result: dict[str, Any], now: datetime | None = None) -> bool:
+    """Whether an analyst's result is younger than its section's TTL"""
+    if "researched_at" not in node_result:
+        return False
+    age = (now or datetime.now(timezone.utc)) - datetime.fromisoformat(
+        node_result["researched_at"]
+    )
+    return age < SECTION_TTLS[node_result["node_name"]]
+
+
+def refresh_inputs(state: dict[str, Any], run_id: str) -> dict[str, Any]:
+    """Graph inputs re-researching the finished run `run_id`, given its state"""
+    return {
+        "company": state["company"],
+        "industry": state["industry"],
+        "location": state["location"],
+        "previous_run": {
+            "run_id": run_id,
+            "node_results": {
+                state[key]["node_name"]: state[key] for key in NODE_RESULT_KEYS
+            },
+            "briefs": state["briefs"],
+            "brief_evidence": state.get("brief_evidence", {}),
+        },
+    }
+
+
+def evidence(documents: list[dict[str, Any]]) -> list[list[str]]:
+    """Sorted canonical URL and content hash of the documents behind a brief"""
+    return sorted([doc["canonical_url"], doc["content_hash"]] for doc in documents)
+
+
+def previous_brief(
+    previous_run: dict[str, Any], section: str, sources: list[list[str]]
+) -> str | None:
+    """The previous run's brief of `section` if it drew on the same documents,
+    unchanged in content, else None"""
+    if previous_run.get("brief_evidence", {}).get(section) != sources:
+        return None
+    return previous_run["briefs"].get(section)
@@ -1,118 +1,462 @@
-import sys
-from typing import Any
-import time
+from typing import Any, Awaitable, Callable
 
 from langchain.prompts import PromptTemplate
+from langgraph.runtime import Runtime
 import asyncio
 
-from src.schemas import DeepAnalState
+from src.cache import IndustryCache, ReplayMissError, SearchCache
+from src.coverage import (
+    MAX_FIRST_WAVE,
+    MAX_FOLLOW_UP_ROUNDS,
+    MAX_SEARCHES_PER_ANALYST,
+    MIN_RESULTS_PER_AREA,
+    area_coverage,
+    queries_for_areas,
+    search_areas,
+)
+from src.refresh import is_fresh, researched_at
+from src.schemas import DeepAnalContext, DeepAnalState
+from src.telemetry import Tracer, add_span_attributes
 
 
 async def fetch_tavily_for_search_queries(
-    tavily_client, queries_from_llm: list[str], topic: str
+    tavily_client,
+    queries_from_llm: list[str],
+    topic: str,
+    search_cache: SearchCache | None = None,
+    tracer: Tracer | None = None,
 ):
-    results = await asyncio.gather(
-        *[
-            tavily_client.search(
-                query, return_exception=True, topic=topic, include_raw_content="text"
-            )
-            for query in queries_from_llm
-        ]
+    include_raw_content = "text"
+    tracer = tracer or Tracer()
+    results = [None] * len(queries_from_llm)
+    pending = []
+    for idx, query in enumerate(queries_from_llm):
+        # Cache hits get their own span, misses are traced around the search call
+        span = tracer.start_span(
+            "tavily.search", kind="client", query=query, topic=topic, cache_hit=True
+        )
+        cached = None
+        if search_cache is not None:
+            cached = search_cache.get(query, topic, include_raw_content)
+        if cached is not None:
+            span["attributes"].update(search_result_sizes(cached))
+            tracer.end_span(span)
+            results[idx] = cached
+        else:
+            pending.append(idx)
+
+    async def search(query: str):
+        with tracer.span(
+            "tavily.search", kind="client", query=query, topic=topic, cache_hit=False
+        ) as span:
+            try:
+                result = await tavily_client.search(
+                    query, topic=topic, include_raw_content=include_raw_content
+                )
+            except Exception as exc:
+                # A failed or timed-out search is reported in place, the others
+                # go on
+                result = exc
+            if isinstance(result, Exception):
+                span["status"] = "error"
+                span["attributes"]["error"] = repr(result)
+            else:
+                span["attributes"].update(search_result_sizes(result))
+            return result
+
+    async def shared_search(query: str):
+        if search_cache is None:
+            return await search(query)
+        # Cached as part of the search, see `SearchCache.single_flight`
+        return await search_cache.single_flight(
+            query, topic, include_raw_content, lambda: search(query)
+        )
+
+    fetched = await asyncio.gather(
+        *[shared_search(queries_from_llm[idx]) for idx in pending]
     )
+    for idx, result in zip(pending, fetched):
+        results[idx] = result
     return results
 
 
-def reseacher_pipeline(
+def search_result_sizes(search_result: dict[str, Any]) -> dict[str, int]:
+    return {
+        "results": len(search_result["results"]),
+        "raw_content_bytes": sum(
+            len((result.get("raw_content") or "").encode("utf-8"))
+            for result in search_result["results"]
+        ),
+    }
+
+
+FOLLOW_UP_QUERY_PROMPT = PromptTemplate.from_template("""
+You are preparing search queries to research {company}, which operates in the {industry} sector in {location}.
+These queries were already searched:
+{executed_queries}
+
+Their results left these areas without enough coverage:
+{uncovered_areas}
+
+Generate at most {count} new search queries, one per area above, that target only these gaps. Do not repeat the searched queries. Each query should reference {company} to make it focused and precise.
+""")
+
+
+INDUSTRY_QUERY_PROMPT = PromptTemplate.from_template("""
+You are a senior industry analyst preparing search queries about the {industry} sector in {location} as a whole. The results are shared by the research of every company in this sector, so the queries must not be about any single company.
+Your queries should be:
+- Concise, clear, and directly usable in search engines.
+- When generating queries, ensure they span these areas:
+- {industry} Industry Trends & Challenges – emerging opportunities, risks, disruptions, and regulatory pressures.
+- Market Size & Growth – current market size, forecasts, and long-term growth potential.
+
+Generate up to {max_queries} highly relevant search queries that you, as an industry analyst, would run to investigate this sector. Each query should reference {industry}.
+""")
+# Industry-wide searches run once per industry and location
+MAX_INDUSTRY_QUERIES = 4
+
+
+async def shared_industry_research(
+    state: DeepAnalState, context: DeepAnalContext, logger_prefix: str
+) -> dict[str, Any]:
+    """Search responses on the run's industry and location as a whole.
+
+    The first company of an industry and location runs the searches, the
+    others get them from the industry cache until it expires. Returns the
+    queries, their responses and a `layer_id` naming this set of results.
+    """
+    industry = state["industry"]
+    location = state["location"]
+    industry_cache = context["industry_cache"]
+    logger = context["logger"]
+    key = IndustryCache.industry_key(industry, location)
+    async with industry_cache.lock(key):
+        shared = industry_cache.get(key)
+        if shared is not None:
+            logger.info(
+                logger_prefix
+                + "Reusing shared research on "
+                + industry
+                + " in "
+                + location
+            )
+            add_span_attributes(shared_industry_hit=True)
+            return shared
+        add_span_attributes(shared_industry_hit=False)
+        logger.info(
+            logger_prefix
+            + "Researching "
+            + industry
+            + " in "
+            + location
+            + " as a whole"
+        )
+        queries = (
+            await (INDUSTRY_QUERY_PROMPT | context["query_generator_llm"]).ainvoke(
+                {
+                    "industry": industry,
+                    "location": location,
+                    "max_queries": MAX_INDUSTRY_QUERIES,
+                }
+            )
+        ).queries[:MAX_INDUSTRY_QUERIES]
+        search_results = await fetch_tavily_for_search_queries(
+            tavily_client=context["tavily_client"],
+            queries_from_llm=queries,
+            topic="general",
+            search_cache=context["search_cache"],
+            tracer=context["tracer"],
+        )
+        shared = {
+            "layer_id": IndustryCache.make_key(
+                key,
+                queries,
+                [
+                    None
+                    if isinstance(result, Exception)
+                    else [item["url"] for item in result["results"]]
+                    for result in search_results
+                ],
+            ),
+            "queries": queries,
+            "search_results": search_results,
+        }
+        # Failed searches are only kept for this run, the next one tries again
+        if not any(isinstance(result, Exception) for result in search_results):
+            industry_cache.put(key, shared)
+        return shared
+
+
+def process_search_results(
+    queries: list[str],
+    search_results: list,
+    document_store,
+    processed_search_results: list[dict[str, Any]],
+    raw_search_results: list[dict[str, Any]],
+    logger,
+    logger_prefix: str,
+) -> int:
+    """Append one wave of Tavily responses, returns the number of failed searches"""
+    failed_searches = 0
+    for query, search_result in zip(queries, search_results):
+        if isinstance(search_result, Exception):
+            logger.info(
+                logger_prefix + "Tavily raised an exception for query: " + str(query)
+            )
+            failed_searches += 1
+            raw_search_results.append({"query": query, "error": repr(search_result)})
+            continue
+        # Raw content lives once in the shared document store, results hold doc ids
+        raw_results = []
+        for tavily_result in search_result["results"]:
+            doc_id = document_store.add(
+                url=tavily_result["url"],
+                title=tavily_result["title"],
+                raw_content=tavily_result["raw_content"],
+            )
+            processed_search_result = {}
+            processed_search_result["query"] = query
+            processed_search_result["title"] = tavily_result["title"]
+            processed_search_result["url"] = tavily_result["url"]
+            processed_search_result["content"] = tavily_result["content"]
+            processed_search_result["doc_id"] = doc_id
+            processed_search_result["score"] = tavily_result["score"]
+            processed_search_results.append(processed_search_result)
+            raw_result = {
+                key: value
+                for key, value in tavily_result.items()
+                if key != "raw_content"
+            }
+            raw_result["doc_id"] = doc_id
+            raw_results.append(raw_result)
+        raw_search_results.append({**search_result, "results": raw_results})
+    return failed_searches
+
+
+async def reseacher_pipeline(
     state: DeepAnalState,
+    context: DeepAnalContext,
     node_name: str,
     prompt: PromptTemplate,
     logger_prefix: str,
     tavily_search_topic: str,
+    shared_research: Callable[[], Awaitable[dict[str, Any]]] | None = None,
 ) -> dict[str, Any]:
+    """Search in waves until every area of the prompt is covered.
+
+    The first wave runs one planned query per area. Areas with fewer than
+    `MIN_RESULTS_PER_AREA` relevant results get the closest unused planned
+    query, then one round of follow-up queries written for the gaps, within
+    `MAX_SEARCHES_PER_ANALYST` searches. `shared_research` supplies results
+    researched once for many companies, added ahead of the analyst's own.
+    """
     company = state["company"]
     industry = state["industry"]
     location = state["location"]
-    query_generator_llm = state["query_generator_llm"]
-    tavily_client = state["tavily_client"]
-    logger = state["logger"]
-    cns = state["console"]
+    query_generator_llm = context["query_generator_llm"]
+    tavily_client = context["tavily_client"]
+    search_cache = context["search_cache"]
+    document_store = context["document_store"]
+    logger = context["logger"]
+    previous = (state.get("previous_run") or {}).get("node_results", {}).get(node_name)
+    if previous is not None and is_fresh(previous):
+        logger.info(
+            logger_prefix + "Keeping results researched at " + previous["researched_at"]
+        )
+        add_span_attributes(reused=True)
+        return previous
     logger.info(logger_prefix + "Starting analysis")
-    node_result = {}
-
+    node_result = {"researched_at": researched_at()}
+
+    prompt_inputs = {
+        "company": company,
+        "industry": industry,
+        "location": location,
+        "max_queries": MAX_SEARCHES_PER_ANALYST,
+    }
     query_generation_chain = prompt | query_generator_llm
 
     logger.info(logger_prefix + "Generating search queries")
 
     try:
-        search_queries = query_generation_chain.invoke(
-            {"company": company, "industry": industry, "location": location}
-        ).queries
-        logger.info(logger_prefix + "Generated search queries: " + str(search_queries))
+        planned_queries = (await query_generation_chain.ainvoke(prompt_inputs)).queries
+        logger.info(logger_prefix + "Generated search queries: " + str(planned_queries))
     except Exception:
         logger.error(
             logger_prefix + "Error while getting queries from chain", exc_info=True
         )
-        sys.exit(1)
-    node_result["queries"] = search_queries
-
-    logger.info(logger_prefix + "Searching for queries using Tavily")
-    try:
-        search_results = asyncio.run(
-            fetch_tavily_for_search_queries(
+        raise
+
+    areas = search_areas(prompt.format(**prompt_inputs))
+    # Without areas to cover there is nothing to adapt to, every query runs
+    wave = (queries_for_areas(planned_queries, areas) or planned_queries)[
+        :MAX_FIRST_WAVE
+    ]
+    search_queries = []
+    follow_up_queries = []
+    follow_up_rounds = 0
+    failed_searches = 0
+    failed_shared_searches = 0
+    processed_search_results = []
+    raw_search_results = []
+    coverage = dict.fromkeys(areas, 0)
+    if shared_research is not None:
+        shared = await shared_research()
+        failed_shared_searches = process_search_results(
+            shared["queries"],
+            shared["search_results"],
+            document_store,
+            processed_search_results,
+            raw_search_results,
+            logger,
+            logger_prefix,
+        )
+        # Results without a body have nothing to brief the industry from
+        node_result["industry_layer"] = {
+            "layer_id": shared["layer_id"],
+            "queries": shared["queries"],
+            "doc_ids": list(
+                dict.fromkeys(
+                    result["doc_id"]
+                    for result in processed_search_results
+                    if document_store.get(result["doc_id"])["blob_id"] is not None
+                )
+            ),
+        }
+    # Shared industry results do not cover the company-specific areas
+    shared_results = len(processed_search_results)
+    while wave:
+        wave = wave[: MAX_SEARCHES_PER_ANALYST - len(search_queries)]
+        logger.info(
+            logger_prefix + "Searching for " + str(len(wave)) + " queries using Tavily"
+        )
+        try:
+            search_results = await fetch_tavily_for_search_queries(
                 tavily_client=tavily_client,
-                queries_from_llm=search_queries,
+                queries_from_llm=wave,
                 topic=tavily_search_topic,
+                search_cache=search_cache,
+                tracer=context["tracer"],
+            )
+        except Exception:
+            logger.error(
+                logger_prefix + "Error while searching for queries using Tavily",
+                exc_info=True,
             )
+            raise
+        search_queries += wave
+        failed_searches += process_search_results(
+            wave,
+            search_results,
+            document_store,
+            processed_search_results,
+            raw_search_results,
+            logger,
+            logger_prefix,
         )
-    except Exception:
-        logger.error(
-            logger_prefix + "Error while searching for queries using Tavily",
-            exc_info=True,
+
+        coverage = area_coverage(areas, processed_search_results[shared_results:])
+        gaps = [
+            area for area, count in coverage.items() if count < MIN_RESULTS_PER_AREA
+        ]
+        if not gaps or len(search_queries) >= MAX_SEARCHES_PER_ANALYST:
+            break
+        logger.info(logger_prefix + "Areas without enough results: " + str(gaps))
+        wave = queries_for_areas(
+            [query for query in planned_queries if query not in search_queries], gaps
         )
-        sys.exit(1)
-    node_result["raw_search_results"] = search_results
-    successful_results = len(search_results)
-    processed_search_results = []
-    for query, search_result in zip(search_queries, search_results):
-        if isinstance(search_result, Exception):
-            logger.info(
-                logger_prefix + "Tavily raised an exception for query: " + str(query)
-            )
-            successful_results -= 1
+        if wave or follow_up_rounds >= MAX_FOLLOW_UP_ROUNDS:
             continue
-        for tavily_result in search_result["results"]:
-            processed_search_result = {}
-            processed_search_result["query"] = query
-            processed_search_result["title"] = tavily_result["title"]
-            processed_search_result["url"] = tavily_result["url"]
-            processed_search_result["content"] = tavily_result["content"]
-            processed_search_result["raw_content"] = tavily_result["raw_content"]
-            processed_search_result["score"] = tavily_result["score"]
-            processed_search_results.append(processed_search_result)
+        follow_up_rounds += 1
+        try:
+            wave = (
+                await (FOLLOW_UP_QUERY_PROMPT | query_generator_llm).ainvoke(
+                    {
+                        **prompt_inputs,
+                        "executed_queries": "\n".join(
+                            "- " + query for query in search_queries
+                        ),
+                        "uncovered_areas": "\n".join("- " + area for area in gaps),
+                        "count": len(gaps),
+                    }
+                )
+            ).queries
+        except ReplayMissError:
+            raise
+        except Exception:
+            # Follow-ups only deepen the research, the results so far still stand
+            logger.warning(
+                logger_prefix + "Error while generating follow-up queries",
+                exc_info=True,
+            )
+            break
+        wave = [query for query in wave if query not in search_queries][
+            : min(len(gaps), MAX_SEARCHES_PER_ANALYST - len(search_queries))
+        ]
+        follow_up_queries += wave
+        logger.info(logger_prefix + "Follow-up search queries: " + str(wave))
+
+    node_result["queries"] = search_queries
+    node_result["coverage"] = coverage
+    node_result["uncovered_areas"] = [
+        area for area, count in coverage.items() if count < MIN_RESULTS_PER_AREA
+    ]
+    add_span_attributes(
+        planned_queries=len(planned_queries),
+        searches=len(search_queries),
+        follow_up_queries=len(follow_up_queries),
+        uncovered_areas=len(node_result["uncovered_areas"]),
+    )
+    # Full Tavily responses are kept for inspection but stay out of graph state
+    node_result["raw_search_results_id"] = document_store.blob_store.put_json(
+        raw_search_results
+    )
     logger.info(
         logger_prefix
         + "Successful searches: "
-        + str(successful_results)
+        + str(len(search_queries) - failed_searches)
         + " Failed searches: "
-        + str(len(search_queries) - successful_results)
+        + str(failed_searches)
+        + " Skipped planned queries: "
+        + str(len([query for query in planned_queries if query not in search_queries]))
+        + (
+            ""
+            if shared_research is None
+            else " Failed shared industry searches: " + str(failed_shared_searches)
+        )
     )
     node_result["processed_search_results"] = processed_search_results
+    # Index entries of the documents, so a resumed run can find their bodies
+    node_result["documents"] = [
+        dict(document_store.get(doc_id))
+        for doc_id in dict.fromkeys(
+            result["doc_id"] for result in processed_search_results
+        )
+    ]
     logger.info(
         logger_prefix
         + "Number of processed results: "
         + str(len(processed_search_results))
     )
-    node_result["text_content"] = "\n".join(
-        [item["content"] for item in processed_search_results]
+    # Documents are cleaned as they are stored, see `src.cleaning`
+    raw_tokens = sum(doc.get("raw_tokens", 0) for doc in node_result["documents"])
+    content_tokens = sum(
+        doc.get("content_tokens", 0) for doc in node_result["documents"]
+    )
+    add_span_attributes(raw_tokens=raw_tokens, content_tokens=content_tokens)
+    logger.info(
+        logger_prefix
+        + "Cleaning cut documents from "
+        + str(raw_tokens)
+        + " to "
+        + str(content_tokens)
+        + " tokens"
     )
     node_result["node_name"] = node_name
     return node_result
 
 
-def financial_analyst(state: DeepAnalState):
-    logger = state["logger"]
-    financial_analysis_start = time.perf_counter()
-
+async def financial_analyst(state: DeepAnalState, runtime: Runtime[DeepAnalContext]):
     financial_query_generation_prompt = PromptTemplate.from_template("""
 You are a senior financial analyst with 15 years of experience in corporate finance, valuation, and investment analysis across multiple industries. Your expertise lies in examining a company’s fundraising history, financial performance, and profitability drivers to understand its financial health and growth prospects.
 You have been hired to research {company}, which operates in the {industry} sector. Your job is not to provide analysis yet, but to prepare search queries that will help gather intelligence about this company’s financial position.
@@ -127,25 +471,17 @@ Your queries should be:
 - Financial Statements & Key Metrics – balance sheet, income statement, cash flow, profitability ratios.
 - Revenue & Profit Sources – revenue streams, cost structure, margins, and earnings drivers.
 
-Generate 6 highly relevant, industry-specific search queries that you, as a financial analyst, would run to investigate this company. Each query should reference both {company} and {industry} to make it focused and precise.
+Generate up to {max_queries} highly relevant, industry-specific search queries that you, as a financial analyst, would run to investigate this company. Each query should reference both {company} and {industry} to make it focused and precise.
 """)
 
-    research_result = reseacher_pipeline(
+    research_result = await reseacher_pipeline(
         state=state,
+        context=runtime.context,
         node_name="Financial analyst",
         prompt=financial_query_generation_prompt,
         logger_prefix="Financial analyst: ",
         tavily_search_topic="finance",
     )
-    financial_analysis_end = time.perf_counter()
-    logger.info(
-        "Financial analyst: "
-        + "Time taken for node: "
-        + time.strftime(
-            "%M mins %S secs",
-            time.gmtime(financial_analysis_end - financial_analysis_start),
-        )
-    )
     # import json
     #
     # with open("financial_node_output.json", "w") as f_out:
@@ -153,10 +489,7 @@ Generate 6 highly relevant, industry-specific search queries that you, as a fina
     return {"financial_analyst_node_result": research_result}
 
 
-def industry_analyst(state: DeepAnalState):
-    logger = state["logger"]
-    industry_analysis_start = time.perf_counter()
-
+async def industry_analyst(state: DeepAnalState, runtime: Runtime[DeepAnalContext]):
     industry_query_generation_prompt = PromptTemplate.from_template("""
 You are a senior industry analyst with 15 years of experience in market research, competitive intelligence, and sectoral strategy assessment across multiple industries. Your expertise lies in understanding how companies are positioned within their industry, identifying competitors, and analyzing long-term market trends and challenges.
 You have been hired to research {company}, which operates in the {industry} sector. Your job is not to provide analysis yet, but to prepare search queries that will help gather intelligence about the company’s position within its industry and the dynamics of the sector as a whole.
@@ -168,36 +501,26 @@ Your queries should be:
 - When generating queries, ensure they span these areas, but frame them in terms of the company within its industry:
 - Market Position – how {company} is positioned within the {industry} sector.
 - Competitors – key rivals, market share comparisons, industry competition.
-- {industry} Industry Trends & Challenges – emerging opportunities, risks, disruptions, and regulatory pressures.
-- Market Size & Growth – current market size, forecasts, and long-term growth potential.
+Trends, challenges and the size of the {industry} market as a whole are researched separately, leave them out.
 
-Generate 6 highly relevant, industry-specific search queries that you, as an industry analyst, would run to investigate this company. Each query should reference both {company} and {industry} to make it focused and precise.
+Generate up to {max_queries} highly relevant, industry-specific search queries that you, as an industry analyst, would run to investigate this company. Each query should reference both {company} and {industry} to make it focused and precise.
 """)
-    research_result = reseacher_pipeline(
+    research_result = await reseacher_pipeline(
         state=state,
+        context=runtime.context,
         node_name="Industry analyst",
         prompt=industry_query_generation_prompt,
         logger_prefix="Industry analyst: ",
         tavily_search_topic="general",
-    )
-
-    industry_analysis_end = time.perf_counter()
-
-    logger.info(
-        "Industry analyst: "
-        + "Time taken for node: "
-        + time.strftime(
-            "%M mins %S secs",
-            time.gmtime(industry_analysis_end - industry_analysis_start),
-        )
+        # Sector-wide trends and market size are shared across companies
+        shared_research=lambda: shared_industry_research(
+            state, runtime.context, "Industry analyst: "
+        ),
     )
     return {"industry_analyst_node_result": research_result}
 
 
-def company_analyst(state: DeepAnalState):
-    logger = state["logger"]
-    company_analysis_start = time.perf_counter()
-
+async def company_analyst(state: DeepAnalState, runtime: Runtime[DeepAnalContext]):
     company_query_generation_prompt = PromptTemplate.from_template("""
 You are a senior company researcher with 15 years of experience in corporate research, equity analysis, and business strategy assessment across multiple industries. Your expertise lies in uncovering a company’s fundamentals, business drivers, leadership, and long-term positioning in its sector.
 You have been hired to research {company}, which operates in the {industry} sector. Your job is not to provide analysis yet, but to prepare search queries that will help gather intelligence about this company’s core operations and strategy.
@@ -212,32 +535,20 @@ Your queries should be:
 - Leadership Team – executives, board members, founders.
 - Business Model & Strategy – revenue sources, competitive advantage, growth vision.
 
-Generate 6 highly relevant, industry-specific search queries that you, as a company researcher, would run to investigate this company. Each query should reference the {company} to make it focused and precise.
+Generate up to {max_queries} highly relevant, industry-specific search queries that you, as a company researcher, would run to investigate this company. Each query should reference the {company} to make it focused and precise.
 """)
-    research_result = reseacher_pipeline(
+    research_result = await reseacher_pipeline(
         state=state,
+        context=runtime.context,
         node_name="Company analyst",
         prompt=company_query_generation_prompt,
         logger_prefix="Company analyst: ",
         tavily_search_topic="general",
     )
-
-    company_analysis_end = time.perf_counter()
-    logger.info(
-        "Company analyst: "
-        + "Time taken for node: "
-        + time.strftime(
-            "%M mins %S secs",
-            time.gmtime(company_analysis_end - company_analysis_start),
-        )
-    )
     return {"company_analyst_node_result": research_result}
 
 
-def news_analyst(state: DeepAnalState):
-    logger = state["logger"]
-    news_analysis_start = time.perf_counter()
-
+async def news_analyst(state: DeepAnalState, runtime: Runtime[DeepAnalContext]):
     news_query_generation_prompt = PromptTemplate.from_template("""
 You are a senior news and media analyst with 15 years of experience in corporate communications tracking, press monitoring, and market-moving news analysis. Your expertise lies in identifying recent announcements, partnerships, and press releases that may impact a company’s perception, reputation, and business outlook.
 You have been hired to research {company}, which operates in the {industry} sector. Your job is not to provide analysis yet, but to prepare search queries that will help gather the most recent updates and news flow about the company.
@@ -251,32 +562,20 @@ Your queries should be:
 - Press Releases – official statements, product launches, financial disclosures.
 - New Partnerships – alliances, collaborations, and joint ventures.
 
-Generate 6 highly relevant, company-specific search queries that you, as a news analyst, would run to investigate this company. Each query should reference both {company} and {industry} to make it focused and precise.
+Generate up to {max_queries} highly relevant, company-specific search queries that you, as a news analyst, would run to investigate this company. Each query should reference both {company} and {industry} to make it focused and precise.
 """)
-    research_result = reseacher_pipeline(
+    research_result = await reseacher_pipeline(
         state=state,
+        context=runtime.context,
         node_name="News analyst",
         prompt=news_query_generation_prompt,
         logger_prefix="News analyst: ",
         tavily_search_topic="news",
     )
-
-    news_analysis_end = time.perf_counter()
-    logger.info(
-        "News analyst: "
-        + "Time taken for node: "
-        + time.strftime(
-            "%M mins %S secs",
-            time.gmtime(news_analysis_end - news_analysis_start),
-        )
-    )
     return {"news_analyst_node_result": research_result}
 
 
-def controversy_analyst(state: DeepAnalState):
-    logger = state["logger"]
-    controversy_analysis_start = time.perf_counter()
-
+async def controversy_analyst(state: DeepAnalState, runtime: Runtime[DeepAnalContext]):
     controversy_query_generation_prompt = PromptTemplate.from_template("""
 You are a senior sentiment and controversy analyst with 15 years of experience in media monitoring, reputation analysis, and corporate risk intelligence. Your expertise lies in identifying public perception issues, controversies, and negative events that could affect a company’s reputation and stakeholder trust.
 You have been hired to research {company}, which operates in the {industry} sector. Your job is not to provide analysis yet, but to prepare search queries that will help gather intelligence about the company’s reputation, controversies, and sentiment in the market.
@@ -291,23 +590,14 @@ Your queries should be:
 - Social & Ethical Issues – labor disputes, ESG controversies, activist criticism.
 - Negative News & Scandals – fraud, governance failures, scandals, or crises.
 
-Generate 6 highly relevant, industry-specific search queries that you, as a sentiment analyst, would run to investigate this company. Each query should reference both {company} and {industry} to make it focused and precise.
+Generate up to {max_queries} highly relevant, industry-specific search queries that you, as a sentiment analyst, would run to investigate this company. Each query should reference both {company} and {industry} to make it focused and precise.
 """)
-    research_result = reseacher_pipeline(
+    research_result = await reseacher_pipeline(
         state=state,
+        context=runtime.context,
         node_name="Controversy analyst",
         prompt=controversy_query_generation_prompt,
         logger_prefix="Controversy analyst: ",
         tavily_search_topic="general",
     )
-
-    controversy_analysis_end = time.perf_counter()
-    logger.info(
-        "Controversy analyst: "
-        + "Time taken for node: "
-        + time.strftime(
-            "%M mins %S secs",
-            time.gmtime(controversy_analysis_end - controversy_analysis_start),
-        )
-    )
     return {"controversy_analyst_node_result": research_result}
@@ -0,0 +1,139 @@
+import re
+import zlib
+from typing import Any
+
+import numpy as np
+
+from src.packing import count_tokens, split_passages
+
+HASHED_FEATURES = 2**12
+DEFAULT_CHUNKS_PER_CATEGORY = 6
+MIN_CHUNK_SIMILARITY = 0.01
+
+TERM_PATTERN = re.compile(r"[a-z0-9]+")
+SUFFIX_PATTERN = re.compile(r"(?<=[a-z]{4})(ing|ed|es|s)$")
+
+
+def normalize_term(term: str) -> str:
+    """Crude suffix stripping so "partnerships" matches "partnership" """
+    return SUFFIX_PATTERN.sub("", term)
+
+
+def hashed_term_counts(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """Feature indices and counts of the hashed unigrams and bigrams of `text`"""
+    terms = [normalize_term(term) for term in TERM_PATTERN.findall(text.lower())]
+    grams = terms + [left + " " + right for left, right in zip(terms, terms[1:])]
+    if not grams:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    hashed = np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) % HASHED_FEATURES for gram in grams),
+        dtype=np.int64,
+        count=len(grams),
+    )
+    features, counts = np.unique(hashed, return_counts=True)
+    return features, counts.astype(np.float32)
+
+
+class HashedTfidfVectorizer:
+    """TF-IDF over hashed unigrams and bigrams, L2-normalized dense rows"""
+
+    def __init__(self, idf: np.ndarray | None = None):
+        self.idf = idf
+
+    def fit_transform(self, texts: list[str]) -> np.ndarray:
+        term_counts = [hashed_term_counts(text) for text in texts]
+        document_frequency = np.zeros(HASHED_FEATURES, dtype=np.float32)
+        for features, _ in term_counts:
+            document_frequency[features] += 1
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(
+            np.float32
+        )
+        return self._vectorize(term_counts)
+
+    def transform(self, texts: list[str]) -> np.ndarray:
+        return self._vectorize([hashed_term_counts(text) for text in texts])
+
+    def _vectorize(
+        self, term_counts: list[tuple[np.ndarray, np.ndarray]]
+    ) -> np.ndarray:
+        matrix = np.zeros((len(term_counts), HASHED_FEATURES), dtype=np.float32)
+        for row, (features, counts) in enumerate(term_counts):
+            matrix[row, features] = (1 + np.log(counts)) * self.idf[features]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+
+class ChunkIndex:
+    """In-memory vector index over document chunks, built once per run.
+
+    Rows of `matrix` are unit vectors, so a batch of queries is scored against
+    every chunk with one matrix product. A search can be limited to the chunks
+    of some documents, so sections share one index but not their sources.
+    """
+
+    def __init__(
+        self,
+        vectorizer: HashedTfidfVectorizer,
+        matrix: np.ndarray,
+        chunks: list[dict[str, Any]],
+    ):
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.chunks = chunks
+        self.chunk_doc_ids = np.array([chunk["doc_id"] for chunk in chunks])
+
+    @classmethod
+    def build(cls, docs: list[dict[str, Any]]) -> "ChunkIndex":
+        """Chunk and embed docs, each a dict with "doc_id", "title" and "text" """
+        chunks = []
+        for doc in docs:
+            for position, text in enumerate(split_passages(doc["text"])):
+                chunks.append(
+                    {
+                        "doc_id": doc["doc_id"],
+                        "title": doc["title"],
+                        "position": position,
+                        "text": text,
+                        "tokens": count_tokens(text),
+                    }
+                )
+        vectorizer = HashedTfidfVectorizer()
+        matrix = vectorizer.fit_transform([chunk["text"] for chunk in chunks])
+        return cls(vectorizer, matrix, chunks)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(
+        self,
+        queries: list[str],
+        k: int = DEFAULT_CHUNKS_PER_CATEGORY,
+        min_similarity: float = MIN_CHUNK_SIMILARITY,
+        doc_ids: set[str] | None = None,
+    ) -> list[list[dict[str, Any]]]:
+        """Top-k chunks per query, each chunk copied with its "score".
+
+        With `doc_ids` only chunks of those documents are returned.
+        """
+        searched = len(self.chunks)
+        if doc_ids is not None and searched > 0:
+            allowed = np.isin(self.chunk_doc_ids, list(doc_ids))
+            searched = int(allowed.sum())
+        if searched == 0:
+            return [[] for _ in queries]
+        similarities = self.vectorizer.transform(queries) @ self.matrix.T
+        if searched < len(self.chunks):
+            similarities[:, ~allowed] = -np.inf
+        k = min(k, searched)
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-similarities[row, candidates])]
+            results.append(
+                [
+                    {**self.chunks[idx], "score": float(similarities[row, idx])}
+                    for idx in ranked
+                    if similarities[row, idx] >= min_similarity
+                ]
+            )
+        return results
@@ -0,0 +1,144 @@
+import json
+from typing import Any, Callable
+
+from langchain.chat_models import init_chat_model
+from langchain_core.caches import BaseCache
+from langchain_core.runnables import Runnable, RunnableConfig
+from pydantic import BaseModel, Field, model_validator
+
+from src.limiter import RateLimitedRunnable, RateLimiter
+
+# LLM call sites of the workflow, each routed to one model tier
+CALL_SITES = ("query_generation", "briefing", "editor")
+
+
+class ModelTier(BaseModel):
+    """A chat model, and the tier taking over its failed or slow calls"""
+
+    model: str
+    model_provider: str | None = None
+    params: dict[str, Any] = Field(default_factory=dict)
+    fallback: str | None = None
+
+
+class ModelRouting(BaseModel):
+    """Model tiers and the tier serving each call site"""
+
+    tiers: dict[str, ModelTier]
+    routes: dict[str, str]
+
+    @model_validator(mode="after")
+    def check_tiers(self) -> "ModelRouting":
+        for site in CALL_SITES:
+            if site not in self.routes:
+                raise ValueError("No model tier routed for call site: " + site)
+        for site, tier in self.routes.items():
+            if site not in CALL_SITES:
+                raise ValueError("Unknown LLM call site: " + str(site))
+            if tier not in self.tiers:
+                raise ValueError("Unknown model tier: " + str(tier))
+        for tier in self.tiers.values():
+            if tier.fallback is not None and tier.fallback not in self.tiers:
+                raise ValueError("Unknown fallback model tier: " + str(tier.fallback))
+        return self
+
+
+DEFAULT_MODEL_ROUTING = ModelRouting(
+    tiers={
+        "strong": ModelTier(
+            model="gemini-2.0-flash",
+            model_provider="google_genai",
+            params={"temperature": 0},
+            fallback="local",
+        ),
+        "fast": ModelTier(
+            model="gemini-2.0-flash-lite",
+            model_provider="google_genai",
+            params={"temperature": 0},
+            fallback="local",
+        ),
+        "local": ModelTier(model="ollama:deepseek-r1:7b", params={"reasoning": False}),
+    },
+    # Many small calls on the cheap tier, the one report on the strongest
+    routes={"query_generation": "fast", "briefing": "fast", "editor": "strong"},
+)
+
+
+def load_model_routing(path: str | None) -> ModelRouting:
+    """Read tier and route overrides from a JSON file with "tiers" / "routes" """
+    if path is None:
+        return DEFAULT_MODEL_ROUTING
+    with open(path) as f_in:
+        overrides = json.load(f_in)
+    unknown = set(overrides) - {"tiers", "routes"}
+    if unknown:
+        raise ValueError("Unknown model routing keys: " + ", ".join(sorted(unknown)))
+    tiers = {
+        name: tier.model_dump() for name, tier in DEFAULT_MODEL_ROUTING.tiers.items()
+    }
+    for name, values in overrides.get("tiers", {}).items():
+        tiers[name] = {**tiers.get(name, {}), **values}
+    return ModelRouting.model_validate(
+        {
+            "tiers": tiers,
+            "routes": {**DEFAULT_MODEL_ROUTING.routes, **overrides.get("routes", {})},
+        }
+    )
+
+
+class LazyChatModel(Runnable):
+    """A chat model built on its first call, so tiers that never run cost nothing"""
+
+    def __init__(self, build: Callable[[], Runnable]):
+        self.build = build
+        self._model = None
+
+    @property
+    def model(self) -> Runnable:
+        if self._model is None:
+            self._model = self.build()
+        return self._model
+
+    def invoke(self, input: Any, config: RunnableConfig | None = None, **kwargs):
+        return self.model.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: RunnableConfig | None = None, **kwargs):
+        return await self.model.ainvoke(input, config, **kwargs)
+
+    def with_structured_output(self, schema: Any, **kwargs) -> "LazyChatModel":
+        return LazyChatModel(
+            lambda: self.model.with_structured_output(schema, **kwargs)
+        )
+
+
+def routed_llms(
+    routing: ModelRouting, limiter: RateLimiter, cache: BaseCache | None = None
+) -> dict[str, RateLimitedRunnable]:
+    """Rate limited model of each call site, with its tier's fallback as alternate.
+
+    Call sites on the same tier share one model instance.
+    """
+    models = {}
+
+    def tier_model(name: str) -> LazyChatModel:
+        if name not in models:
+            tier = routing.tiers[name]
+            models[name] = LazyChatModel(
+                lambda: init_chat_model(
+                    tier.model,
+                    model_provider=tier.model_provider,
+                    cache=cache,
+                    **tier.params,
+                )
+            )
+        return models[name]
+
+    llms = {}
+    for site, name in routing.routes.items():
+        fallback = routing.tiers[name].fallback
+        llms[site] = RateLimitedRunnable(
+            tier_model(name),
+            limiter,
+            None if fallback is None else tier_model(fallback),
+        )
+    return llms
@@ -9,28 +9,59 @@ from pydantic import BaseModel, Field
 from rich.console import Console
 from tavily import TavilyClient
 
+from src.cache import IndustryCache, LLMCache, SearchCache
+from src.coverage import MAX_SEARCHES_PER_ANALYST
+from src.store import DocumentStore
+from src.telemetry import Tracer
+
 
 class DeepAnalState(TypedDict):
+    """Checkpointable run data, large payloads are blob store ids"""
+
     company: str
     location: str
     industry: str
-    llm: BaseChatModel
-    tavily_client: TavilyClient
-    logger: Logger
     company_analyst_node_result: dict[str, Any]
     financial_analyst_node_result: dict[str, Any]
     news_analyst_node_result: dict[str, Any]
     controversy_analyst_node_result: dict[str, Any]
     industry_analyst_node_result: dict[str, Any]
+    relevant_docs: dict[str, list[dict[str, Any]]]
+    briefs: dict[str, str]
+    brief_evidence: dict[str, list[list[str]]]
+    # Results of the run being refreshed, see `src.refresh`
+    previous_run: dict[str, Any]
     messages: Annotated[list[AnyMessage], add_messages]
+    report_path: str
+
+
+class DeepAnalContext(TypedDict):
+    """Run-scoped services, passed to nodes through LangGraph's runtime context"""
+
     console: Console
-    llm_usage_callback: UsageMetadataCallbackHandler
+    logger: Logger
     query_generator_llm: BaseChatModel
+    briefing_llm: BaseChatModel
+    editor_llm: BaseChatModel
+    tavily_client: TavilyClient
+    search_cache: SearchCache
+    industry_cache: IndustryCache
+    llm_cache: LLMCache
+    llm_usage_callback: UsageMetadataCallbackHandler
+    # Usage of each model tier's call sites, fallback calls included
+    llm_usage_by_tier: dict[str, UsageMetadataCallbackHandler]
+    tracer: Tracer
+    document_store: DocumentStore
+    report_dir: str | None
+    briefing_token_budget: int | None
+    documents_per_analyst: int | None
 
 
 class SearchQueries(BaseModel):
     """Queries for search engines based on desciption and role"""
 
     queries: list[str] = Field(
-        description="Search queries based on description", max_length=6, min_length=6
+        description="Search queries based on description",
+        max_length=MAX_SEARCHES_PER_ANALYST,
+        min_length=1,
     )
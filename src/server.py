@@ -0,0 +1,368 @@
+import asyncio
+import json
+import os
+import signal
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from http import HTTPStatus
+from logging import Logger
+from typing import Any
+from uuid import uuid4
+
+from langgraph.graph.state import CompiledStateGraph
+from rich.console import Console
+
+from src.archive import archive_finished_run
+from src.batch import REQUIRED_FIELDS
+from src.graph import checkpointed_workflow, run_config
+from src.limiter import ProviderLimits
+from src.routing import ModelRouting
+from src.processors import (
+    build_run_context,
+    build_services,
+    close_connections,
+    tier_usage_totals,
+    usage_totals,
+)
+
+MAX_BODY_BYTES = 64 * 1024
+FINISHED_STATUSES = ("done", "failed")
+
+
+class ResearchService:
+    """Research jobs served from one process with warm models and clients.
+
+    The LLM, Tavily client, caches and the checkpointed workflow are built once
+    and shared by every job. Submitted jobs wait in a bounded queue and
+    `concurrency` workers research them; a full queue rejects new jobs rather
+    than letting latency grow without bound.
+    """
+
+    def __init__(
+        self,
+        services: dict[str, Any],
+        graph: CompiledStateGraph,
+        output_dir: str,
+        concurrency: int,
+        queue_size: int,
+        cns: Console,
+        logger: Logger,
+        blob_dir: str | None = None,
+        trace_path: str | None = None,
+        trace_format: str = "jsonl",
+        job_history: int = 1000,
+    ):
+        self.services = services
+        self.graph = graph
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.cns = cns
+        self.logger = logger
+        self.blob_dir = blob_dir
+        self.trace_path = trace_path
+        self.trace_format = trace_format
+        self.job_history = job_history
+        self.jobs: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.running = 0
+        self._workers: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def submit(self, user_request: dict[str, str]) -> dict[str, Any]:
+        """Queue a research job, raises `asyncio.QueueFull` when at capacity"""
+        job_id = uuid4().hex[:12]
+        job = {
+            "job_id": job_id,
+            **user_request,
+            "status": "queued",
+            "submitted_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.queue.put_nowait(job_id)
+        self.jobs[job_id] = job
+        self._forget_finished_jobs()
+        return job
+
+    def _forget_finished_jobs(self) -> None:
+        finished = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job["status"] in FINISHED_STATUSES
+        ]
+        for job_id in finished[: max(0, len(self.jobs) - self.job_history)]:
+            del self.jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._research(self.jobs[job_id])
+            finally:
+                self.queue.task_done()
+
+    async def _research(self, job: dict[str, Any]) -> None:
+        logger_prefix = "Server: "
+        company = job["company"]
+        job["status"] = "running"
+        job["started_at"] = datetime.now(timezone.utc).isoformat()
+        self.running += 1
+        run_start = time.perf_counter()
+        self.logger.info(
+            logger_prefix + "Starting job " + job["job_id"] + " for " + company
+        )
+        context = build_run_context(
+            self.services,
+            company=company,
+            console=self.cns,
+            logger=self.logger,
+            # Per-job directory, so jobs for the same company never collide
+            report_dir=os.path.join(self.output_dir, job["job_id"]),
+            blob_dir=self.blob_dir,
+        )
+        os.makedirs(context["report_dir"], exist_ok=True)
+        job["trace_id"] = context["tracer"].trace_id
+        try:
+            # The job id doubles as run id, `deepanal --resume` continues a failed job
+            final_state = await self.graph.ainvoke(
+                {field: job[field] for field in REQUIRED_FIELDS},
+                run_config(job["job_id"]),
+                context=context,
+            )
+            job["status"] = "done"
+            job["report_path"] = final_state["report_path"]
+        except Exception as exc:
+            self.logger.error(
+                logger_prefix + "Job " + job["job_id"] + " failed", exc_info=True
+            )
+            job["status"] = "failed"
+            job["error"] = repr(exc)
+        finally:
+            self.running -= 1
+        job.update(usage_totals(context["llm_usage_callback"]))
+        job["usage_by_tier"] = tier_usage_totals(context["llm_usage_by_tier"])
+        job["seconds"] = round(time.perf_counter() - run_start, 3)
+        if job["status"] == "done":
+            archive_finished_run(
+                self.services["archive"], job["job_id"], final_state, context, job
+            )
+        if self.trace_path is not None:
+            context["tracer"].export(self.trace_path, self.trace_format)
+        self.logger.info(
+            logger_prefix
+            + "Finished job "
+            + job["job_id"]
+            + " with status "
+            + job["status"]
+            + " in "
+            + time.strftime("%M mins %S secs", time.gmtime(job["seconds"]))
+        )
+
+    def health(self) -> dict[str, Any]:
+        return {
+            "status": "ok",
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "running": self.running,
+            "concurrency": self.concurrency,
+            "search_cache": {
+                "hits": self.services["search_cache"].hits,
+                "misses": self.services["search_cache"].misses,
+            },
+            "llm_cache": {
+                "hits": self.services["llm_cache"].hits,
+                "misses": self.services["llm_cache"].misses,
+            },
+        }
+
+    def route(self, method: str, path: str, body: bytes) -> tuple[HTTPStatus, Any]:
+        """Map a request to a status and a JSON payload, or report text"""
+        parts = [part for part in path.split("?")[0].split("/") if part]
+        if method == "GET" and parts == ["health"]:
+            return HTTPStatus.OK, self.health()
+        if parts == ["jobs"] and method == "POST":
+            try:
+                user_request = json.loads(body or b"{}")
+            except ValueError:
+                return HTTPStatus.BAD_REQUEST, {"error": "Body is not valid JSON"}
+            if not isinstance(user_request, dict):
+                return HTTPStatus.BAD_REQUEST, {"error": "Body must be an object"}
+            missing = [
+                field
+                for field in REQUIRED_FIELDS
+                if not isinstance(user_request.get(field), str)
+                or not user_request[field].strip()
+            ]
+            if missing:
+                return HTTPStatus.BAD_REQUEST, {
+                    "error": "Missing fields: " + ", ".join(missing)
+                }
+            try:
+                job = self.submit(
+                    {field: user_request[field].strip() for field in REQUIRED_FIELDS}
+                )
+            except asyncio.QueueFull:
+                return HTTPStatus.SERVICE_UNAVAILABLE, {
+                    "error": "Job queue is full, retry later"
+                }
+            return HTTPStatus.ACCEPTED, job
+        if parts == ["jobs"] and method == "GET":
+            return HTTPStatus.OK, list(self.jobs.values())
+        if len(parts) in (2, 3) and parts[0] == "jobs" and method == "GET":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return HTTPStatus.NOT_FOUND, {"error": "Unknown job: " + parts[1]}
+            if len(parts) == 2:
+                return HTTPStatus.OK, job
+            if parts[2] == "report":
+                if job["status"] != "done":
+                    return HTTPStatus.CONFLICT, {
+                        "error": "Job is " + job["status"] + ", no report yet"
+                    }
+                with open(job["report_path"]) as f_in:
+                    return HTTPStatus.OK, f_in.read()
+        return HTTPStatus.NOT_FOUND, {"error": "No route for " + method + " " + path}
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve HTTP/1.1 requests on one connection until the client is done"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                content_length = int(headers.get("content-length", 0))
+                if content_length > MAX_BODY_BYTES:
+                    status, payload = (
+                        HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                        {"error": "Request body too large"},
+                    )
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(content_length)
+                    status, payload = self.route(method, target, body)
+                    keep_alive = (
+                        version == "HTTP/1.1"
+                        and headers.get("connection", "").lower() != "close"
+                    )
+                if isinstance(payload, str):
+                    content_type = "text/markdown; charset=utf-8"
+                    response_body = payload.encode("utf-8")
+                else:
+                    content_type = "application/json"
+                    response_body = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    (
+                        "HTTP/1.1 "
+                        + str(status.value)
+                        + " "
+                        + status.phrase
+                        + "\r\nContent-Type: "
+                        + content_type
+                        + "\r\nContent-Length: "
+                        + str(len(response_body))
+                        + "\r\nConnection: "
+                        + ("keep-alive" if keep_alive else "close")
+                        + "\r\n\r\n"
+                    ).encode("latin-1")
+                    + response_body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(
+    host: str,
+    port: int,
+    output_dir: str,
+    concurrency: int,
+    queue_size: int,
+    search_cache_mode: str,
+    llm_cache_mode: str,
+    cache_dir: str,
+    provider_limits: dict[str, ProviderLimits],
+    checkpoint_dir: str,
+    cns: Console,
+    logger: Logger,
+    blob_dir: str | None = None,
+    trace_path: str | None = None,
+    trace_format: str = "jsonl",
+    model_routing: ModelRouting | None = None,
+    archive_dir: str | None = None,
+) -> None:
+    logger_prefix = "Server: "
+    os.makedirs(output_dir, exist_ok=True)
+    # Built once, every job reuses the models, connection pools and caches
+    services = build_services(
+        search_cache_mode=search_cache_mode,
+        llm_cache_mode=llm_cache_mode,
+        cache_dir=cache_dir,
+        provider_limits=provider_limits,
+        logger=logger,
+        model_routing=model_routing,
+        archive_dir=archive_dir,
+    )
+    async with checkpointed_workflow(checkpoint_dir) as graph:
+        service = ResearchService(
+            services,
+            graph,
+            output_dir=output_dir,
+            concurrency=concurrency,
+            queue_size=queue_size,
+            cns=cns,
+            logger=logger,
+            blob_dir=blob_dir,
+            trace_path=trace_path,
+            trace_format=trace_format,
+        )
+        service.start()
+        server = await asyncio.start_server(service.handle_connection, host, port)
+        logger.info(
+            logger_prefix
+            + "Listening on http://"
+            + host
+            + ":"
+            + str(port)
+            + " with concurrency "
+            + str(concurrency)
+            + " and queue size "
+            + str(queue_size)
+        )
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, stopping.set)
+        try:
+            async with server:
+                await stopping.wait()
+            logger.info(logger_prefix + "Shutting down")
+        finally:
+            await service.stop()
+            await close_connections(services["tavily_client"])
+            services["search_cache"].close()
+            services["industry_cache"].close()
+            services["llm_cache"].close()
+            if services["archive"] is not None:
+                services["archive"].close()
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import mmap
+import os
+from collections.abc import Callable
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+TRACKING_PARAMS = {"gclid", "fbclid", "mc_cid", "mc_eid", "ref", "cmpid"}
+
+
+def canonicalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+        )
+    )
+    path = parts.path.rstrip("/") or "/"
+    # http and https copies of a page are treated as the same document
+    return urlunsplit(("https", host, path, query, ""))
+
+
+def url_hash(url: str) -> str:
+    """Id of a page, shared by every URL that canonicalizes the same way"""
+    return hashlib.sha1(canonicalize_url(url).encode("utf-8")).hexdigest()[:16]
+
+
+def content_hash(text: str | None) -> str | None:
+    if text is None:
+        return None
+    normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    """Content-addressed payloads that graph state references by id.
+
+    Blobs are kept in memory, or with `directory` written once to disk and read
+    back through mmap, so large payloads never travel through graph state.
+    """
+
+    def __init__(self, directory: str | None = None):
+        self.directory = directory
+        self._blobs: dict[str, bytes] = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, blob_id: str) -> str:
+        return os.path.join(self.directory, blob_id[:2], blob_id)
+
+    def put(self, data: str) -> str:
+        payload = data.encode("utf-8")
+        blob_id = hashlib.sha256(payload).hexdigest()
+        if self.directory is None:
+            self._blobs[blob_id] = payload
+            return blob_id
+        path = self._path(blob_id)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so readers never see a partial blob
+            with open(path + ".tmp", "wb") as f_out:
+                f_out.write(payload)
+            os.replace(path + ".tmp", path)
+        return blob_id
+
+    def get(self, blob_id: str) -> str:
+        if self.directory is None:
+            return self._blobs[blob_id].decode("utf-8")
+        with open(self._path(blob_id), "rb") as f_in:
+            if os.fstat(f_in.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:].decode("utf-8")
+
+    def put_json(self, value: Any) -> str:
+        return self.put(json.dumps(value))
+
+    def get_json(self, blob_id: str) -> Any:
+        return json.loads(self.get(blob_id))
+
+
+def version_key(document: dict[str, Any]) -> tuple:
+    """Orders the versions of one URL, the lowest is kept: any body before
+    none, then by content hash, URL and title"""
+    return (
+        document["content_hash"] is None,
+        document["content_hash"] or "",
+        document["url"],
+        document["title"],
+    )
+
+
+class DocumentStore:
+    """Run-scoped store of search documents shared by all analysts.
+
+    Documents are keyed by canonical URL. A URL returned again with another
+    body keeps the version with the lowest content hash, and URLs with
+    identical content share one body, with `representative` naming the copy
+    with the lowest URL hash. Neither choice depends on which search finished
+    first. Bodies live in a `BlobStore`; node results keep only the returned
+    `doc_id` and resolve `raw_content` through the store when needed. A
+    `cleaner` rewrites each new body before it is stored, its stats are kept
+    on the document's index entry.
+    """
+
+    def __init__(
+        self,
+        blob_store: BlobStore | None = None,
+        cleaner: Callable[[str], tuple[str, dict[str, Any]]] | None = None,
+    ):
+        self.blob_store = blob_store or BlobStore()
+        self.cleaner = cleaner
+        self._docs: dict[str, dict[str, Any]] = {}
+        # Doc ids of the URLs holding each content
+        self._copies: dict[str, set[str]] = {}
+        self.duplicates = 0
+
+    def add(self, url: str, title: str, raw_content: str | None) -> str:
+        canonical_url = canonicalize_url(url)
+        doc_id = url_hash(url)
+        digest = content_hash(raw_content)
+
+        if doc_id in self._docs:
+            self.duplicates += 1
+            doc = self._docs[doc_id]
+            if version_key(doc) <= version_key(
+                {"content_hash": digest, "url": url, "title": title}
+            ):
+                return doc_id
+        elif digest is not None and digest in self._copies:
+            # Another URL with this content
+            self.duplicates += 1
+
+        if digest is not None and digest in self._copies:
+            # The body is already stored
+            content_fields = self._content_copy(self._docs[min(self._copies[digest])])
+        else:
+            content_fields = self._content_fields(raw_content, digest)
+        self._set(
+            {
+                "doc_id": doc_id,
+                "url": url,
+                "canonical_url": canonical_url,
+                "title": title,
+                **content_fields,
+            }
+        )
+        return doc_id
+
+    def _set(self, document: dict[str, Any]) -> None:
+        """Store a version of a document in place of any earlier one"""
+        doc_id = document["doc_id"]
+        previous = self._docs.get(doc_id)
+        if previous is not None and previous["content_hash"] is not None:
+            copies = self._copies[previous["content_hash"]]
+            copies.discard(doc_id)
+            if not copies:
+                del self._copies[previous["content_hash"]]
+        self._docs[doc_id] = document
+        if document["content_hash"] is not None:
+            self._copies.setdefault(document["content_hash"], set()).add(doc_id)
+
+    @staticmethod
+    def _content_copy(document: dict[str, Any]) -> dict[str, Any]:
+        """Content fields of a document, including any cleaning stats"""
+        return {
+            key: value
+            for key, value in document.items()
+            if key not in ("doc_id", "url", "canonical_url", "title")
+        }
+
+    def _content_fields(
+        self, raw_content: str | None, digest: str | None
+    ) -> dict[str, Any]:
+        if raw_content is None:
+            return {"blob_id": None, "content_bytes": 0, "content_hash": None}
+        cleaning_stats = {}
+        if self.cleaner is not None:
+            raw_content, cleaning_stats = self.cleaner(raw_content)
+        return {
+            "blob_id": self.blob_store.put(raw_content),
+            "content_bytes": len(raw_content.encode("utf-8")),
+            "content_hash": digest,
+            **cleaning_stats,
+        }
+
+    def get(self, doc_id: str) -> dict[str, Any]:
+        return self._docs[doc_id]
+
+    def restore(self, documents: list[dict[str, Any]]) -> None:
+        """Re-register documents recorded in graph state, e.g. on a resumed run"""
+        for document in documents:
+            doc = self._docs.get(document["doc_id"])
+            if doc is None or version_key(document) < version_key(doc):
+                self._set(dict(document))
+
+    def representative(self, doc_id: str) -> str:
+        """The copy standing in for every URL with the same content"""
+        digest = self._docs[doc_id]["content_hash"]
+        return doc_id if digest is None else min(self._copies[digest])
+
+    def _unique_docs(self) -> list[dict[str, Any]]:
+        return [
+            doc
+            for doc_id, doc in self._docs.items()
+            if self.representative(doc_id) == doc_id
+        ]
+
+    def raw_content(self, doc_id: str) -> str | None:
+        blob_id = self._docs[doc_id]["blob_id"]
+        return None if blob_id is None else self.blob_store.get(blob_id)
+
+    def __len__(self) -> int:
+        return len(self._unique_docs())
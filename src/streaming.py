@@ -0,0 +1,74 @@
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+
+T = TypeVar("T")
+
+
+class ReportWriter(AsyncCallbackHandler):
+    """Writes LLM tokens to a file and the graph's custom stream as they arrive.
+
+    Providing `tap_output_aiter` makes chat models take their streaming path
+    inside a plain `ainvoke`, so LLM caching and fallbacks keep working while
+    tokens flow. A failed attempt (retry or fallback) truncates what it wrote
+    and emits a "reset" event before the next attempt streams again. Of two
+    racing (hedged) calls only the first to stream is written; should the
+    other one finish first, its full text replaces what was streamed.
+    """
+
+    def __init__(self, path: str, stream_writer: Callable[[Any], None], company: str):
+        self.path = path
+        self.stream_writer = stream_writer
+        self.company = company
+        self.streamed_bytes = 0
+        self._run_id: UUID | None = None
+        self._file = open(path, "w")
+
+    def tap_output_aiter(
+        self, run_id: UUID, output: AsyncIterator[T]
+    ) -> AsyncIterator[T]:
+        return output
+
+    def tap_output_iter(self, run_id: UUID, output: Iterator[T]) -> Iterator[T]:
+        return output
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        self._file.write(text)
+        self._file.flush()
+        self.streamed_bytes += len(text.encode("utf-8"))
+        self.stream_writer(
+            {"event": "report_chunk", "company": self.company, "text": text}
+        )
+
+    def reset(self) -> None:
+        self._run_id = None
+        if self.streamed_bytes == 0:
+            return
+        self._file.seek(0)
+        self._file.truncate()
+        self.streamed_bytes = 0
+        self.stream_writer({"event": "report_reset", "company": self.company})
+
+    async def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        if self._run_id is None:
+            self._run_id = run_id
+        if run_id == self._run_id:
+            self.write(token)
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        if self._run_id is None or run_id == self._run_id:
+            return
+        self.reset()
+        self._run_id = run_id
+        self.write(response.generations[0][0].text)
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        if self._run_id is None or run_id == self._run_id:
+            self.reset()
+
+    def close(self) -> None:
+        self._file.close()
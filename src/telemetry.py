@@ -0,0 +1,267 @@
+import asyncio
+import functools
+import json
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langgraph.runtime import Runtime
+
+from src.defaults import TRACE_FORMATS
+
+SCOPE_NAME = "deepanal"
+
+_current_span: ContextVar[dict[str, Any] | None] = ContextVar(
+    "deepanal_current_span", default=None
+)
+
+
+def new_span_id() -> str:
+    return secrets.token_hex(8)
+
+
+def add_span_attributes(**attributes: Any) -> None:
+    """Set attributes on the innermost open span, if any"""
+    span = _current_span.get()
+    if span is not None:
+        span["attributes"].update(attributes)
+
+
+def increment_span_attribute(key: str, amount: int = 1) -> None:
+    span = _current_span.get()
+    if span is not None:
+        span["attributes"][key] = span["attributes"].get(key, 0) + amount
+
+
+class Tracer:
+    """Collects the spans of one research run.
+
+    Spans are plain dicts with ids, parent id, name, kind, start/end times in
+    unix nanoseconds, a status and attributes. The open span is tracked in a
+    context variable, so spans opened in tasks spawned under a node (parallel
+    searches, briefings) nest under it.
+    """
+
+    def __init__(self, trace_id: str | None = None, **attributes: Any):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.attributes = attributes
+        self.spans: list[dict[str, Any]] = []
+
+    def start_span(
+        self,
+        name: str,
+        kind: str = "internal",
+        parent_id: str | None = None,
+        **attributes: Any,
+    ) -> dict[str, Any]:
+        if parent_id is None:
+            parent = _current_span.get()
+            parent_id = None if parent is None else parent["span_id"]
+        return {
+            "trace_id": self.trace_id,
+            "span_id": new_span_id(),
+            "parent_id": parent_id,
+            "name": name,
+            "kind": kind,
+            "start_ns": time.time_ns(),
+            "end_ns": None,
+            "status": "ok",
+            "attributes": attributes,
+        }
+
+    def end_span(self, span: dict[str, Any], error: BaseException | None = None):
+        span["end_ns"] = time.time_ns()
+        if error is not None:
+            span["status"] = "error"
+            span["attributes"]["error"] = repr(error)
+        self.spans.append(span)
+
+    @contextmanager
+    def span(
+        self, name: str, kind: str = "internal", **attributes: Any
+    ) -> Iterator[dict[str, Any]]:
+        span = self.start_span(name, kind, **attributes)
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span, error)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Span count, total seconds and token totals per span name"""
+        totals: dict[str, dict[str, float]] = {}
+        for span in self.spans:
+            entry = totals.setdefault(
+                span["name"],
+                {"count": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0},
+            )
+            entry["count"] += 1
+            entry["seconds"] += (span["end_ns"] - span["start_ns"]) / 1e9
+            entry["input_tokens"] += span["attributes"].get("input_tokens", 0)
+            entry["output_tokens"] += span["attributes"].get("output_tokens", 0)
+        return totals
+
+    def export(self, path: str, trace_format: str = "jsonl") -> None:
+        """Append the spans to `path`.
+
+        "jsonl" writes one span per line. "otlp" writes the run as one OTLP/JSON
+        `ExportTraceServiceRequest` per line, the layout of the OpenTelemetry
+        Collector file exporter.
+        """
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError("Unknown trace format: " + str(trace_format))
+        with open(path, "a") as f_out:
+            if trace_format == "jsonl":
+                for span in self.spans:
+                    f_out.write(json.dumps(span, default=str) + "\n")
+            else:
+                f_out.write(json.dumps(self.to_otlp(), default=str) + "\n")
+
+    def to_otlp(self) -> dict[str, Any]:
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                "traceId": span["trace_id"],
+                "spanId": span["span_id"],
+                "name": span["name"],
+                "kind": OTLP_SPAN_KINDS[span["kind"]],
+                "startTimeUnixNano": str(span["start_ns"]),
+                "endTimeUnixNano": str(span["end_ns"]),
+                "attributes": otlp_attributes(span["attributes"]),
+                "status": {"code": 2 if span["status"] == "error" else 1},
+            }
+            if span["parent_id"] is not None:
+                otlp_span["parentSpanId"] = span["parent_id"]
+            spans.append(otlp_span)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": otlp_attributes(
+                            {"service.name": SCOPE_NAME, **self.attributes}
+                        )
+                    },
+                    "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": spans}],
+                }
+            ]
+        }
+
+
+OTLP_SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    converted = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            converted.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            converted.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            converted.append({"key": key, "value": {"doubleValue": value}})
+        elif value is not None:
+            converted.append({"key": key, "value": {"stringValue": str(value)}})
+    return converted
+
+
+def traced_node(name: str) -> Callable:
+    """Wrap a graph node in a span on the run's tracer and log its duration"""
+
+    def decorator(node: Callable) -> Callable:
+        @contextmanager
+        def node_span(context: dict[str, Any]) -> Iterator[None]:
+            start = time.perf_counter()
+            with context["tracer"].span(name, node=name):
+                yield
+            context["logger"].info(
+                name
+                + ": Time taken for node: "
+                + time.strftime(
+                    "%M mins %S secs", time.gmtime(time.perf_counter() - start)
+                )
+            )
+
+        if asyncio.iscoroutinefunction(node):
+
+            @functools.wraps(node)
+            async def async_wrapper(state, runtime: Runtime):
+                with node_span(runtime.context):
+                    return await node(state, runtime)
+
+            return async_wrapper
+
+        @functools.wraps(node)
+        def wrapper(state, runtime: Runtime):
+            with node_span(runtime.context):
+                return node(state, runtime)
+
+        return wrapper
+
+    return decorator
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    """Records one "llm" span per chat model call, nested under the open span"""
+
+    run_inline = True
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._open: dict[UUID, dict[str, Any]] = {}
+
+    def on_chat_model_start(
+        self, serialized: dict[str, Any], messages: list, *, run_id: UUID, **kwargs
+    ) -> None:
+        prompt_bytes = sum(
+            len(str(message.content).encode("utf-8"))
+            for batch in messages
+            for message in batch
+        )
+        invocation_params = kwargs.get("invocation_params") or {}
+        self._open[run_id] = self.tracer.start_span(
+            "llm",
+            kind="client",
+            model=invocation_params.get("model") or invocation_params.get("_type"),
+            tier=(kwargs.get("metadata") or {}).get("model_tier"),
+            prompt_bytes=prompt_bytes,
+        )
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs) -> None:
+        span = self._open.pop(run_id, None)
+        if span is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                attributes = span["attributes"]
+                attributes["input_tokens"] = attributes.get(
+                    "input_tokens", 0
+                ) + usage.get("input_tokens", 0)
+                attributes["output_tokens"] = attributes.get(
+                    "output_tokens", 0
+                ) + usage.get("output_tokens", 0)
+                attributes["completion_bytes"] = attributes.get(
+                    "completion_bytes", 0
+                ) + len(generation.text.encode("utf-8"))
+                if message is not None and message.response_metadata.get("model_name"):
+                    attributes["model"] = message.response_metadata["model_name"]
+                if (generation.generation_info or {}).get("cache_hit"):
+                    attributes["cache_hit"] = True
+        span["attributes"].setdefault("cache_hit", False)
+        self.tracer.end_span(span)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        span = self._open.pop(run_id, None)
+        if span is not None:
+            self.tracer.end_span(span, error)
@@ -0,0 +1,40 @@
+import logging
+from typing import Any
+
+import pytest
+from rich.console import Console
+
+from benchmarks.fakes import FakeChatModel, FakeTavilyClient, LatencyModel
+from src.cache import IndustryCache, LLMCache, SearchCache
+from src.processors import build_run_context
+from src.routing import CALL_SITES
+
+
+@pytest.fixture
+def fake_services() -> dict[str, Any]:
+    """Services of a run on the offline fakes, with every cache off"""
+    return {
+        "llms": dict.fromkeys(CALL_SITES, FakeChatModel()),
+        "llm_routes": dict.fromkeys(CALL_SITES, "fake"),
+        "tavily_client": FakeTavilyClient(
+            latency=LatencyModel(0), median_raw_characters=2000
+        ),
+        "search_cache": SearchCache(mode="off"),
+        "industry_cache": IndustryCache(mode="off"),
+        "llm_cache": LLMCache(mode="off"),
+    }
+
+
+@pytest.fixture
+def run_context(fake_services, tmp_path):
+    def build(company: str = "Acme", **overrides):
+        return build_run_context(
+            {**fake_services, **overrides},
+            company=company,
+            console=Console(quiet=True),
+            logger=logging.getLogger("deepanal.test"),
+            report_dir=str(tmp_path),
+            blob_dir=str(tmp_path / "blobs"),
+        )
+
+    return build
@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+
+from src.archive import FRAME_HEADER, ResearchArchive
+
+RECORDS_PER_WRITER = 50
+
+
+def write_records(directory: str, writer: str) -> None:
+    archive = ResearchArchive(directory, segment_bytes=16 * 1024)
+    for idx in range(RECORDS_PER_WRITER):
+        archive.append(
+            "document",
+            {"writer": writer, "idx": idx, "content": os.urandom(200).hex()},
+            run_id=writer + "-" + str(idx),
+            company="Acme",
+            url_hash=writer + str(idx),
+            content_hash=str(idx),
+        )
+    archive.close()
+
+
+def test_append_find_and_read(tmp_path):
+    archive = ResearchArchive(str(tmp_path))
+    entry = archive.append("run", {"report": "# Acme"}, run_id="r1", company="Acme")
+    archive.append(
+        "document",
+        {"content": "page"},
+        run_id="r1",
+        company="Acme",
+        url_hash="u1",
+        content_hash="c1",
+    )
+    assert entry["offset"] == 0
+    assert [found["kind"] for found in archive.find(company="  acme ")] == [
+        "run",
+        "document",
+    ]
+    assert archive.has_document("u1", "c1")
+    assert not archive.has_document("u1", "c2")
+    (run,) = archive.records(kind="run")
+    assert run["data"] == {"report": "# Acme"}
+    archive.close()
+
+
+def test_torn_frame_is_cut_off_on_open(tmp_path):
+    archive = ResearchArchive(str(tmp_path))
+    archive.append("run", {"report": "kept"}, run_id="r1", company="Acme")
+    segment = archive.segments()[-1]
+    archive.close()
+    path = os.path.join(str(tmp_path), segment)
+    intact_size = os.path.getsize(path)
+    with open(path, "ab") as f_out:
+        f_out.write(FRAME_HEADER.pack(b"DAR1", 1000, 0) + b"partial")
+
+    archive = ResearchArchive(str(tmp_path))
+    assert os.path.getsize(path) == intact_size
+    entry = archive.append("run", {"report": "next"}, run_id="r2", company="Acme")
+    assert entry["offset"] == intact_size
+    assert [run["data"]["report"] for run in archive.records()] == ["kept", "next"]
+    assert archive.rebuild_index() == 2
+    archive.close()
+
+
+def test_unindexed_frame_is_picked_up_by_next_append(tmp_path):
+    archive = ResearchArchive(str(tmp_path))
+    archive.append("run", {"report": "first"}, run_id="r1", company="Acme")
+    # A writer that crashed after writing its frame but before indexing it
+    archive._conn.execute("DELETE FROM records")
+    archive._conn.commit()
+    archive.append("run", {"report": "second"}, run_id="r2", company="Acme")
+    assert [run["run_id"] for run in archive.records()] == ["r1", "r2"]
+    archive.close()
+
+
+def test_two_writer_processes_share_one_archive(tmp_path):
+    directory = str(tmp_path)
+    context = multiprocessing.get_context("spawn")
+    writers = [
+        context.Process(target=write_records, args=(directory, name))
+        for name in ("a", "b")
+    ]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    archive = ResearchArchive(directory)
+    entries = archive.find(kind="document")
+    assert len(entries) == 2 * RECORDS_PER_WRITER
+    assert len(archive.segments()) > 1
+    seen = set()
+    for entry in entries:
+        envelope = archive.read(entry)
+        seen.add((envelope["data"]["writer"], envelope["data"]["idx"]))
+    assert len(seen) == 2 * RECORDS_PER_WRITER
+    # The segments alone hold every frame, back to back
+    assert archive.rebuild_index() == 2 * RECORDS_PER_WRITER
+    archive.close()
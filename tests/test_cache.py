@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.outputs import Generation
+
+from src.cache import LLMCache, ReplayMissError, SearchCache
+
+
+def test_concurrent_identical_searches_run_once_and_are_cached(tmp_path):
+    cache = SearchCache(cache_dir=str(tmp_path))
+    calls = []
+
+    async def search():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"results": [len(calls)]}
+
+    async def main():
+        return await asyncio.gather(
+            *[
+                cache.single_flight(query, "news", "text", search)
+                for query in ("Acme news", "acme  NEWS", "Acme news")
+            ]
+        )
+
+    assert asyncio.run(main()) == [{"results": [1]}] * 3
+    assert len(calls) == 1
+    assert cache.get("Acme news", "news", "text") == {"results": [1]}
+
+
+def test_failed_search_is_shared_but_not_cached(tmp_path):
+    cache = SearchCache(cache_dir=str(tmp_path))
+
+    async def search():
+        return TimeoutError()
+
+    result = asyncio.run(cache.single_flight("Acme", "news", "text", search))
+    assert isinstance(result, TimeoutError)
+    assert cache.get("Acme", "news", "text") is None
+
+
+def test_replay_mode_raises_on_misses(tmp_path):
+    SearchCache(cache_dir=str(tmp_path)).put("Acme", "news", "text", {"results": []})
+    replay = SearchCache(cache_dir=str(tmp_path), mode="replay")
+    assert replay.get("acme", "news", "text") == {"results": []}
+    with pytest.raises(ReplayMissError):
+        replay.get("Globex", "news", "text")
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("src.cache.time.time", clock)
+    return clock
+
+
+def test_searches_go_stale_per_topic(tmp_path, clock):
+    cache = SearchCache(
+        cache_dir=str(tmp_path), ttl_by_topic={"news": 60, "general": 3600}
+    )
+    cache.put("Acme", "news", "text", {"results": ["news"]})
+    cache.put("Acme", "general", "text", {"results": ["general"]})
+    clock.now += 120
+    assert cache.get("Acme", "news", "text") is None
+    assert cache.get("Acme", "general", "text") == {"results": ["general"]}
+    # Stale entries are deleted, not just skipped
+    clock.now -= 120
+    assert cache.get("Acme", "news", "text") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_refresh_and_off_modes_skip_reads(tmp_path):
+    SearchCache(cache_dir=str(tmp_path)).put("Acme", "news", "text", {"v": 1})
+    refresh = SearchCache(cache_dir=str(tmp_path), mode="refresh")
+    assert refresh.get("Acme", "news", "text") is None
+    refresh.put("Acme", "news", "text", {"v": 2})
+    assert SearchCache(cache_dir=str(tmp_path)).get("Acme", "news", "text") == {"v": 2}
+    off = SearchCache(cache_dir=str(tmp_path / "off"), mode="off")
+    off.put("Acme", "news", "text", {"v": 3})
+    assert off.get("Acme", "news", "text") is None
+    assert not (tmp_path / "off").exists()
+    with pytest.raises(ValueError):
+        SearchCache(cache_dir=str(tmp_path), mode="sometimes")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    payload = {"results": ["x" * 80]}
+    entry_bytes = len(json.dumps(payload))
+    cache = SearchCache(cache_dir=str(tmp_path), max_bytes=3 * entry_bytes)
+    for query in ("a", "b", "c"):
+        clock.now += 1
+        cache.put(query, "news", "text", payload)
+    clock.now += 1
+    assert cache.get("a", "news", "text") == payload
+    clock.now += 1
+    cache.put("d", "news", "text", payload)
+    assert cache.get("b", "news", "text") is None
+    for query in ("a", "c", "d"):
+        assert cache.get(query, "news", "text") == payload
+
+
+def test_llm_generations_round_trip(tmp_path):
+    cache = LLMCache(cache_dir=str(tmp_path))
+    assert cache.lookup("prompt", "model") is None
+    cache.update("prompt", "model", [Generation(text="report")])
+    (generation,) = cache.lookup("prompt", "model")
+    assert generation.text == "report"
+    assert generation.generation_info["cache_hit"]
+    assert cache.lookup("prompt", "other model") is None
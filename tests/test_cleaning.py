@@ -0,0 +1,64 @@
+import pytest
+
+from src.cleaning import clean_raw_content, is_boilerplate
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "Privacy Policy",
+        "Terms of Service | Privacy Policy | Cookie settings",
+        "Subscribe to our newsletter",
+        "Read more",
+        "Read more »",
+        "Sign in",
+        "Advertisement",
+        "Share on Twitter",
+        "We use cookies to improve your experience. Accept all",
+        "© 2024 Acme Corp. All rights reserved.",
+        "Copyright 2024 Reuters",
+        "Home | Products | About us",
+    ],
+)
+def test_banners_are_boilerplate(line):
+    assert is_boilerplate(line)
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "Meta fined €1.2bn over privacy policy breaches in 2023.",
+        "Netflix subscribers fell 2% as users refused to subscribe again.",
+        "Netflix subscribers fell as users refused to subscribe again",
+        "Read more: Acme CEO resigns amid fraud probe.",
+        "© 2024 Acme Corp revenue hit $3bn",
+        "Acme signs up 40 new enterprise customers",
+        "Q3 | Revenue | $3.1bn",
+    ],
+)
+def test_factual_lines_are_kept(line):
+    assert not is_boilerplate(line)
+
+
+def test_clean_raw_content_keeps_article_and_counts_dropped_lines():
+    raw = "\n".join(
+        [
+            "Skip to content",
+            "Home | Products | About us",
+            "Acme quarterly results",
+            "",
+            "Acme reported revenue of $3bn, up 12% on the year, and raised guidance.",
+            "Read more: Acme CEO resigns amid fraud probe.",
+            "",
+            "Privacy Policy",
+            "© 2024 Acme Corp. All rights reserved.",
+        ]
+    )
+    cleaned, stats = clean_raw_content(raw)
+    assert cleaned.splitlines() == [
+        "Acme quarterly results",
+        "Acme reported revenue of $3bn, up 12% on the year, and raised guidance.",
+        "Read more: Acme CEO resigns amid fraud probe.",
+    ]
+    assert stats["dropped_lines"] == 4
+    assert stats["content_tokens"] < stats["raw_tokens"]
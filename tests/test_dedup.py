@@ -0,0 +1,57 @@
+import numpy as np
+
+from src.dedup import (
+    LSH_BANDS,
+    NUM_PERMUTATIONS,
+    SHINGLED_CHARACTERS,
+    minhash_signatures,
+    near_duplicate_clusters,
+)
+
+ROWS_PER_BAND = NUM_PERMUTATIONS // LSH_BANDS
+ARTICLE = " ".join(
+    "Acme reported quarterly revenue of {} million dollars in region {}.".format(
+        idx * 7, idx
+    )
+    for idx in range(60)
+)
+
+
+def test_syndicated_copies_cluster_and_distinct_pages_do_not():
+    copy = ARTICLE.replace("region 59.", "region fifty nine.")
+    other = " ".join(
+        "Globex hired {} engineers for its plant number {} this spring.".format(
+            idx * 3, idx
+        )
+        for idx in range(60)
+    )
+    clusters = near_duplicate_clusters(minhash_signatures([ARTICLE, other, copy]))
+    assert sorted(clusters) == [[0, 2], [1]]
+
+
+def test_short_texts_are_never_duplicates():
+    clusters = near_duplicate_clusters(minhash_signatures(["Acme", "Acme", ""]))
+    assert sorted(clusters) == [[0], [1], [2]]
+
+
+def test_only_the_start_of_a_page_is_shingled():
+    tail = " ".join("unrelated filler word number {}".format(idx) for idx in range(500))
+    text = ARTICLE[:SHINGLED_CHARACTERS].ljust(SHINGLED_CHARACTERS)
+    signatures = minhash_signatures([text, text + tail])
+    assert (signatures[0] == signatures[1]).all()
+
+
+def test_pair_is_found_behind_a_dissimilar_first_bucket_member():
+    # A shares bands 0-9 with B and C but is otherwise different, and B and C
+    # differ in one value of each of bands 10-15, so every bucket B and C
+    # share has A as its first member
+    rng = np.random.default_rng(seed=1)
+    a, b = rng.integers(0, 2**32, size=(2, NUM_PERMUTATIONS), dtype=np.uint64)
+    shared = 10 * ROWS_PER_BAND
+    b[:shared] = a[:shared]
+    c = b.copy()
+    c[shared::ROWS_PER_BAND] += np.uint64(1)
+    assert np.mean(a == b) < 0.8 <= np.mean(b == c)
+
+    clusters = near_duplicate_clusters(np.stack([a, b, c]))
+    assert sorted(clusters) == [[0], [1, 2]]
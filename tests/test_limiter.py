@@ -0,0 +1,184 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+from pydantic import ValidationError
+from tavily.errors import ForbiddenError, UsageLimitExceededError
+
+from src.limiter import (
+    MIN_LATENCY_SAMPLES,
+    ProviderLimits,
+    RateLimitedRunnable,
+    RateLimiter,
+    is_throttling_error,
+    load_provider_limits,
+)
+
+
+class ThrottledError(Exception):
+    status_code = 429
+
+
+def write_limits(tmp_path, overrides):
+    path = tmp_path / "limits.json"
+    path.write_text(json.dumps(overrides))
+    return str(path)
+
+
+def test_load_provider_limits_validates_overrides(tmp_path):
+    limits = load_provider_limits(
+        write_limits(tmp_path, {"llm": {"requests_per_minute": "60"}})
+    )
+    assert limits["llm"].requests_per_minute == 60.0
+    # Unset fields keep their defaults
+    assert limits["llm"].tokens_per_minute == 900_000
+
+    with pytest.raises(ValidationError):
+        load_provider_limits(write_limits(tmp_path, {"llm": {"max_inflight": 4}}))
+    with pytest.raises(ValidationError):
+        load_provider_limits(write_limits(tmp_path, {"tavily": {"deadline": -1}}))
+    with pytest.raises(ValueError, match="Unknown rate limited provider"):
+        load_provider_limits(write_limits(tmp_path, {"openai": {}}))
+
+
+def test_is_throttling_error():
+    assert is_throttling_error(ThrottledError())
+    assert is_throttling_error(Exception("429 Too Many Requests"))
+    assert not is_throttling_error(Exception("Usage limit exceeded for your plan"))
+
+
+def test_tavily_rate_limit_is_throttling_but_plan_limit_is_not():
+    assert is_throttling_error(UsageLimitExceededError("Excessive requests"))
+    assert not is_throttling_error(ForbiddenError("This request exceeds your plan"))
+
+
+def test_throttling_halves_rate_and_backs_off():
+    limiter = RateLimiter("llm", ProviderLimits(requests_per_minute=60))
+    backoff = limiter._on_throttled(attempt=2)
+    assert 4 <= backoff <= 8
+    assert limiter.rate_scale == 0.5
+    limiter._on_success()
+    assert limiter.rate_scale == pytest.approx(0.55)
+
+
+def test_run_retries_throttled_calls_only(monkeypatch):
+    limiter = RateLimiter(
+        "llm", ProviderLimits(requests_per_minute=6000, max_retries=2)
+    )
+    on_throttled = limiter._on_throttled
+
+    def without_cooldown(attempt):
+        backoff = on_throttled(attempt)
+        limiter._cooldown_until = 0.0
+        return backoff
+
+    monkeypatch.setattr(limiter, "_on_throttled", without_cooldown)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ThrottledError()
+        return "ok"
+
+    assert asyncio.run(limiter.run(flaky)) == "ok"
+    assert limiter.retries == 2
+
+    async def broken():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    attempts.clear()
+    with pytest.raises(ValueError):
+        asyncio.run(limiter.run(broken))
+    assert len(attempts) == 1
+
+
+def test_slow_call_is_hedged_by_alternate():
+    limiter = RateLimiter(
+        "llm", ProviderLimits(requests_per_minute=6000, hedge_after=0.01)
+    )
+    for _ in range(MIN_LATENCY_SAMPLES):
+        limiter.latencies.record("briefer", 0.01)
+
+    async def slow():
+        await asyncio.sleep(5)
+        return "slow"
+
+    async def fast():
+        return "fast"
+
+    assert asyncio.run(limiter.run(slow, alternate=fast, key="briefer")) == "fast"
+    assert limiter.hedges == 1
+    assert limiter.hedge_wins == 1
+
+
+def test_deadline_cancels_call_and_falls_back():
+    limiter = RateLimiter(
+        "llm", ProviderLimits(requests_per_minute=6000, deadline=0.05)
+    )
+
+    async def stuck():
+        await asyncio.sleep(5)
+
+    async def fallback():
+        return "fallback"
+
+    assert asyncio.run(limiter.run(stuck, alternate=fallback)) == "fallback"
+    assert limiter.deadline_misses == 1
+    with pytest.raises(TimeoutError):
+        asyncio.run(limiter.run(stuck))
+
+
+def test_sync_invoke_goes_through_limiter():
+    limiter = RateLimiter("llm", ProviderLimits(requests_per_minute=6000))
+
+    async def echo(text):
+        return text.upper()
+
+    llm = RateLimitedRunnable(RunnableLambda(echo), limiter)
+    assert llm.invoke("hi") == "HI"
+    assert (RunnableLambda(lambda text: text + "!") | llm).invoke("hi") == "HI!"
+    assert limiter._request_tokens < limiter._burst
+
+
+def test_sync_invoke_shares_a_running_loop_from_another_thread():
+    limiter = RateLimiter(
+        "llm", ProviderLimits(requests_per_minute=6000, max_in_flight=1)
+    )
+    loops = []
+
+    async def record_loop(text):
+        loops.append(asyncio.get_running_loop())
+        await asyncio.sleep(0.01)
+        return text
+
+    llm = RateLimitedRunnable(RunnableLambda(record_loop), limiter)
+
+    async def main():
+        await llm.ainvoke("async")
+        thread_result = []
+        thread = threading.Thread(
+            target=lambda: thread_result.append(llm.invoke("sync"))
+        )
+        thread.start()
+        await asyncio.gather(*(llm.ainvoke("async") for _ in range(3)))
+        await asyncio.to_thread(thread.join)
+        return asyncio.get_running_loop(), thread_result
+
+    main_loop, thread_result = asyncio.run(main())
+    assert thread_result == ["sync"]
+    assert set(loops) == {main_loop}
+
+
+def test_sync_invoke_refuses_to_block_a_running_loop():
+    limiter = RateLimiter("llm", ProviderLimits(requests_per_minute=6000))
+    llm = RateLimitedRunnable(RunnableLambda(lambda text: text), limiter)
+
+    async def main():
+        llm.invoke("hi")
+
+    with pytest.raises(RuntimeError, match="await ainvoke"):
+        asyncio.run(main())
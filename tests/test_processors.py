@@ -0,0 +1,21 @@
+import asyncio
+
+from tavily import AsyncTavilyClient
+
+from src.processors import close_connections, share_connections
+
+
+def test_shared_connections_are_pooled_until_closed():
+    client = share_connections(AsyncTavilyClient(api_key="tvly-test"))
+
+    async def use_and_close():
+        async with client._client_creator() as first:
+            pass
+        async with client._client_creator() as second:
+            pass
+        await close_connections(client)
+        return first, second
+
+    first, second = asyncio.run(use_and_close())
+    assert first is second is client.http_client
+    assert client.http_client.is_closed
@@ -0,0 +1,41 @@
+import numpy as np
+
+from src.relevance import bm25_scores, relevance_matrix, term_count_matrix
+
+
+def test_term_counts_match_normalized_forms():
+    counts, lengths = term_count_matrix(
+        ["Partnerships and partnership news", "Nothing here"],
+        {"partnership": 0, "news": 1},
+    )
+    assert counts.tolist() == [[2, 1], [0, 0]]
+    assert lengths.tolist() == [4, 2]
+
+
+def test_bm25_prefers_rarer_terms_and_shorter_documents():
+    counts = np.array([[1, 1], [1, 0], [1, 0]], dtype=np.float32)
+    lengths = np.array([10, 10, 100], dtype=np.float32)
+    scores = bm25_scores(counts, lengths, np.array([[1, 1]], dtype=np.float32))
+    assert scores[0, 0] > scores[1, 0] > scores[2, 0]
+
+
+def test_relevance_matrix_ranks_documents_per_query():
+    titles = ["Acme quarterly revenue", "Acme faces lawsuit", "Weather today"]
+    texts = [
+        "Acme revenue and profit grew, margins widened.",
+        "A lawsuit over fines and regulatory compliance was filed against Acme.",
+        "Sunny with light winds.",
+    ]
+    relevance, bm25 = relevance_matrix(
+        titles,
+        texts,
+        ["revenue profit margins", "lawsuit fines compliance"],
+        "Acme Corp",
+        np.zeros((3, 2), dtype=np.float32),
+    )
+    assert relevance.shape == (3, 2)
+    assert relevance[:, 0].argmax() == 0
+    assert relevance[:, 1].argmax() == 1
+    # Sharing no query term, the page is dropped by the curator
+    assert bm25[2].tolist() == [0, 0]
+    assert relevance.min() >= 0 and relevance.max() <= 1
@@ -0,0 +1,54 @@
+import asyncio
+import random
+
+from benchmarks.fakes import FakeChatModel, FakeTavilyClient, LatencyModel
+from src.cache import IndustryCache, LLMCache, SearchCache
+from src.graph import workflow
+from src.routing import CALL_SITES
+
+INPUTS = {"company": "Acme", "industry": "Industrial Machinery", "location": "Germany"}
+
+
+class OfflineTavilyClient:
+    """Fails every search, a replay must be served from the recording"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def search(self, query: str, **kwargs):
+        # Counted too, since the researchers log and skip failed searches
+        self.calls += 1
+        raise AssertionError("Replay searched Tavily for: " + query)
+
+
+def run_report(run_context, cache_dir, mode, tavily_client) -> str:
+    llm_cache = LLMCache(cache_dir=str(cache_dir), mode=mode)
+    context = run_context(
+        llms=dict.fromkeys(CALL_SITES, FakeChatModel(cache=llm_cache)),
+        tavily_client=tavily_client,
+        search_cache=SearchCache(cache_dir=str(cache_dir), mode=mode),
+        industry_cache=IndustryCache(cache_dir=str(cache_dir), mode=mode),
+        llm_cache=llm_cache,
+    )
+    final_state = asyncio.run(workflow.ainvoke(INPUTS, context=context))
+    with open(final_state["report_path"]) as f_in:
+        return f_in.read()
+
+
+def test_replay_reproduces_recorded_run(run_context, tmp_path):
+    # A small URL pool with varying latency: the same page comes back from
+    # several searches with different bodies, in an order the replay, served
+    # from the cache, does not repeat
+    tavily_client = FakeTavilyClient(
+        latency=LatencyModel(0.01, sigma=1.0, rng=random.Random(3)),
+        median_raw_characters=2000,
+        url_pool=20,
+        seed=3,
+    )
+    recorded = run_report(run_context, tmp_path / "cache", "use", tavily_client)
+    assert tavily_client.calls > 0
+
+    offline_client = OfflineTavilyClient()
+    replayed = run_report(run_context, tmp_path / "cache", "replay", offline_client)
+    assert offline_client.calls == 0
+    assert replayed == recorded
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+
+from langchain.prompts import PromptTemplate
+
+from src.coverage import MAX_FIRST_WAVE
+from src.researchers import reseacher_pipeline
+
+STATE = {"company": "Acme", "industry": "Industrial Machinery", "location": "Germany"}
+PROMPT = PromptTemplate.from_template(
+    "Research {company} in {industry}, {location}. Write up to {max_queries} queries."
+)
+
+
+def test_failed_shared_searches_are_counted_apart(run_context, caplog):
+    async def shared_research():
+        return {
+            "layer_id": "layer",
+            "queries": ["industry trends", "industry size"],
+            "search_results": [TimeoutError(), TimeoutError()],
+        }
+
+    with caplog.at_level(logging.INFO, logger="deepanal.test"):
+        node_result = asyncio.run(
+            reseacher_pipeline(
+                state=STATE,
+                context=run_context(),
+                node_name="Industry analyst",
+                prompt=PROMPT,
+                logger_prefix="Industry analyst: ",
+                tavily_search_topic="general",
+                shared_research=shared_research,
+            )
+        )
+    assert len(node_result["queries"]) == MAX_FIRST_WAVE
+    assert node_result["industry_layer"]["doc_ids"] == []
+    (summary,) = [
+        record.getMessage()
+        for record in caplog.records
+        if "Successful searches" in record.getMessage()
+    ]
+    assert "Successful searches: " + str(MAX_FIRST_WAVE) + " " in summary
+    assert "Failed searches: 0 " in summary
+    assert summary.endswith("Failed shared industry searches: 2")
+
+
+def test_shared_results_without_body_stay_out_of_the_layer(run_context):
+    def result(page: int, raw_content: str | None) -> dict:
+        return {
+            "title": "Industry page " + str(page),
+            "url": "https://example.com/industry/" + str(page),
+            "content": "Industry snippet",
+            "raw_content": raw_content,
+            "score": 0.9,
+        }
+
+    async def shared_research():
+        return {
+            "layer_id": "layer",
+            "queries": ["industry trends"],
+            "search_results": [
+                {
+                    "query": "industry trends",
+                    "results": [result(1, "Machinery demand grew."), result(2, None)],
+                }
+            ],
+        }
+
+    context = run_context()
+    node_result = asyncio.run(
+        reseacher_pipeline(
+            state=STATE,
+            context=context,
+            node_name="Industry analyst",
+            prompt=PROMPT,
+            logger_prefix="Industry analyst: ",
+            tavily_search_topic="general",
+            shared_research=shared_research,
+        )
+    )
+    (doc_id,) = node_result["industry_layer"]["doc_ids"]
+    assert context["document_store"].raw_content(doc_id) == "Machinery demand grew."
@@ -0,0 +1,50 @@
+from src.retrieval import ChunkIndex, HashedTfidfVectorizer
+
+DOCS = [
+    {
+        "doc_id": "revenue",
+        "title": "Acme results",
+        "text": "Acme revenue grew 12% to $3bn.\nOperating margin widened to 18%.",
+    },
+    {
+        "doc_id": "lawsuit",
+        "title": "Acme sued",
+        "text": "Regulators fined Acme over a data breach lawsuit.",
+    },
+    {
+        "doc_id": "launch",
+        "title": "Acme launch",
+        "text": "Acme announced a partnership with Globex to launch a new product.",
+    },
+]
+
+
+def test_vectors_are_unit_length():
+    matrix = HashedTfidfVectorizer().fit_transform(["a b c", "c d", ""])
+    norms = (matrix**2).sum(axis=1)
+    assert norms[:2].round(5).tolist() == [1.0, 1.0]
+    assert norms[2] == 0
+
+
+def test_search_ranks_matching_chunks_first():
+    index = ChunkIndex.build(DOCS)
+    assert len(index) == 3
+    revenue_hits, lawsuit_hits = index.search(
+        ["Acme revenue growth", "Acme lawsuits and fines"], k=2
+    )
+    assert revenue_hits[0]["doc_id"] == "revenue"
+    assert revenue_hits[0]["position"] == 0
+    assert lawsuit_hits[0]["doc_id"] == "lawsuit"
+    assert lawsuit_hits[0]["score"] >= lawsuit_hits[-1]["score"]
+
+
+def test_search_is_limited_to_given_documents():
+    index = ChunkIndex.build(DOCS)
+    (hits,) = index.search(["Acme revenue growth"], k=10, doc_ids={"launch"})
+    assert {hit["doc_id"] for hit in hits} == {"launch"}
+    assert index.search(["Acme revenue"], doc_ids=set()) == [[]]
+    assert index.search(["Acme revenue"], doc_ids={"unknown"}) == [[]]
+
+
+def test_empty_index_returns_no_hits():
+    assert ChunkIndex.build([]).search(["Acme", "Globex"]) == [[], []]
@@ -0,0 +1,96 @@
+import itertools
+
+from src.store import BlobStore, DocumentStore, canonicalize_url, url_hash
+
+
+def test_canonical_urls_drop_tracking_and_scheme():
+    assert (
+        canonicalize_url("http://www.Example.com/news/?utm_source=x&b=2&a=1")
+        == "https://example.com/news?a=1&b=2"
+    )
+    assert url_hash("https://example.com/a/") == url_hash("http://www.example.com/a")
+
+
+def test_blob_store_round_trip_on_disk(tmp_path):
+    blob_store = BlobStore(str(tmp_path))
+    blob_id = blob_store.put("body")
+    assert blob_store.put("body") == blob_id
+    assert blob_store.get(blob_id) == "body"
+    assert blob_store.get(blob_store.put("")) == ""
+
+
+def test_same_url_keeps_one_version_whatever_the_order():
+    versions = [
+        ("https://example.com/a", "First", "first body"),
+        ("https://example.com/a?utm_source=feed", "Second", "second body"),
+        ("https://example.com/a", "Empty", None),
+    ]
+    kept = set()
+    for order in itertools.permutations(versions):
+        document_store = DocumentStore()
+        doc_ids = {document_store.add(*version) for version in order}
+        (doc_id,) = doc_ids
+        document = document_store.get(doc_id)
+        kept.add(
+            (document["url"], document["title"], document_store.raw_content(doc_id))
+        )
+        assert document_store.duplicates == 2
+    assert len(kept) == 1
+    assert kept.pop()[2] is not None
+
+
+def test_copies_share_a_body_and_the_lowest_url_hash_represents_them():
+    urls = ["https://a.example.com/x", "https://b.example.com/y"]
+    representatives = set()
+    for order in (urls, urls[::-1]):
+        document_store = DocumentStore()
+        doc_ids = [document_store.add(url, "Title", "same body") for url in order]
+        first, second = (document_store.get(doc_id) for doc_id in doc_ids)
+        assert first["blob_id"] == second["blob_id"]
+        assert len(document_store) == 1
+        representatives.add(document_store.representative(doc_ids[1]))
+    assert representatives == {min(url_hash(url) for url in urls)}
+
+
+def test_replaced_body_leaves_its_former_copies():
+    document_store = DocumentStore()
+    a = document_store.add("https://example.com/a", "A", "shared body")
+    b = document_store.add("https://example.com/b", "B", "shared body")
+    assert document_store.representative(a) == document_store.representative(b)
+    for body in ("another body", "yet another body"):
+        document_store.add("https://example.com/" + ("a" if a < b else "b"), "", body)
+    assert document_store.representative(a) == a
+    assert document_store.representative(b) == b
+    assert len(document_store) == 2
+
+
+def test_restore_keeps_the_same_version_as_add():
+    added = DocumentStore()
+    added.add("https://example.com/a", "One", "one")
+    added.add("https://example.com/a", "Two", "two")
+    (doc_id,) = [added.representative(url_hash("https://example.com/a"))]
+    first = DocumentStore(added.blob_store)
+    first.add("https://example.com/a", "One", "one")
+    second = DocumentStore(added.blob_store)
+    second.add("https://example.com/a", "Two", "two")
+
+    restored = DocumentStore(added.blob_store)
+    restored.restore([first.get(doc_id), second.get(doc_id)])
+    assert restored.get(doc_id) == added.get(doc_id)
+    restored.restore([first.get(doc_id)])
+    assert restored.get(doc_id) == added.get(doc_id)
+
+
+def test_cleaner_runs_once_per_body():
+    calls = []
+
+    def cleaner(text):
+        calls.append(text)
+        return text.upper(), {"dropped_lines": 0}
+
+    document_store = DocumentStore(cleaner=cleaner)
+    doc_id = document_store.add("https://example.com/a", "A", "body")
+    document_store.add("https://example.com/b", "B", "body")
+    assert calls == ["body"]
+    assert document_store.raw_content(doc_id) == "BODY"
+    assert document_store.get(doc_id)["dropped_lines"] == 0